@@ -4,8 +4,24 @@
 class settings:
     EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
     EMBEDDING_MODELS = ["sentence-transformers/all-MiniLM-L6-v2"]
+    EMBEDDING_DTYPE = "float32"
     DBIN_METHOD = "oxdbin"
     SIM_FORMAT = "dp"
     SIM_FORMATS = ["dp", "ed", "cs"]
     BASE_DB_COLLECTION = "oxdb-lite"
     OXDB_EXT = ".oxdb_lite"
+    OXDLD_DURABILITY = "os"
+    OXDLD_SYNC_INTERVAL_MS = 50
+    OXDLD_SYNC_OPS = 256
+    OXDLD_COMPACT_THRESHOLD = 0.5
+    OXDLD_COMPACT_RATE = None
+    OXDLD_FIT_POLICY = "best"
+    OXDLD_MMAP_READS = False
+    OXDLD_CACHE_CAPACITY = 1024
+    OXDLD_CACHE_BYTES = 64 << 20
+    OXDLD_CACHE_POLICY = "lru"
+    OXDLD_SHARED = False
+    OXDLD_BLOB_THRESHOLD = 1 << 20
+    OXDLD_COMPRESSION = None
+    OXDLD_COMPRESS_THRESHOLD = 256
+    OXDLD_SYMBOLS = False
@@ -4,9 +4,12 @@
 
 import os
 from datetime import datetime
-from typing import Dict, ForwardRef, Union, List, Optional, Any
+from typing import Dict, ForwardRef, Union, List, Optional, Any, Tuple
 
-from oxdb_lite.oxdoc.db import Oxdld
+import numpy as np
+
+from oxdb_lite.oxdoc.db import Oxdld, OxdTxn, RWLock
+from oxdb_lite.oxdoc.db.lock import read_locked, write_locked
 
 
 from oxdb_lite.core.types import idxdata, embd, DOCFILE_LIST
@@ -32,6 +35,7 @@ class Oxdb:
         db: str = None,
         db_path: Optional[str] = None,
         vec_model: Optional[VectorModel] = None,
+        readonly: Optional[bool] = False,
     ):
         """
         Initializes an instance of the Oxdb class.
@@ -40,12 +44,15 @@ class Oxdb:
             db (str, optional): The name of the database. Defaults to an empty string.
             db_path (Optional[str], optional): The path to the database directory. Defaults to None.
             vec_model (Optional[VectorModel], optional): A vector model instance for document operations. Defaults to None.
+            readonly (Optional[bool], optional): Open an existing database only to search and pull, its
+                documents are opened readonly and memory mapped. Defaults to False.
         """
         if db is not None and db_path is not None:
             raise ValueError(
                 "Either `db` or `db_path` can be provided, but not both. Both can also be empty."
             )
         self.db: str = db
+        self.readonly: bool = readonly
         self.vec: VectorModel = vec_model or Default_vec_model
         self.doc: Optional[dbDoc] = None
         self.doc_list: List[str] = []
@@ -72,8 +79,17 @@ class Oxdb:
 
         db = db or "" if not db_path else None
         self.db, self.db_path = self._db_path_validator(db, db_path)
-        os.makedirs(self.db_path, exist_ok=True)
-        self.get_doc()
+        if self.readonly:
+            if not os.path.isdir(self.db_path):
+                raise ValueError(f"Database {self.db_path} does not exist.")
+            docs = self.get_docs()
+            # a readonly database opens its default document only if it exists
+            self.doc = None
+            if dbDoc().doc_name in docs:
+                self.get_doc()
+        else:
+            os.makedirs(self.db_path, exist_ok=True)
+            self.get_doc()
 
         return self.info()
 
@@ -123,8 +139,10 @@ class Oxdb:
         Returns:
             dbDoc: An instance of the dbDoc class.
         """
-        self.doc = dbDoc(doc)
-        self.doc.connect_db(self.db_path, self.vec)
+        # connect before publishing, requests served from self.doc never see an unloaded doc
+        doc = dbDoc(doc, readonly=self.readonly)
+        doc.connect_db(self.db_path, self.vec)
+        self.doc = doc
         self.current_doc = self.doc.doc_name
         return self.doc
 
@@ -160,6 +178,7 @@ class Oxdb:
         Returns:
             bool: True if the cleanup was successful.
         """
+        self._check_writable()
         if db is not None and db_path is not None:
             raise ValueError(
                 "Either `db` or `db_path` can be provided, but not both. Both can also be empty."
@@ -207,6 +226,7 @@ class Oxdb:
         Returns:
             bool: True if the document was successfully deleted.
         """
+        self._check_writable()
         self.get_docs()
         if doc in self.doc_list:
             doc_path = os.path.join(self.db_path, doc)
@@ -227,6 +247,7 @@ class Oxdb:
         Returns:
             bool: True if the database was successfully deleted.
         """
+        self._check_writable()
         if (db is None and db_path is None) or (db is not None and db_path is not None):
             raise ValueError(
                 "Either `db` or `db_path` must be provided, but not both. Both must not be empty"
@@ -240,6 +261,10 @@ class Oxdb:
 
         return True
 
+    def _check_writable(self) -> None:
+        if self.readonly:
+            raise ValueError(f"Database {self.db_path} is opened readonly.")
+
     def info(self) -> Dict[str, Any]:
         """
         Returns detailed information about the current database and the active document.
@@ -259,13 +284,24 @@ class Oxdb:
 
 
 class dbDoc:
-    def __init__(self, doc: Optional[str] = None, time_log: Optional[bool] = False):
+    def __init__(
+        self,
+        doc: Optional[str] = None,
+        time_log: Optional[bool] = False,
+        durability: Optional[str] = None,
+        readonly: Optional[bool] = False,
+    ):
         """
         Initializes an instance of the dbDoc class, representing a document handler or pointer object.
 
         Args:
             doc (Optional[str], optional): The name of the document. Defaults to a timestamped name if not provided.
             time_log (Optional[bool], optional): The time as doc name. Defaults to False.
+            durability (Optional[str], optional): The durability mode of the document's Oxdld stores,
+                one of ["always", "batched", "os"], None for config.settings.OXDLD_DURABILITY
+                read when the document is created. Defaults to None.
+            readonly (Optional[bool], optional): Open the document only to search and pull, nothing is
+                written and the stores are memory mapped. Defaults to False.
         """
         default_doc = (
             "log-doc"
@@ -273,9 +309,13 @@ class dbDoc:
             else "log-doc" + datetime.now().strftime("[%d-%m-%Y]")
         )
         self.doc_name: str = doc or default_doc
+        self.durability: str = durability or config.settings.OXDLD_DURABILITY
+        self.readonly: bool = readonly
         self.db_path: Optional[str] = None
         self.vec: VectorModel = None
         self.doc_path: Optional[str] = None
+        # many readers or one writer, a writer also excludes the reload of the stores
+        self.lock = RWLock()
 
     def connect_db(self, db_path: str, vec: VectorModel) -> None:
         """
@@ -314,6 +354,7 @@ class dbDoc:
         self.load_doc(doc)
         return self.info()
 
+    @write_locked
     def load_doc(self, doc: str) -> None:
         """
         Loads the document and its associated data, creating necessary files if they don't exist.
@@ -327,25 +368,42 @@ class dbDoc:
         if not doc:
             raise ValueError("Document name cannot be empty.")
 
+        # flush the pending writes of the previously loaded document
+        if getattr(self, "data_oxd", None) is not None:
+            self.save_doc()
+
         self.doc_name = doc
         self.doc_path = os.path.join(self.db_path, self.doc_name)
+        if self.readonly:
+            if not os.path.isdir(self.doc_path):
+                raise ValueError(f"Document {self.doc_path} does not exist.")
+            # no transaction log and no duplicate check, nothing is written
+            self.txn = None
+            self.index_oxd: Oxdld = self._load_oxdld("index.oxdld")
+            self.data_oxd: Oxdld = self._load_oxdld("data.oxdld")
+            self.vec_oxd: Oxdld = self._load_oxdld("vec.oxdld")
+            self.uidx = None
+            self.hid_set = set()
+            return
         os.makedirs(self.doc_path, exist_ok=True)
 
+        # the three stores commit through one transaction log so a push is all or nothing
+        self.txn = OxdTxn(os.path.join(self.doc_path, "txn"))
         self.index_oxd: Oxdld = self._load_oxdld("index.oxdld")
         self.data_oxd: Oxdld = self._load_oxdld("data.oxdld")
         self.vec_oxd: Oxdld = self._load_oxdld("vec.oxdld")
         idxs = self.data_oxd.keys()
         self.uidx = UIDX(idxs)
         self.hid_set = set()
-        for idx in idxs:
-            self.hid_set.add(self.index_oxd[idx]["hid"])
+        for index_metadata in self.index_oxd.get_fields(idxs, ["hid"]).values():
+            self.hid_set.add(index_metadata["hid"])
         self.index_oxd["vec_model"] = self.vec.md_name
 
+    @write_locked
     def save_doc(self):
-        # self.index_oxd.save_index
-        # self.data_oxd.save_index
-        # self.vec_oxd.save_index
-        pass
+        "sync the pending writes of the document's stores to disk"
+        if self.txn is not None:
+            self.txn.checkpoint()
 
     def __len__(self):
         return len(self.data_oxd.index)
@@ -370,7 +428,31 @@ class dbDoc:
             raise ValueError("The .oxd document name cannot be empty.")
 
         oxd_doc_path = os.path.join(self.doc_path, oxd_doc_name)
-        return Oxdld(oxd_doc_path,data_encoading)
+        return Oxdld(
+            oxd_doc_path,
+            data_encoading,
+            cache_capacity=config.settings.OXDLD_CACHE_CAPACITY,
+            cache_bytes=config.settings.OXDLD_CACHE_BYTES,
+            cache_policy=config.settings.OXDLD_CACHE_POLICY,
+            durability=self.durability,
+            sync_interval_ms=config.settings.OXDLD_SYNC_INTERVAL_MS,
+            sync_ops=config.settings.OXDLD_SYNC_OPS,
+            compact_threshold=config.settings.OXDLD_COMPACT_THRESHOLD,
+            compact_rate=config.settings.OXDLD_COMPACT_RATE,
+            fit_policy=config.settings.OXDLD_FIT_POLICY,
+            mmap_reads=config.settings.OXDLD_MMAP_READS,
+            txn=self.txn,
+            shared=config.settings.OXDLD_SHARED,
+            readonly=self.readonly,
+            blob_threshold=config.settings.OXDLD_BLOB_THRESHOLD,
+            compression=config.settings.OXDLD_COMPRESSION,
+            compress_threshold=config.settings.OXDLD_COMPRESS_THRESHOLD,
+            symbols=config.settings.OXDLD_SYMBOLS,
+        )
+
+    def _check_writable(self) -> None:
+        if self.readonly:
+            raise ValueError(f"Document {self.doc_path} is opened readonly.")
 
     def get_doc_name(self) -> str:
         """
@@ -381,6 +463,7 @@ class dbDoc:
         """
         return self.doc_name
 
+    @read_locked
     def info(self) -> Dict[str, Any]:
         """
         Returns detailed information about the current document.
@@ -395,9 +478,15 @@ class dbDoc:
             "doc_path": self.doc_path,
             "doc_entry": self.len(),
             "vec_model": self.index_oxd["vec_model"],
+            "cache": {
+                "index": self.index_oxd.lrucache.stats(),
+                "data": self.data_oxd.lrucache.stats(),
+                "vec": self.vec_oxd.lrucache.stats(),
+            },
         }
         return res
 
+    @write_locked
     def push(
         self,
         data: Optional[Union[List[str], str]] = None,
@@ -428,6 +517,7 @@ class dbDoc:
             ValueError: If the `data` argument is empty or None.
         """
 
+        self._check_writable()
         # Validation to ensure only one of `data` or `datax` is provided and neither is empty.
         if (data is None and datax is None) or (data is not None and datax is not None):
             raise ValueError("Either `data` or `datax` must be provided, but not both.")
@@ -498,19 +588,23 @@ class dbDoc:
                 index_metadata.update(metadata_list[i])
 
             oxd_index_dict[idx] = index_metadata
-            oxd_embedding_dict[idx] = embedding_list[i]
+            # stored as one packed buffer, search loads it without per float decoding
+            oxd_embedding_dict[idx] = np.asarray(
+                embedding_list[i], dtype=config.settings.EMBEDDING_DTYPE
+            )
             oxd_data_dict[idx] = data_list[i]
 
             idx_list.append(int(idx))
 
-        # Add the data and embeddings to the storage
-        self.index_oxd.add(oxd_index_dict)
-        self.data_oxd.add(oxd_data_dict)
-        self.vec_oxd.add(oxd_embedding_dict)
-        self.save_doc()
+        # Add the data and embeddings to the storage as one atomic commit of the three stores
+        with self.txn.batch():
+            self.index_oxd.add(oxd_index_dict)
+            self.data_oxd.add(oxd_data_dict)
+            self.vec_oxd.add(oxd_embedding_dict)
 
         return idx_list
 
+    @read_locked
     def pull(
         self,
         idx: idxdata = None,
@@ -522,6 +616,8 @@ class dbDoc:
         where_data: Optional[Dict[str, Any]] = None,
         search_all_filter: Optional[bool] = False,
         apply_filter: Optional[bool] = True,
+        tail: Optional[int] = None,
+        idx_range: Optional[Tuple[Optional[int], Optional[int]]] = None,
         **kwargs,
     ) -> Dict[str, Any]:
         """
@@ -538,15 +634,25 @@ class dbDoc:
             where_data (Optional[Dict[str, Any]], optional): Data filter criteria for the log entry. Defaults to None.
             search_all_filter (Optional[bool], optional): Whether to search all entries regardless of filters. Defaults to False.
             apply_filter (Optional[bool], optional): Whether to apply filtering criteria. Defaults to True.
+            tail (Optional[int], optional): Retrieve only the last `tail` entries. Defaults to None.
+            idx_range (Optional[Tuple[int, int]], optional): Retrieve only the entries with
+                start <= idx < end, either bound may be None. Defaults to None.
+                With `tail` or `idx_range` the `idx`, `uid`, `time`, `date`, `where` and `where_data`
+                filters keep the selected entries that match them, so `tail=100, uid="u1"` returns the
+                entries of u1 among the last 100, not the last 100 entries of u1.
 
             eg :
             where={"metadata_key": "value"},
             where_data={"search_string":"query_search_string"} ,
+            tail=1000 ,
+            idx_range=(5000, 6000) ,
         Returns:
             List[Dict[str, Any]]: A list of dictionaries representing the log entries matching the criteria.
+                The embeddings of "vec.oxd" are numpy arrays, call `.tolist()` for lists.
 
         Raises:
             ValueError: If `docfile` is not a valid subfile within the document.
+            ValueError: If `tail` is not a positive integer.
         """
 
         # Validate the `docfile` argument
@@ -557,6 +663,31 @@ class dbDoc:
 
         log_entries: Dict[str, Any] = {}
 
+        # tail and range queries read only the records of the idxs they select
+        if tail is not None or idx_range is not None:
+            if tail is not None:
+                if not isinstance(tail, int) or tail <= 0:
+                    raise ValueError(f"ox-db: `tail` should be a positive integer, not '{tail}'")
+                idxs_list = self.data_oxd.range_keys(reverse=True, limit=tail)[::-1]
+            else:
+                idxs_list = self.data_oxd.range_keys(*idx_range)
+            if apply_filter:
+                if idx is not None:
+                    selected = {str(i) for i in strorlist_to_list(idx)}
+                    idxs_list = [i for i in idxs_list if i in selected]
+                if any([uid, time, date, where, kwargs.get("hid")]):
+                    idxs_list = self.search_idx(
+                        hid=kwargs.get("hid", None),
+                        uid=uid,
+                        time=time,
+                        date=date,
+                        where=where,
+                        search_all_filter=search_all_filter,
+                        idxs=idxs_list,
+                    )
+                return self.pull_idx(idxs_list, docfile, where_data)
+            return self.pull_idx(idxs_list, docfile)
+
         # Check if all filters are None
         all_none = all(var is None for var in [uid, idx, time, date, where, where_data])
         if not apply_filter:
@@ -592,6 +723,7 @@ class dbDoc:
 
         return log_entries
 
+    @read_locked
     def pull_idx(
         self,
         idxs: idxdata,
@@ -630,10 +762,8 @@ class dbDoc:
             content = self.data_oxd
 
             # Search within the data using the provided `idxs` and `search_string`
-            for idx in idxs:
-                idx = str(idx)
-                unit = content.get(idx)
-                if unit:
+            for idx, unit in content.get_many([str(idx) for idx in idxs]).items():
+                if unit is not None:
                     if search_string in unit:
                         log_entries[idx] = unit
             return log_entries
@@ -648,14 +778,13 @@ class dbDoc:
                 content = self.data_oxd
 
         # Retrieve log entries using the provided `idxs`
-        for idx in idxs:
-            idx = str(idx)
-            unit = content.get(idx)
-            if unit:
+        for idx, unit in content.get_many([str(idx) for idx in idxs]).items():
+            if unit is not None:
                 log_entries[idx] = unit
 
         return log_entries
 
+    @read_locked
     def search(
         self,
         query: str,
@@ -762,6 +891,7 @@ class dbDoc:
             )
 
         res_idxs = list(res_data.keys())
+        res_index = self.index_oxd.get_many(res_idxs)
         res_len = len(res_idxs)
         search_res["entries"] = res_len
         search_res["idx"] = res_idxs
@@ -774,12 +904,13 @@ class dbDoc:
                     search_scores["idx"].index(dataset_idxs.index(idxi))
                 ]
             )
-            search_res["index"].append(self.index_oxd.get(idxi))
+            search_res["index"].append(res_index.get(idxi))
             if "embeddings" in includes:
-                search_res["embeddings"].append(vec_log_entries[idxi])
+                search_res["embeddings"].append(np.asarray(vec_log_entries[idxi]).tolist())
 
         return search_res
 
+    @write_locked
     def delete(
         self,
         idx: Optional[Union[str, list[str]]] = None,
@@ -797,6 +928,7 @@ class dbDoc:
             ValueError: If `idx` is None
         """
 
+        self._check_writable()
         # Validation to ensure only one of `idx` or `doc` is provided and neither is empty.
         if idx is None:
             raise ValueError("Either `idx` or `doc` must be provided, but not both.")
@@ -805,15 +937,15 @@ class dbDoc:
 
         idx_list = idx if isinstance(idx, list) else [idx]
         idx_list = [str(i) for i in idx_list]
-        self.index_oxd.delete(idx_list)
-        self.data_oxd.delete(idx_list)
-        self.vec_oxd.delete(idx_list)
+        with self.txn.batch():
+            self.index_oxd.delete(idx_list)
+            self.data_oxd.delete(idx_list)
+            self.vec_oxd.delete(idx_list)
         self.uidx.delete(idx_list)
 
-        self.save_doc()
-
         return idx_list
 
+    @read_locked
     def show(
         self,
         uid: Optional[str] = None,
@@ -869,6 +1001,7 @@ class dbDoc:
             )
         return content
 
+    @read_locked
     def search_idx(
         self,
         hid: Optional[str] = None,
@@ -878,6 +1011,7 @@ class dbDoc:
         where: Optional[Dict[str, Any]] = None,
         where_data: Optional[Dict[str, Any]] = None,
         search_all_filter: bool = False,
+        idxs: Optional[List[str]] = None,
     ) -> List[str]:
         """
         Searches for IDXs based on uid, time, date, or additional filtering criteria.
@@ -889,6 +1023,7 @@ class dbDoc:
             where (Optional[Dict[str, Any]], optional): Additional metadata filters, e.g., {"metadata_key": "value"}.
             where_data (Optional[Dict[str, Any]], optional): Additional data filters, e.g., {"in_data": "search_string"}.
             search_all_filter (bool, optional): If True, requires all filters to match. Defaults to False.
+            idxs (Optional[List[str]], optional): Search only these IDXs instead of the whole document. Defaults to None.
 
         Returns:
             List[str]: The list of matching IDXs.
@@ -909,13 +1044,12 @@ class dbDoc:
         if isdate:
             where["date"] = isdate
 
+        # only the filtered fields of each index entry are decoded
+        searched = self.data_oxd.keys() if idxs is None else idxs
+        index_entries = self.index_oxd.get_fields([str(idx) for idx in searched], list(where))
         idxs = []
-
-        for idx in self.data_oxd.keys():
-            idx = str(idx)
-            log_it = self._metadata_filter(
-                where, self.index_oxd.get(idx), search_all_filter
-            )
+        for idx, index_metadata in index_entries.items():
+            log_it = self._metadata_filter(where, index_metadata, search_all_filter)
             if log_it:
                 idxs.append(idx)
 
@@ -936,8 +1070,8 @@ class dbDoc:
             List[str]: The IDXs where the search string was found.
         """
         out = []
-        for idx in doc_data.keys():
-            data = doc_data.get(idx, "")
+        # one bulk read, a scan over every key keeps the hot entries cached
+        for idx, data in doc_data.get_many(doc_data.keys(), admit=False).items():
             if search_string in data:
                 if output == "data":
                     out.append(data)
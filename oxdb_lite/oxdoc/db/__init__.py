@@ -1,3 +1,5 @@
 from oxdb_lite.oxdoc.db.ld import Oxdld
 from oxdb_lite.oxdoc.db.mem import OxdMem
-from oxdb_lite.oxdoc.db.cache import LRUCache
+from oxdb_lite.oxdoc.db.txn import OxdTxn
+from oxdb_lite.oxdoc.db.cache import LRUCache, TinyLFUCache, TwoQCache
+from oxdb_lite.oxdoc.db.lock import RWLock
@@ -1,24 +1,77 @@
+import functools
+import sys
+import threading
+from collections import OrderedDict
 from typing import Any, Union
 
+CACHE_POLICIES = ["lru", "2q", "tinylfu"]
+
+# odd multipliers of the TinyLFU count-min sketch rows
+_SKETCH_SEEDS = (
+    0x9E3779B97F4A7C15,
+    0xC2B2AE3D27D4EB4F,
+    0x165667B19E3779F9,
+    0xD6E8FEB86659FD93,
+)
+
+
+def estimate_size(value: Any) -> int:
+    """Estimate the memory footprint of a value in bytes, following containers."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += estimate_size(k) + estimate_size(v)
+    elif isinstance(value, (list, tuple, set)):
+        for v in value:
+            size += estimate_size(v)
+    return size
+
+
+def _locked(method):
+    """Run a cache method while holding the cache lock."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
 
 class Node:
     """Doubly Linked List Node."""
 
-    def __init__(self, key=None, value=None):
+    def __init__(self, key=None, value=None, size=0):
         self.key = key
         self.value = value
+        self.size = size
         self.prev = None
         self.next = None
 
 
 class LRUCache:
-    def __init__(self, capacity: int = 100):
+    def __init__(self, capacity: Union[int, None] = 100, max_bytes: Union[int, None] = None):
+        """
+        Least recently used cache bounded by entry count and/or total entry size.
+
+        Args:
+            capacity (int or None, optional): Maximum number of entries, None for no limit. Defaults to 100.
+            max_bytes (int or None, optional): Maximum sum of the entry sizes, None for no limit.
+                Entries larger than the budget are not cached. Defaults to None.
+        """
         self.capacity = capacity
+        self.max_bytes = max_bytes
         self.cache = {}  # Dictionary to store key-node pairs for O(1) lookups
         self.head = Node()  # Dummy head node
         self.tail = Node()  # Dummy tail node
         self.head.next = self.tail  # Initialize the list to be empty
         self.tail.prev = self.head
+        self.bytes = 0  # sum of the sizes of the cached entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # the linked list is rearranged even by reads, every public method holds the lock
+        self.lock = threading.RLock()
 
     def __len__(self):
         "len prop of db"
@@ -37,6 +90,7 @@ class LRUCache:
     def __contains__(self, key):
         return key in self.cache
 
+    @_locked
     def keys(self):
         """
         return all the keys in the db
@@ -63,38 +117,134 @@ class LRUCache:
         self._remove(node)
         self._add_to_front(node)
 
-    def get(self, key: Union[str, int]) -> Any:
-        """Get the value (will always be positive) of the key if it exists in the cache, otherwise return -1."""
+    @_locked
+    def get(self, key: Union[str, int], default: Any = None) -> Any:
+        """Get the value of the key if it exists in the cache, otherwise return `default`."""
         if key in self.cache:
+            self.hits += 1
             node = self.cache[key]
             self._move_to_front(node)
             return node.value
-        return None
+        self.misses += 1
+        return default
+
+    def _entry_size(self, value: Any, size: Union[int, None]) -> Union[int, None]:
+        """Return the size charged for a value, None if it can never fit the byte budget."""
+        if self.max_bytes is not None and size is None:
+            size = estimate_size(value)
+        size = size or 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return None
+        return size
+
+    def _over(self) -> bool:
+        """Check whether the cache holds more than its limits allow."""
+        return (self.capacity is not None and len(self) > self.capacity) or (
+            self.max_bytes is not None and self.bytes > self.max_bytes
+        )
+
+    @_locked
+    def put(
+        self,
+        key: Union[str, int],
+        value: Any,
+        size: Union[int, None] = None,
+        admit: bool = True,
+    ):
+        """
+        Update the value of the key if it exists. Otherwise, add the key-value pair to the cache.
+
+        Args:
+            key (str or int): The key to cache.
+            value (Any): The value to cache.
+            size (int or None, optional): The size charged against `max_bytes`, estimated from
+                the value when None. Defaults to None.
+            admit (bool, optional): Add the key if it is not cached yet, bulk scans pass False so
+                they only refresh cached values without evicting anything. Defaults to True.
+        """
+        size = self._entry_size(value, size)
+        if size is None:
+            # a single entry larger than the budget would flush the whole cache
+            self.delete(key)
+            return
 
-    def put(self, key: Union[str, int], value: Any):
-        """Update the value of the key if it exists. Otherwise, add the key-value pair to the cache."""
         if key in self.cache:
             node = self.cache[key]
             node.value = value  # Update value
+            self.bytes += size - node.size
+            node.size = size
             self._move_to_front(node)
-        else:
+        elif admit:
             # Add a new node to the front
-            new_node = Node(key, value)
+            new_node = Node(key, value, size)
             self.cache[key] = new_node
+            self.bytes += size
             self._add_to_front(new_node)
+        self._evict()
+
+    def pop_lru(self) -> Node:
+        """Remove and return the least recently used node."""
+        lru_node = self.tail.prev
+        self._remove(lru_node)
+        del self.cache[lru_node.key]
+        self.bytes -= lru_node.size
+        return lru_node
 
-            if len(self.cache) > self.capacity:
-                # Evict the least recently used (LRU) node
-                lru_node = self.tail.prev
-                self._remove(lru_node)
-                del self.cache[lru_node.key]
+    def _evict(self):
+        """Evict the least recently used nodes until the cache fits its limits."""
+        while self.cache and self._over():
+            self.pop_lru()
+            self.evictions += 1
 
+    @_locked
+    def resize(self, capacity: Union[int, None] = None, max_bytes: Union[int, None] = None):
+        """
+        Change the limits of the cache, evicting entries if it no longer fits.
+
+        Args:
+            capacity (int or None, optional): New maximum number of entries, None for no limit.
+            max_bytes (int or None, optional): New maximum sum of the entry sizes, None for no limit.
+        """
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self._evict()
+
+    @_locked
+    def clear(self):
+        """Remove every entry, the counters are kept."""
+        self.cache = {}
+        self.head.next = self.tail
+        self.tail.prev = self.head
+        self.bytes = 0
+
+    @_locked
+    def stats(self) -> dict:
+        """
+        Return the usage counters of the cache.
+
+        Returns:
+            dict: entries, bytes, capacity, max_bytes, hits, misses, evictions and hit_ratio.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "bytes": self.bytes,
+            "capacity": self.capacity,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    @_locked
     def delete(self, key: Union[str, int]):
         """Delete a key from the cache if it exists."""
         if key in self.cache:
             node = self.cache[key]
             self._remove(node)  # Remove the node from the doubly linked list
             del self.cache[key]  # Remove the key from the dictionary
+            self.bytes -= node.size
             return True
         else:
             return False
@@ -108,3 +258,244 @@ class LRUCache:
             node = node.next
         print("Cache state:", cache_state)
         return cache_state
+
+
+class TwoQCache(LRUCache):
+    def __init__(
+        self,
+        capacity: Union[int, None] = 100,
+        max_bytes: Union[int, None] = None,
+        in_share: float = 0.25,
+        ghost_share: float = 0.5,
+    ):
+        """
+        2Q cache, new keys wait in a FIFO queue and only move to the main LRU when they are
+        requested again, so a single pass over many keys cannot flush the hot entries. Keys
+        requested again shortly after leaving the queue go straight to the main LRU.
+
+        Args:
+            capacity (int or None, optional): Maximum number of entries, None for no limit. Defaults to 100.
+            max_bytes (int or None, optional): Maximum sum of the entry sizes, None for no limit. Defaults to None.
+            in_share (float, optional): Share of the limits given to the FIFO queue. Defaults to 0.25.
+            ghost_share (float, optional): Number of remembered keys evicted from the FIFO queue,
+                as a share of the capacity. Defaults to 0.5.
+        """
+        super().__init__(capacity=capacity, max_bytes=max_bytes)
+        self.in_share = in_share
+        self.ghost_share = ghost_share
+        self.recent = LRUCache(capacity=None)  # FIFO queue of the keys seen once
+        self.ghost = OrderedDict()  # keys recently evicted from the FIFO queue, without values
+
+    def __len__(self):
+        return len(self.cache) + len(self.recent)
+
+    def __contains__(self, key):
+        return key in self.cache or key in self.recent
+
+    @_locked
+    def keys(self):
+        """
+        return all the keys in the db
+        """
+        return list(self.recent.cache) + list(self.cache)
+
+    @_locked
+    def get(self, key: Union[str, int], default: Any = None) -> Any:
+        """Get the value of the key if it exists in the cache, otherwise return `default`."""
+        if key in self.recent.cache:
+            # a second request promotes the key to the main LRU
+            self.hits += 1
+            node = self.recent.cache[key]
+            self.recent.delete(key)
+            self.bytes -= node.size
+            super().put(key, node.value, node.size)
+            return node.value
+        return super().get(key, default)
+
+    @_locked
+    def put(
+        self,
+        key: Union[str, int],
+        value: Any,
+        size: Union[int, None] = None,
+        admit: bool = True,
+    ):
+        """
+        Update the value of the key if it exists. Otherwise, add the key-value pair to the
+        FIFO queue, or to the main LRU if the key was evicted from the queue recently.
+
+        Args:
+            key (str or int): The key to cache.
+            value (Any): The value to cache.
+            size (int or None, optional): The size charged against `max_bytes`, estimated from
+                the value when None. Defaults to None.
+            admit (bool, optional): Add the key if it is not cached yet. Defaults to True.
+        """
+        size = self._entry_size(value, size)
+        if size is None:
+            self.delete(key)
+            return
+
+        if key in self.recent.cache:
+            node = self.recent.cache[key]
+            self.recent.bytes += size - node.size
+            self.bytes += size - node.size
+            node.value = value
+            node.size = size
+            self._evict()
+        elif key in self.cache or (admit and key in self.ghost):
+            self.ghost.pop(key, None)
+            super().put(key, value, size)
+        elif admit:
+            self.recent.put(key, value, size)
+            self.bytes += size
+            self._evict()
+
+    def _evict(self):
+        """Evict from the FIFO queue while it is over its share, otherwise from the main LRU."""
+        while len(self) and self._over():
+            recent_over = (
+                self.capacity is not None
+                and len(self.recent) > self.capacity * self.in_share
+            ) or (
+                self.max_bytes is not None
+                and self.recent.bytes > self.max_bytes * self.in_share
+            )
+            if self.recent.cache and (recent_over or not self.cache):
+                node = self.recent.pop_lru()
+                self.bytes -= node.size
+                self.ghost[node.key] = None
+                ghost_capacity = int((self.capacity or len(self)) * self.ghost_share)
+                while len(self.ghost) > ghost_capacity:
+                    self.ghost.popitem(last=False)
+            else:
+                self.pop_lru()
+            self.evictions += 1
+
+    @_locked
+    def clear(self):
+        """Remove every entry, the counters are kept."""
+        super().clear()
+        self.recent.clear()
+        self.ghost.clear()
+
+    @_locked
+    def delete(self, key: Union[str, int]):
+        """Delete a key from the cache if it exists."""
+        self.ghost.pop(key, None)
+        if key in self.recent.cache:
+            self.bytes -= self.recent.cache[key].size
+            return self.recent.delete(key)
+        return super().delete(key)
+
+
+class TinyLFUCache(LRUCache):
+    def __init__(
+        self,
+        capacity: Union[int, None] = 100,
+        max_bytes: Union[int, None] = None,
+        sketch_width: Union[int, None] = None,
+    ):
+        """
+        LRU cache with TinyLFU admission, a new key only replaces the LRU victim when a
+        count-min sketch of recent requests has seen it more often than the victim. The first
+        request of a key only goes to a doorkeeper set, so one-off keys of a scan never reach
+        the sketch.
+
+        Args:
+            capacity (int or None, optional): Maximum number of entries, None for no limit. Defaults to 100.
+            max_bytes (int or None, optional): Maximum sum of the entry sizes, None for no limit. Defaults to None.
+            sketch_width (int or None, optional): Counters per sketch row, rounded up to a power of
+                two. Defaults to 4 times the capacity (4096 without a capacity).
+        """
+        super().__init__(capacity=capacity, max_bytes=max_bytes)
+        width = sketch_width or 4 * (capacity or 1024)
+        self.sketch_width = 1 << max(4, (width - 1).bit_length())
+        self.sketch = [bytearray(self.sketch_width) for _ in _SKETCH_SEEDS]
+        # the counters are halved after this many requests so old popularity fades
+        self.sample_size = 10 * self.sketch_width
+        self.samples = 0
+        self.doorkeeper = set()  # keys requested once since the last halving
+
+    def _slots(self, key):
+        # multiply-shift hashing, one odd seed per row, keeps the rows independent
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        shift = 64 - (self.sketch_width.bit_length() - 1)
+        return [((h * seed) & 0xFFFFFFFFFFFFFFFF) >> shift for seed in _SKETCH_SEEDS]
+
+    def _record(self, key: Union[str, int]) -> None:
+        if key not in self.doorkeeper:
+            self.doorkeeper.add(key)
+        else:
+            for row, slot in zip(self.sketch, self._slots(key)):
+                if row[slot] < 15:
+                    row[slot] += 1
+        self.samples += 1
+        if self.samples >= self.sample_size:
+            self.sketch = [bytearray(count >> 1 for count in row) for row in self.sketch]
+            self.doorkeeper.clear()
+            self.samples //= 2
+
+    def frequency(self, key: Union[str, int]) -> int:
+        """Return the estimated number of recent requests of a key."""
+        count = min(row[slot] for row, slot in zip(self.sketch, self._slots(key)))
+        return count + (key in self.doorkeeper)
+
+    @_locked
+    def get(self, key: Union[str, int], default: Any = None) -> Any:
+        """Get the value of the key if it exists in the cache, otherwise return `default`."""
+        self._record(key)
+        return super().get(key, default)
+
+    @_locked
+    def put(
+        self,
+        key: Union[str, int],
+        value: Any,
+        size: Union[int, None] = None,
+        admit: bool = True,
+    ):
+        """
+        Update the value of the key if it exists. Otherwise, add the key-value pair to the
+        cache when it is free or the key is requested more often than the LRU victim.
+
+        Args:
+            key (str or int): The key to cache.
+            value (Any): The value to cache.
+            size (int or None, optional): The size charged against `max_bytes`, estimated from
+                the value when None. Defaults to None.
+            admit (bool, optional): Add the key if it is not cached yet. Defaults to True.
+        """
+        size = self._entry_size(value, size)
+        if admit and size is not None and key not in self.cache and self.cache:
+            full = (self.capacity is not None and len(self) + 1 > self.capacity) or (
+                self.max_bytes is not None and self.bytes + size > self.max_bytes
+            )
+            if full and self.frequency(key) <= self.frequency(self.tail.prev.key):
+                admit = False
+        super().put(key, value, size, admit)
+
+
+def make_cache(
+    policy: str = "lru",
+    capacity: Union[int, None] = 100,
+    max_bytes: Union[int, None] = None,
+) -> LRUCache:
+    """
+    Create a cache with the given eviction policy.
+
+    Args:
+        policy (str, optional): The cache policy. Defaults to "lru".
+            - cache policies [ "lru","2q","tinylfu"]
+        capacity (int or None, optional): Maximum number of entries, None for no limit. Defaults to 100.
+        max_bytes (int or None, optional): Maximum sum of the entry sizes, None for no limit. Defaults to None.
+
+    Returns:
+        LRUCache: The cache, all policies share the LRUCache interface.
+    """
+    caches = {"lru": LRUCache, "2q": TwoQCache, "tinylfu": TinyLFUCache}
+    if policy not in caches:
+        raise ValueError(
+            f"cache_policy = {policy} is not valid. It should be one of these: {CACHE_POLICIES}"
+        )
+    return caches[policy](capacity=capacity, max_bytes=max_bytes)
@@ -0,0 +1,103 @@
+"""
+compression codecs of the Oxdld records
+
+a compressed record carries the flag of its codec, so records written
+with another codec or without compression stay readable whatever codec
+the document is configured with
+"""
+
+import bz2
+import lzma
+import zlib
+from collections import Counter
+from typing import Callable, List
+
+from oxdb_lite.oxdoc.db.record import FLAG_BZ2, FLAG_LZMA, FLAG_ZDICT, FLAG_ZLIB
+
+COMPRESSION_CODECS = ["none", "zlib", "lzma", "bz2"]
+
+CODEC_FLAGS = {"zlib": FLAG_ZLIB, "lzma": FLAG_LZMA, "bz2": FLAG_BZ2}
+CODEC_MASK = FLAG_ZLIB | FLAG_LZMA | FLAG_BZ2 | FLAG_ZDICT
+
+# raw deflate, the record crc already guards the payload
+_WBITS = -15
+
+
+def compress(codec: str, data: bytes, zdict: bytes = None, zdict_id: int = 0) -> tuple:
+    """
+    Compress a record payload.
+
+    Args:
+        codec (str): One of COMPRESSION_CODECS except "none".
+        data (bytes): The encoded payload.
+        zdict (bytes, optional): Trained dictionary, only used by zlib. Defaults to None.
+        zdict_id (int, optional): The id of `zdict`, stored in front of the payload.
+
+    Returns:
+        tuple: (compressed payload, record flags).
+    """
+    if codec == "zlib":
+        if zdict:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, _WBITS, zdict=zdict)
+            body = compressor.compress(data) + compressor.flush()
+            return zdict_id.to_bytes(4, "big") + body, FLAG_ZLIB | FLAG_ZDICT
+        compressor = zlib.compressobj(6, zlib.DEFLATED, _WBITS)
+        return compressor.compress(data) + compressor.flush(), FLAG_ZLIB
+    if codec == "lzma":
+        return lzma.compress(data, format=lzma.FORMAT_XZ, check=lzma.CHECK_NONE), FLAG_LZMA
+    if codec == "bz2":
+        return bz2.compress(data), FLAG_BZ2
+    raise ValueError(
+        f"compression = {codec} is not valid. It should be one of these: {COMPRESSION_CODECS}"
+    )
+
+
+def decompress(flags: int, data: bytes, zdicts: Callable[[int], bytes]) -> bytes:
+    """
+    Restore the payload of a record from its flags.
+
+    Args:
+        flags (int): The flags of the record.
+        data (bytes): The stored payload.
+        zdicts (Callable): Returns the trained dictionary of an id.
+
+    Returns:
+        bytes: The encoded payload, `data` itself for an uncompressed record.
+
+    Raises:
+        ValueError: If the payload does not decompress.
+    """
+    try:
+        if flags & FLAG_ZLIB:
+            if flags & FLAG_ZDICT:
+                zdict = zdicts(int.from_bytes(data[:4], "big"))
+                decompressor = zlib.decompressobj(_WBITS, zdict=zdict)
+                return decompressor.decompress(data[4:]) + decompressor.flush()
+            return zlib.decompress(data, _WBITS)
+        if flags & FLAG_LZMA:
+            return lzma.decompress(data, format=lzma.FORMAT_XZ)
+        if flags & FLAG_BZ2:
+            return bz2.decompress(data)
+    except (zlib.error, lzma.LZMAError, OSError) as e:
+        raise ValueError(f"oxd : corrupt compressed payload : {e}") from e
+    return data
+
+
+def train_zdict(samples: List[bytes], size: int = 32 << 10) -> bytes:
+    """
+    Build a zlib dictionary from sample payloads.
+
+    Deflate finds matches at the end of the dictionary with the shortest distances, the
+    distinct samples are laid out from the least to the most frequent and the last `size`
+    bytes are kept.
+
+    Args:
+        samples (list): Encoded payloads representative of the records to compress.
+        size (int, optional): Maximum size of the dictionary, deflate only looks 32 KiB back.
+
+    Returns:
+        bytes: The dictionary.
+    """
+    counts = Counter(samples)
+    ordered = sorted(counts, key=lambda sample: (counts[sample], len(sample)))
+    return b"".join(ordered)[-size:]
@@ -0,0 +1,261 @@
+"""
+OxdCompactor compacts an Oxdld data document online
+
+live byte ranges are copied into a new file in bounded chunks while
+reads and writes continue on the old one, keys written meanwhile are
+re-copied when the new file is swapped in
+"""
+
+import bisect
+import os
+import threading
+import time
+from typing import Union
+
+from oxdb_lite.oxdoc.db.record import encode_tombstone
+
+
+class OxdCompactor:
+    def __init__(
+        self,
+        oxd,
+        chunk_bytes: int = 1 << 20,
+        rate_bytes: Union[int, None] = None,
+        region_bytes: int = 1 << 20,
+        region_threshold: float = 0.1,
+    ):
+        """
+        Initialize a compactor for an Oxdld document.
+
+        Args:
+            oxd (Oxdld): The document to compact.
+            chunk_bytes (int, optional): Maximum number of bytes copied per step. Defaults to 1 MiB.
+            rate_bytes (int or None, optional): Maximum copy rate in bytes per second, None copies
+                at full speed. Defaults to None.
+            region_bytes (int, optional): Size of the regions the file is split into when planning.
+                Defaults to 1 MiB.
+            region_threshold (float, optional): Only regions with at least this share of free bytes
+                are squeezed, the free blocks of other regions are kept in the new file. Defaults to 0.1.
+        """
+        self.oxd = oxd
+        self.chunk_bytes = chunk_bytes
+        self.rate_bytes = rate_bytes
+        self.region_bytes = region_bytes
+        self.region_threshold = region_threshold
+        self.new_file_path = oxd._get_file_path("compact.oxdldd")
+
+        self.spans = []  # (old_start, old_end, new_start) of the copied ranges
+        self.kept_free = []  # free blocks inside the copied ranges
+        self.dirty = {}  # key -> index entry before the first write during compaction
+        self._starts = []
+        self.copied_bytes = 0
+        self.done = False
+        self.error = None
+        self._cancelled = False
+        self._thread = None
+
+    def touch(self, key: str, entry: Union[tuple, None]) -> None:
+        """Record a key written during compaction with its index entry from before the write."""
+        if key not in self.dirty:
+            self.dirty[key] = entry
+
+    def plan(self, end: int) -> list:
+        """
+        Plan the byte ranges to copy from the free index.
+
+        Regions whose free share is below `region_threshold` are copied whole, their free
+        blocks are carried over, only the live ranges of the other regions are copied.
+
+        Args:
+            end (int): The size of the data document.
+
+        Returns:
+            list: The planned (old_start, old_end, new_start) spans.
+        """
+        free_blocks = self.oxd.free_index.index
+        segments = []
+        for region_start in range(0, end, self.region_bytes):
+            region_end = min(region_start + self.region_bytes, end)
+            blocks = []
+            for position in free_blocks.irange(
+                maximum=region_end - 1, reverse=True
+            ):
+                length = free_blocks[position]
+                if position + length <= region_start:
+                    break
+                blocks.append(
+                    (max(position, region_start), min(position + length, region_end))
+                )
+            blocks.reverse()
+            free = sum(block_end - block_start for block_start, block_end in blocks)
+
+            if free < self.region_threshold * (region_end - region_start):
+                # free blocks cut by the region edges are squeezed, the kept ones stay
+                # whole so their tombstone header stays at their start
+                start, stop = region_start, region_end
+                for block_start, block_end in blocks:
+                    if block_start == region_start and block_start not in free_blocks:
+                        start = block_end
+                    elif block_end == region_end and free_blocks.get(block_start) != block_end - block_start:
+                        stop = block_start
+                    else:
+                        self.kept_free.append((block_start, block_end))
+                if start < stop:
+                    segments.append((start, stop))
+                continue
+            position = region_start
+            for block_start, block_end in blocks:
+                if position < block_start:
+                    segments.append((position, block_start))
+                position = block_end
+            if position < region_end:
+                segments.append((position, region_end))
+
+        new_start = 0
+        for start, stop in segments:
+            if self.spans and self.spans[-1][1] == start:
+                old_start, _, span_new_start = self.spans[-1]
+                self.spans[-1] = (old_start, stop, span_new_start)
+            else:
+                self.spans.append((start, stop, new_start))
+            new_start += stop - start
+        self._starts = [span[0] for span in self.spans]
+        return self.spans
+
+    def remap(self, position: int) -> int:
+        """Return the position in the new file of a byte copied from `position`."""
+        i = bisect.bisect_right(self._starts, position) - 1
+        if i < 0 or position >= self.spans[i][1]:
+            raise ValueError(f"oxd : position {position} was not copied by the compactor")
+        old_start, _, new_start = self.spans[i]
+        return new_start + position - old_start
+
+    def _throttle(self, started: float) -> None:
+        if self.rate_bytes:
+            wait = self.copied_bytes / self.rate_bytes - (time.monotonic() - started)
+            if wait > 0:
+                time.sleep(wait)
+
+    def run(self) -> bool:
+        """
+        Run the compaction in the calling thread.
+
+        Returns:
+            bool: True if the compacted file was swapped in, False if the run was cancelled.
+        """
+        oxd = self.oxd
+        try:
+            with oxd._lock:
+                # the commit releases the file lock once nothing is pending, it is taken after
+                # it so other processes do not write until the compacted file is swapped in
+                oxd.commit()
+                oxd._acquire_writer()
+                end = os.path.getsize(oxd._get_file_path(oxd.data_doc_name))
+                self.plan(end)
+                self.dirty = {}
+                oxd._compaction = self
+
+            started = time.monotonic()
+            with open(oxd._get_file_path(oxd.data_doc_name), "rb") as old_file, open(
+                self.new_file_path, "wb"
+            ) as new_file:
+                for old_start, old_end, _ in self.spans:
+                    position = old_start
+                    while position < old_end:
+                        if self._cancelled:
+                            break
+                        old_file.seek(position)
+                        chunk = old_file.read(min(self.chunk_bytes, old_end - position))
+                        new_file.write(chunk)
+                        position += len(chunk)
+                        self.copied_bytes += len(chunk)
+                        self._throttle(started)
+
+                if self._cancelled:
+                    raise InterruptedError
+
+                with oxd._lock:
+                    self._finish(old_file, new_file)
+            self.done = True
+            return True
+        except InterruptedError:
+            return False
+        finally:
+            with oxd._lock:
+                if oxd._compaction is self:
+                    oxd._compaction = None
+                oxd._release_writer()
+            if os.path.exists(self.new_file_path):
+                os.remove(self.new_file_path)
+
+    def _finish(self, old_file, new_file) -> None:
+        """Copy the keys written during compaction and swap the new file in, holds the lock."""
+        oxd = self.oxd
+        new_index = {}
+        new_free = []
+        for old_start, old_end in self.kept_free:
+            new_free.append((self.remap(old_start), old_end - old_start))
+        for key, entry in self.dirty.items():
+            if entry is not None:
+                new_free.append((self.remap(entry[0]), entry[1]))
+
+        # merge the released slots and write their tombstones, the dirty keys copied
+        # below must not be recovered from their stale copies
+        merged = []
+        for position, length in sorted(new_free):
+            if merged and merged[-1][0] + merged[-1][1] == position:
+                merged[-1] = (merged[-1][0], merged[-1][1] + length)
+            else:
+                merged.append((position, length))
+        end = new_file.tell()
+        for position, length in merged:
+            new_file.seek(position)
+            new_file.write(encode_tombstone(length))
+        new_file.seek(end)
+        new_free = merged
+
+        for key, (position, length) in oxd.index.items():
+            if key in self.dirty:
+                old_file.seek(position)
+                new_file.write(old_file.read(length))
+                new_index[key] = (end, length)
+                end += length
+            else:
+                new_index[key] = (self.remap(position), length)
+
+        new_file.flush()
+        if oxd.durability != "os":
+            os.fsync(new_file.fileno())
+        oxd._swap_compacted(self.new_file_path, new_index, new_free)
+
+    def start(self) -> "OxdCompactor":
+        """Run the compaction in a background thread."""
+        self._thread = threading.Thread(target=self._run_background, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run_background(self):
+        try:
+            self.run()
+        except Exception as e:
+            self.error = e
+
+    def wait(self, timeout: Union[float, None] = None) -> bool:
+        """
+        Wait for a background compaction to end.
+
+        Returns:
+            bool: True if the compacted file was swapped in.
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.done
+
+    def cancel(self) -> None:
+        """Stop the compaction, the data document is left untouched."""
+        self._cancelled = True
+
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
@@ -1,56 +1,143 @@
-from sortedcontainers import SortedDict
+from sortedcontainers import SortedDict, SortedList
+
+FIT_POLICIES = ["first", "best", "size-class"]
 
 
 class FreeIndex:
-    def __init__(self):
+    def __init__(self, fit_policy: str = "best"):
+        """
+        Index of the free blocks of a data document.
+
+        Args:
+            fit_policy (str, optional): How find_space picks a block. Defaults to "best".
+                - "first" : the lowest positioned block that fits (linear scan)
+                - "best" : the smallest block that fits, lowest position on ties
+                - "size-class" : the lowest positioned block of the smallest power of two
+                  size class that fits
+        """
+        if fit_policy not in FIT_POLICIES:
+            raise ValueError(
+                f"fit_policy = {fit_policy} is not valid. It should be one of these: {FIT_POLICIES}"
+            )
+        self.fit_policy = fit_policy
         # SortedDict to store free blocks where keys are positions and values are lengths
         self.index = SortedDict()
+        # the same blocks ordered by size as (length, position)
+        self.sizes = SortedList()
+        # size class (length.bit_length()) -> positions of the blocks in that class
+        self.classes = {}
+        self.free_bytes = 0  # total length of all free blocks
+
+    def _insert(self, position, length):
+        self.index[position] = length
+        self.sizes.add((length, position))
+        size_class = length.bit_length()
+        if size_class not in self.classes:
+            self.classes[size_class] = SortedList()
+        self.classes[size_class].add(position)
+
+    def _remove(self, position):
+        length = self.index.pop(position)
+        self.sizes.remove((length, position))
+        size_class = length.bit_length()
+        self.classes[size_class].remove(position)
+        if not self.classes[size_class]:
+            del self.classes[size_class]
+        return length
 
     def find_space(self, size):
         """Find a suitable space from the free index or append to the end of the file."""
-        # Search for a suitable block in the free index
+        position = self._fit(size)
+        if position is None:
+            # If no suitable free block is found, append to the end of the file
+            return "EOF"
+        self.take(position, size)
+        return position
+
+    def find_block(self, size):
+        """Return the (position, length) free block the fit policy picks for `size`, None if nothing fits."""
+        position = self._fit(size)
+        if position is None:
+            return None
+        return position, self.index[position]
+
+    def _fit(self, size):
+        """Return the position of the free block picked by the fit policy, None if nothing fits."""
+        if not self.sizes or self.sizes[-1][0] < size:
+            return None
+
+        if self.fit_policy == "best":
+            return self.sizes[self.sizes.bisect_left((size, -1))][1]
+
+        if self.fit_policy == "size-class":
+            # every block of a class above the one of `size - 1` is large enough
+            min_class = (size - 1).bit_length() + 1
+            fitting = [c for c in self.classes if c >= min_class]
+            if fitting:
+                return self.classes[min(fitting)][0]
+            for position in self.classes.get(min_class - 1, ()):
+                if self.index[position] >= size:
+                    return position
+            return None
+
         for position, length in self.index.items():
             if length >= size:
-                # Remove the free block from the index
-                del self.index[position]
-
-                # If there's remaining space, reinsert the remaining part back into the free index
-                if length > size:
-                    self.index[position + size] = length - size
-                # print(position,"ls : ",self.index)
-                # Return the position of the allocated block
                 return position
+        return None
+
+    def take(self, position, size):
+        """Allocate `size` bytes from the start of the free block at `position`."""
+        # Remove the free block from the index
+        length = self._remove(position)
+        self.free_bytes -= size
 
-        # print("EOF","ls : ",self.index)
-        # # If no suitable free block is found, append to the end of the file
-        # file.seek(0, 2)  # Move to the end of the file
-        # file.tell() # end of the file position
-        return "EOF"
+        # If there's remaining space, reinsert the remaining part back into the free index
+        if length > size:
+            self._insert(position + size, length - size)
 
     def add(self, position, length):
         """Add a free block to the free index, merging with adjacent blocks if possible."""
-        # Get the neighboring blocks for merging
-        prev_pos = self.index.peekitem(-1)[0] if len(self.index) > 0 else None
-        next_pos = self.index.bisect_right(position)
-
-        prev_pos = self.index.peekitem(next_pos - 1)[0] if next_pos > 0 else None
-        next_pos = (
-            self.index.peekitem(next_pos)[0] if next_pos < len(self.index) else None
-        )
+        self.free_bytes += length
+        next_i = self.index.bisect_right(position)
 
         # Check if it can merge with the previous block
-        if prev_pos is not None and prev_pos + self.index[prev_pos] == position:
-            self.index[prev_pos] += length
-            position = (
-                prev_pos  # Update position to merge with the next block if needed
-            )
-        else:
-            self.index[position] = length
+        if next_i > 0:
+            prev_pos, prev_length = self.index.peekitem(next_i - 1)
+            if prev_pos + prev_length == position:
+                self._remove(prev_pos)
+                position = prev_pos
+                length += prev_length
 
         # Check if it can merge with the next block
-        if next_pos is not None and position + self.index[position] == next_pos:
-            self.index[position] += self.index[next_pos]
-            del self.index[next_pos]
+        next_pos = position + length
+        if next_pos in self.index:
+            length += self._remove(next_pos)
+
+        self._insert(position, length)
+
+    def stats(self):
+        """
+        Return fragmentation statistics of the free space.
+
+        Returns:
+            dict: number of blocks, free bytes, smallest / largest / average block,
+                fragmentation (1 - largest block / free bytes) and the block count per
+                size class keyed by the class upper bound.
+        """
+        blocks = len(self.index)
+        largest = self.sizes[-1][0] if blocks else 0
+        return {
+            "blocks": blocks,
+            "free_bytes": self.free_bytes,
+            "smallest": self.sizes[0][0] if blocks else 0,
+            "largest": largest,
+            "average": self.free_bytes / blocks if blocks else 0,
+            "fragmentation": 1 - largest / self.free_bytes if self.free_bytes else 0.0,
+            "size_classes": {
+                1 << size_class: len(positions)
+                for size_class, positions in sorted(self.classes.items())
+            },
+        }
 
     def get_dict(self):
         """Return the free index as a dict """
@@ -61,6 +148,9 @@ class FreeIndex:
     def set_dict(self, index_dict):
         """Set the free index from a dict """
         # Convert regular dictionary to a SortedDict and convert string keys back to integers
-        self.index = SortedDict(
-            {int(position): length for position, length in index_dict.items()}
-        )
\ No newline at end of file
+        self.index = SortedDict()
+        self.sizes = SortedList()
+        self.classes = {}
+        for position, length in index_dict.items():
+            self._insert(int(position), length)
+        self.free_bytes = sum(self.index.values())
@@ -0,0 +1,174 @@
+"""
+OxdJournal is an append-only log of index deltas
+written between two OxdMem checkpoints and replayed on load
+"""
+
+import os
+from typing import List, Union
+
+from oxdb_lite.oxdoc.dp import DBin
+from oxdb_lite.oxdoc.utils import doc_validator
+
+
+class OxdJournal:
+    def __init__(self, doc: str, data_encoding="oxdbin"):
+        """
+        Initialize the journal that holds the index changes made since the last checkpoint.
+
+        The journal file is a sequence of entries, each entry is a 4 byte length followed by
+        the encoded list of delta records of one commit. The first entry is the header
+        `["h", seq]` that ties the journal to the checkpoint it extends.
+
+        Args:
+            doc (str): The name of the journal or its path (e.g., "index" or "/home/user/index.oxdjournal.bin").
+            data_encoding (str, optional): The encoding method used for the entries. Defaults to "oxdbin".
+        """
+        self.doc, self.doc_path = doc_validator(doc, extention=".oxdjournal.bin")
+        self.dbin = DBin(method=data_encoding)
+        self.seq = None
+        self.count = 0
+        self.offset = 0  # end of the last entry read or written
+
+    def _encode_entry(self, records: List[list]) -> bytes:
+        entry = self.dbin.encode(records)
+        return len(entry).to_bytes(4, "big") + entry
+
+    def _read_entries(self, data: bytes, pos: int) -> tuple:
+        """Decode the complete entries of `data` from `pos`, returns (entries, end of the last one)."""
+        entries = []
+        while pos + 4 <= len(data):
+            length = int.from_bytes(data[pos : pos + 4], "big")
+            if pos + 4 + length > len(data):
+                break
+            try:
+                entry = self.dbin.decode(data[pos + 4 : pos + 4 + length])
+            except ValueError:
+                break
+            pos += 4 + length
+            entries.append(entry)
+        return entries, pos
+
+    def replay(self, seq: int, repair: bool = True) -> List[list]:
+        """
+        Read the delta records that belong to the checkpoint `seq`.
+
+        A journal written for another checkpoint is stale (its changes are already part of
+        the checkpoint) and is ignored. A torn entry at the end of the file, left by a crash
+        while appending, is discarded together with everything after it.
+
+        Args:
+            seq (int): The sequence number of the loaded checkpoint.
+            repair (bool, optional): Truncate a torn entry, only the writer of the journal
+                may do so. Defaults to True.
+
+        Returns:
+            list: The delta records in the order they were committed.
+        """
+        self.seq = seq
+        self.count = 0
+        self.offset = 0
+        if not os.path.exists(self.doc_path):
+            return []
+
+        with open(self.doc_path, "rb") as file:
+            data = file.read()
+
+        entries, pos = self._read_entries(data, 0)
+        if not entries or list(entries[0]) != ["h", seq]:
+            return []
+        records = [record for entry in entries[1:] for record in entry]
+
+        if pos < len(data) and repair:
+            with open(self.doc_path, "r+b") as file:
+                file.truncate(pos)
+
+        self.count = len(records)
+        self.offset = pos
+        return records
+
+    def tail(self) -> Union[List[list], None]:
+        """
+        Read the delta records appended by another process since the last replay, append or tail.
+
+        Returns:
+            list or None: The new delta records, an entry still being written is left for the
+                next call. None if the journal was reset or replaced meanwhile, the records
+                read so far no longer lead to it and the checkpoint must be loaded again.
+        """
+        header = self._encode_entry(["h", self.seq])
+        try:
+            file = open(self.doc_path, "rb")
+        except FileNotFoundError:
+            return None if self.offset else []
+        with file:
+            if os.fstat(file.fileno()).st_size < self.offset:
+                return None
+            head = file.read(len(header))
+            if head != header[: len(head)] or (self.offset and head != header):
+                return None  # written for another checkpoint
+            if head != header:
+                return []  # created after the replay, its header is not complete yet
+            start = max(self.offset, len(header))
+            file.seek(start)
+            data = file.read()
+        entries, pos = self._read_entries(data, 0)
+        records = [record for entry in entries for record in entry]
+        self.offset = start + pos
+        self.count += len(records)
+        return records
+
+    def append(self, records: List[list], fsync: bool = False) -> int:
+        """
+        Append the delta records of one commit to the journal.
+
+        Args:
+            records (list): The delta records to persist.
+            fsync (bool, optional): Wait until the entry is on disk. Defaults to False.
+
+        Returns:
+            int: The size in bytes of the appended entry.
+        """
+        if not records:
+            return 0
+        if self.seq is None:
+            raise ValueError("oxd : journal must be replayed or reset before appending")
+        entry = self._encode_entry(records)
+        with open(self.doc_path, "ab") as file:
+            if file.tell() == 0:
+                file.write(self._encode_entry(["h", self.seq]))
+            file.write(entry)
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+            self.offset = file.tell()
+        self.count += len(records)
+        return len(entry)
+
+    def reset(self, seq: int, fsync: bool = False) -> None:
+        """
+        Start an empty journal for the checkpoint `seq`.
+
+        Args:
+            seq (int): The sequence number of the new checkpoint.
+            fsync (bool, optional): Wait until the new journal is on disk. Defaults to False.
+        """
+        tmp_path = self.doc_path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(self._encode_entry(["h", seq]))
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(tmp_path, self.doc_path)
+        self.seq = seq
+        self.count = 0
+        self.offset = len(self._encode_entry(["h", seq]))
+
+    def remove(self) -> None:
+        """Delete the journal file."""
+        if os.path.exists(self.doc_path):
+            os.remove(self.doc_path)
+        self.count = 0
+        self.offset = 0
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,320 @@
+"""
+KeyIndex maps the keys of an Oxdld document to their records
+
+the index written at a checkpoint is a packed file of sorted keys with
+position / length arrays and an open addressing hash table, it is memory
+mapped and queried in place, the writes made since the checkpoint live in
+a small dict overlay on top of it
+
+both sides are kept in key order, numeric keys first, so key ranges and
+prefixes are found by binary search without listing the whole index
+"""
+
+import heapq
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import MutableMapping
+from typing import Iterable, Iterator, List, Tuple, Union
+
+from sortedcontainers import SortedList
+
+# magic, version, checkpoint seq, key count, hash table size, key bytes
+HEADER = struct.Struct("<4sIQQQQ")
+MAGIC = b"OXDK"
+VERSION = 1
+
+_DELETED = None  # overlay value of a key deleted from the packed index
+
+
+def sort_key(key: str) -> tuple:
+    """
+    Order of the keys in the index, decimal integer keys (as generated by UIDX) come first
+    in numeric order, the other keys follow in string order.
+    """
+    if key.isascii() and key.isdigit() and (key[0] != "0" or len(key) == 1):
+        return (0, len(key), key)
+    return (1, 0, key)
+
+
+def _slot(key_bytes: bytes, mask: int) -> int:
+    return zlib.crc32(key_bytes) & mask
+
+
+def _view(buffer, offset: int, count: int, fmt: str):
+    """Return `count` little endian items of `fmt` at `offset`, in place when the host is little endian."""
+    size = array(fmt).itemsize
+    view = memoryview(buffer)[offset : offset + count * size]
+    if sys.byteorder == "little":
+        return view.cast(fmt)
+    values = array(fmt, view)
+    values.byteswap()
+    return values
+
+
+def _packed(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    data = values.tobytes()
+    return data + b"\0" * (-len(data) % 8)
+
+
+def write_packed(
+    path: str, items: Iterable[Tuple[str, tuple]], seq: int = 0, fsync: bool = False
+) -> None:
+    """
+    Write a packed index file.
+
+    Args:
+        path (str): The path of the file, it is written next to it and swapped in.
+        items (Iterable): The (key, (position, length)) entries.
+        seq (int, optional): The checkpoint the index belongs to. Defaults to 0.
+        fsync (bool, optional): Wait until the file is on disk. Defaults to False.
+    """
+    entries = sorted(items, key=lambda item: sort_key(item[0]))
+    count = len(entries)
+    table_size = 8
+    while table_size < count * 2:
+        table_size *= 2
+    mask = table_size - 1
+
+    key_offsets = array("Q", [0])
+    positions = array("Q")
+    lengths = array("Q")
+    table = array("I", bytes(4 * table_size))
+    keys = []
+    end = 0
+    for i, (key, (position, length)) in enumerate(entries):
+        key_bytes = key.encode("utf-8")
+        keys.append(key_bytes)
+        end += len(key_bytes)
+        key_offsets.append(end)
+        positions.append(position)
+        lengths.append(length)
+        slot = _slot(key_bytes, mask)
+        while table[slot]:
+            slot = (slot + 1) & mask
+        table[slot] = i + 1
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, seq, count, table_size, end))
+        for values in (key_offsets, positions, lengths, table):
+            file.write(_packed(values))
+        file.write(b"".join(keys))
+        if fsync:
+            file.flush()
+            os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class PackedKeys:
+    def __init__(self, path: str):
+        """
+        Map a packed index file.
+
+        Args:
+            path (str): The path of the file.
+
+        Raises:
+            ValueError: If the file is not a packed index.
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.seq, self.count, table_size, keys_len = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"oxd : {path} is not a packed key index")
+        offset = HEADER.size
+        self.key_offsets = _view(self._mmap, offset, self.count + 1, "Q")
+        offset += (self.count + 1) * 8
+        self.positions = _view(self._mmap, offset, self.count, "Q")
+        offset += self.count * 8
+        self.lengths = _view(self._mmap, offset, self.count, "Q")
+        offset += self.count * 8
+        self.table = _view(self._mmap, offset, table_size, "I")
+        offset += table_size * 4 + (-(table_size * 4) % 8)
+        self.keys = memoryview(self._mmap)[offset : offset + keys_len]
+        self.mask = table_size - 1
+
+    def find(self, key: str) -> int:
+        """Return the position of `key` in the sorted arrays, -1 if it is not in the index."""
+        key_bytes = key.encode("utf-8")
+        table, key_offsets, keys = self.table, self.key_offsets, self.keys
+        slot = _slot(key_bytes, self.mask)
+        while True:
+            i = table[slot]
+            if not i:
+                return -1
+            i -= 1
+            if keys[key_offsets[i] : key_offsets[i + 1]] == key_bytes:
+                return i
+            slot = (slot + 1) & self.mask
+
+    def bisect(self, bound: tuple) -> int:
+        """Return the position of the first key whose `sort_key` is not below `bound`."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if sort_key(self.key(mid)) < bound:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def key(self, i: int) -> str:
+        return bytes(self.keys[self.key_offsets[i] : self.key_offsets[i + 1]]).decode("utf-8")
+
+    def entry(self, i: int) -> tuple:
+        return (self.positions[i], self.lengths[i])
+
+    def __len__(self):
+        return self.count
+
+
+class KeyIndex(MutableMapping):
+    def __init__(self, path: Union[str, None] = None, entries: Union[dict, None] = None):
+        """
+        Initialize the index of an Oxdld document.
+
+        Args:
+            path (str, optional): A packed index file to map. Defaults to None.
+            entries (dict, optional): Entries of a document without a packed index, they are
+                kept in the overlay. Defaults to None.
+        """
+        self.base = PackedKeys(path) if path is not None else None
+        self.overlay = {}  # key -> (position, length), None for a key deleted from the base
+        self._sorted = SortedList(key=sort_key)  # the overlay keys in key order
+        self._len = len(self.base) if self.base is not None else 0
+        for key, entry in (entries or {}).items():
+            self[key] = entry
+
+    def _base_get(self, key: str) -> Union[tuple, None]:
+        if self.base is None:
+            return None
+        i = self.base.find(key)
+        return self.base.entry(i) if i >= 0 else None
+
+    def get(self, key: str, default=None):
+        entry = self.overlay.get(key, self)
+        if entry is self:
+            entry = self._base_get(key)
+        return default if entry is None else entry
+
+    def __getitem__(self, key: str) -> tuple:
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self.get(key) is not None
+
+    def __setitem__(self, key: str, entry: tuple) -> None:
+        if key not in self:
+            self._len += 1
+        if key not in self.overlay:
+            self._sorted.add(key)
+        self.overlay[key] = tuple(entry)
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        if self._base_get(key) is not None:
+            self.overlay[key] = _DELETED
+        else:
+            del self.overlay[key]
+            self._sorted.remove(key)
+        self._len -= 1
+
+    def __len__(self):
+        return self._len
+
+    def clear(self) -> None:
+        self.base = None
+        self.overlay = {}
+        self._sorted = SortedList(key=sort_key)
+        self._len = 0
+
+    def _base_items(self, overlay: dict) -> Iterator[Tuple[str, tuple]]:
+        base = self.base
+        if base is None:
+            return
+        for i in range(len(base)):
+            key = base.key(i)
+            if key not in overlay:
+                yield key, base.entry(i)
+
+    def items(self) -> Iterator[Tuple[str, tuple]]:
+        """Iterate the (key, entry) pairs in key order."""
+        overlay = dict(self.overlay)  # a snapshot, writers may change the overlay meanwhile
+        added = sorted(
+            ((key, entry) for key, entry in overlay.items() if entry is not _DELETED),
+            key=lambda item: sort_key(item[0]),
+        )
+        return heapq.merge(self._base_items(overlay), added, key=lambda item: sort_key(item[0]))
+
+    def irange(
+        self, lo: Union[tuple, None] = None, hi: Union[tuple, None] = None, reverse: bool = False
+    ) -> Iterator[str]:
+        """
+        Iterate the keys whose `sort_key` is in [lo, hi) in key order, the index must not be
+        changed while the iterator is used.
+
+        Args:
+            lo (tuple, optional): Inclusive lower bound, None for no bound. Defaults to None.
+            hi (tuple, optional): Exclusive upper bound, None for no bound. Defaults to None.
+            reverse (bool, optional): Iterate from the last key. Defaults to False.
+        """
+        base, overlay = self.base, self.overlay
+        start, stop = 0, 0
+        if base is not None:
+            start = base.bisect(lo) if lo is not None else 0
+            stop = base.bisect(hi) if hi is not None else len(base)
+        positions = range(stop - 1, start - 1, -1) if reverse else range(start, stop)
+        base_keys = (key for key in map(base.key, positions) if key not in overlay) if base else ()
+        added = (
+            key
+            for key in self._sorted.irange_key(lo, hi, inclusive=(True, False), reverse=reverse)
+            if overlay[key] is not _DELETED
+        )
+        return heapq.merge(base_keys, added, key=sort_key, reverse=reverse)
+
+    def prefix_ranges(self, prefix: str) -> List[Tuple[tuple, tuple]]:
+        """
+        Return the [lo, hi) `sort_key` bounds holding the keys that start with `prefix`, in key
+        order. Numeric keys of each length are ordered apart, so a numeric prefix spans one
+        range per key length.
+        """
+        if not prefix:
+            return [(None, None)]
+        after = prefix[:-1] + chr(ord(prefix[-1]) + 1)  # the first string past the prefix
+        ranges = []
+        if prefix.isascii() and prefix.isdigit():
+            for length in range(len(prefix), self._longest_numeric() + 1):
+                pad = "0" * (length - len(prefix))
+                ranges.append(((0, length, prefix + pad), (0, length, after + pad)))
+        ranges.append(((1, 0, prefix), (1, 0, after)))
+        return ranges
+
+    def _longest_numeric(self) -> int:
+        """Return the length of the largest numeric key, the numeric keys end before (1,)."""
+        longest = 0
+        if self.base is not None:
+            i = self.base.bisect((1,))
+            longest = len(self.base.key(i - 1)) if i else 0
+        i = self._sorted.bisect_key_left((1,))
+        return max(longest, len(self._sorted[i - 1]) if i else 0)
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key, _ in self.items())
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [entry for _, entry in self.items()]
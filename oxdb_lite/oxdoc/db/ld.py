@@ -5,21 +5,98 @@ disk presisted key-vaue database
 
 """
 
+import atexit
+import bisect
+import io
+import itertools
+import mmap
 import os
-from typing import Any, Union
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Union
 import zipfile
 
-from oxdb_lite.oxdoc.dp import DBIN_METHODS, DBin
-from oxdb_lite.oxdoc.db.cache import LRUCache
+try:
+    import numpy
+except ImportError:  # values are never numpy arrays then
+    numpy = None
+
+from oxdb_lite.oxdoc.dp import DBIN_METHODS, DBin, pick_fields
+from oxdb_lite.oxdoc.db.cache import make_cache
+from oxdb_lite.oxdoc.db.codec import (
+    CODEC_MASK,
+    COMPRESSION_CODECS,
+    compress,
+    decompress,
+    train_zdict,
+)
 from oxdb_lite.oxdoc.db.mem import OxdMem
+from oxdb_lite.oxdoc.db.journal import OxdJournal
+from oxdb_lite.oxdoc.db.compactor import OxdCompactor
 from oxdb_lite.oxdoc.db.freeindex import FreeIndex
+from oxdb_lite.oxdoc.db.keyindex import KeyIndex, sort_key, write_packed
+from oxdb_lite.oxdoc.db.lock import FileLock
+from oxdb_lite.oxdoc.db.symbols import SymbolTable
+from oxdb_lite.oxdoc.db.record import (
+    FLAG_BLOB,
+    HEADER_SIZE,
+    RECORD_FORMAT,
+    TOMBSTONE_MAGIC,
+    decode_header,
+    decode_record,
+    encode_record,
+    encode_tombstone,
+    record_length,
+)
 from oxdb_lite.oxdoc.utils import doc_validator
 
+DURABILITY_MODES = ["always", "batched", "os"]
 
+# documents smaller than this are never compacted automatically
+COMPACT_MIN_BYTES = 1 << 20
+
+# records appended by one add are written in chunks of about this many bytes
+APPEND_CHUNK = 8 << 20
+
+# cache lookup sentinel, None is a valid cached value
+_MISSING = object()
+
+# docs holding batched writes that still need a sync before the interpreter exits
+_batched_docs = weakref.WeakSet()
+
+
+@atexit.register
+def _sync_batched_docs():
+    for doc in list(_batched_docs):
+        doc.sync()
 
 
 class Oxdld:
-    def __init__(self, doc: str, data_encoding="oxdbin", cache_capacity=25):
+    def __init__(
+        self,
+        doc: str,
+        data_encoding="oxdbin",
+        cache_capacity=25,
+        cache_bytes=None,
+        cache_policy="lru",
+        checkpoint_ops=4096,
+        durability="os",
+        sync_interval_ms=50,
+        sync_ops=256,
+        compact_threshold=0.5,
+        compact_rate=None,
+        fit_policy="best",
+        mmap_reads=False,
+        txn=None,
+        shared=False,
+        blob_threshold=1 << 20,
+        compression=None,
+        compress_threshold=256,
+        symbols=False,
+        readonly=False,
+    ):
         """
         Initialize instances of the Oxdld class to handle log data storage and retrieval.
 
@@ -27,19 +104,163 @@ class Oxdld:
             doc (str): The name of the oxd document or its path (e.g., "note" or "/home/user/note.oxdld").
             data_encoding (str, optional): The encoding method to use for storing data. Defaults to "oxdbin"
                 - data encoding methods [ "oxdbin","json"]
+            cache_capacity (int, optional): Maximum number of values kept in the LRU cache, None for
+                no count limit. Defaults to 25.
+            cache_bytes (int, optional): Maximum encoded size in bytes of the cached values, None for
+                no byte limit. Defaults to None.
+            cache_policy (str, optional): Eviction policy of the value cache. Defaults to "lru".
+                - cache policies [ "lru","2q","tinylfu"]
+            checkpoint_ops (int, optional): Minimum number of journaled index changes before they are
+                folded into the index file. The journal is also allowed to grow up to the number of keys,
+                so the cost of a checkpoint stays amortized O(1) per write. Defaults to 4096.
+            durability (str, optional): When written data and index changes reach the disk. Defaults to "os".
+                - "always" : every write is committed and fsynced before it returns,
+                  concurrent writers share one fsync (group commit)
+                - "batched" : writes are committed and fsynced together once `sync_ops`
+                  writes are pending or `sync_interval_ms` has passed
+                - "os" : every write is committed to the os buffers without fsync
+            sync_interval_ms (int, optional): Maximum age of a pending batched write. Defaults to 50.
+            sync_ops (int, optional): Maximum number of pending batched writes. Defaults to 256.
+            compact_threshold (float, optional): Fragmentation ratio (free bytes / file size) above which
+                a background compaction is started on open or after a write, None disables automatic
+                compaction. Defaults to 0.5.
+            compact_rate (int, optional): Copy rate limit in bytes per second of the automatic
+                background compactions, None copies at full speed. Defaults to None.
+            fit_policy (str, optional): How free space is picked for new records. Defaults to "best".
+                - fit policies [ "first","best","size-class"]
+            mmap_reads (bool, optional): Serve reads by slicing a memory map of the data document
+                instead of pread calls on the open file handle. Defaults to False.
+            txn (OxdTxn, optional): The transaction log shared with other documents, the commits
+                of its batches are replayed on open and records written after the last commit are
+                dropped instead of recovered. Defaults to None.
+            shared (bool, optional): Coordinate with other processes opening the same document,
+                writers take an advisory file lock and catch up with the commits of the others,
+                readers reload the index changes when the generation of the document moved.
+                Needs fcntl, without it the lock is a no-op. Defaults to False.
+            blob_threshold (int, optional): Encoded size in bytes from which a value is stored in a
+                blob file of its own, the record in the data document only references it. Blob
+                values are read on demand, never cached and not copied by compaction, None keeps
+                every value inline. Defaults to 1 MiB.
+            compression (str, optional): Codec compressing the records written from now on, None keeps
+                the codec recorded in the document config ("none" for a new document). Records keep
+                the codec they were written with. Defaults to None.
+                - compression codecs [ "none","zlib","lzma","bz2"]
+            compress_threshold (int, optional): Encoded size in bytes below which a record is stored
+                uncompressed. Defaults to 256.
+            symbols (bool, optional): Store the dict keys and short string values repeated across
+                the records as ids of a symbol table kept next to the data document, only with the
+                "oxdbin" encoding. Records written without it stay readable, a document that already
+                has a symbol table keeps using it since its records refer to it. Defaults to False.
+            readonly (bool, optional): Open an existing document only to read it, nothing is ever
+                written, repaired or compacted and the data document is memory mapped so processes
+                reading the same document share its pages. Writes raise a ValueError. Defaults to False.
         """
+        if durability not in DURABILITY_MODES:
+            raise ValueError(
+                f"durability = {durability} is not valid. It should be one of these: {DURABILITY_MODES}"
+            )
+        if compression is not None and compression not in COMPRESSION_CODECS:
+            raise ValueError(
+                f"compression = {compression} is not valid. It should be one of these: {COMPRESSION_CODECS}"
+            )
         self.dbin = DBin(method=data_encoding)
         self.doc, self.doc_path = doc_validator(doc, extention=".oxdld")
-        os.makedirs(self.doc_path, exist_ok=True)
-
-        self.free_index = FreeIndex()
-        self.lrucache = LRUCache(capacity=cache_capacity)
-        self._create_data_doc()
-        self.index_data = OxdMem(
-            self._get_file_path("index"), data_encoding=data_encoding
-        )
+        self.readonly = readonly
+        if readonly:
+            if not os.path.isdir(self.doc_path):
+                raise ValueError(f"oxd : document {self.doc_path} does not exist")
+            mmap_reads = True
+        else:
+            os.makedirs(self.doc_path, exist_ok=True)
+
+        self.free_index = FreeIndex(fit_policy=fit_policy)
+        self.lrucache = make_cache(cache_policy, capacity=cache_capacity, max_bytes=cache_bytes)
+        self.checkpoint_ops = checkpoint_ops
+        self.durability = durability
+        self.sync_interval_ms = sync_interval_ms
+        self.sync_ops = sync_ops
+        self.compact_threshold = compact_threshold
+        self.compact_rate = compact_rate
+        self.compactor = None  # the last started OxdCompactor
+        self._compaction = None  # the OxdCompactor copying the data document right now
+        self._deltas = []
+        self._pending_free = []  # slots released since the last commit, reusable after it
+        self._pending_blobs = []  # blob files released since the last commit, removed after it
+        self.blob_threshold = blob_threshold
+        self.compress_threshold = compress_threshold
+        self._zdicts = {}  # id -> trained zlib dictionary
+        self.symbols = None
+        symbols_path = self._get_file_path("index.oxdsym.bin")
+        if data_encoding == "oxdbin" and (symbols or os.path.exists(symbols_path)):
+            self.symbols = SymbolTable(symbols_path, readonly=readonly)
+        self._seq = 0  # sequence number of the last written record
+        self._undo = None  # state to restore if the running transaction batch fails
+        self.txn = txn
+        self._lock = threading.RLock()  # serializes writers and commits
+        self._sync_lock = threading.Lock()  # serializes fsync calls
+        self._group_depth = 0
+        self._pending_ops = 0
+        self._sync_timer = None
+        self._commit_seq = 0  # last commit appended to the journal
+        self._synced_seq = 0  # last commit known to be on disk
+        self.mmap_reads = mmap_reads
+        self._file = None  # long lived unbuffered read/write handle of the data document
+        self._data_size = 0  # end of the data document, valid while the handle is open
+        self._mmap = None
+        self._io_lock = threading.Lock()  # guards opening the handle and seek + read/write without pread/pwrite
+        lock_path = self._get_file_path("index.oxdlock.bin")
+        if shared and readonly:
+            # a readonly handle only follows the generation of a document shared by writers
+            self._file_lock = FileLock(lock_path, readonly=True) if os.path.exists(lock_path) else None
+        else:
+            self._file_lock = FileLock(lock_path) if shared else None
+        self._writer_held = False  # this process holds the file lock
+        self._generation = 0  # generation of the document the index is in line with
+        if readonly:
+            self._open_readonly(data_encoding)
+            return
+        with self._lock:
+            # opening may repair the files, other processes must not write meanwhile
+            if self._file_lock is not None:
+                self._file_lock.acquire()
+                self._writer_held = True
+                self._generation = self._file_lock.read_state()[0]
+            self._create_data_doc()
+            self._recover_compaction()
+            self.index_data = OxdMem(
+                self._get_file_path("index"), data_encoding=data_encoding
+            )
+            self.journal = OxdJournal(
+                self._get_file_path("index"), data_encoding=data_encoding
+            )
+            self.load_index()
+            if txn is not None:
+                txn.attach(self.doc, self)
+            self._check_data_doc()
+            if compression is not None and compression != self.config.get("compression", "none"):
+                self.config["compression"] = compression
+                self.save_index()
+            self._release_writer()
+        self._maybe_compact()
+
+    def _open_readonly(self, data_encoding: str) -> None:
+        """Load the last committed state of the document without touching its files."""
+        self.data_doc_name = f"{self.doc}.oxdldd.bin"
+        if not os.path.exists(self._get_file_path(self.data_doc_name)):
+            raise ValueError(f"oxd : document {self.doc_path} has no data document")
+        if self._file_lock is not None:
+            self._generation = self._file_lock.read_state()[0]
+        self.index_data = OxdMem(self._get_file_path("index"), data_encoding=data_encoding)
+        self.journal = OxdJournal(self._get_file_path("index"), data_encoding=data_encoding)
         self.load_index()
-        self.compact()
+        if self.config.get("record_format") is None and self.index:
+            raise ValueError(
+                f"oxd : document {self.doc_path} has the legacy format, open it writable once to migrate it"
+            )
+
+    def _check_writable(self) -> None:
+        if self.readonly:
+            raise ValueError(f"oxd : document {self.doc_path} is opened readonly")
 
     def _get_file_path(self, file_name: str) -> str:
         """
@@ -63,41 +284,605 @@ class Oxdld:
             with open(data_doc_path, "w") as f:
                 pass
 
+    def _data_file(self):
+        """Return the long lived handle of the data document, opening it on first use."""
+        file = self._file
+        if file is None:
+            with self._io_lock:
+                file = self._file
+                if file is None:
+                    mode = "rb" if self.readonly else "r+b"
+                    file = open(self._get_file_path(self.data_doc_name), mode, buffering=0)
+                    self._data_size = os.fstat(file.fileno()).st_size
+                    self._file = file
+        return file
+
+    def _close_files(self) -> None:
+        """Close the data document handle and its memory map, they are reopened on demand."""
+        self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read(self, file_position: int, length: int) -> bytes:
+        """Read `length` bytes of the data document at `file_position`."""
+        file = self._data_file()
+        if self.mmap_reads and self._data_size:
+            mapping = self._mmap
+            if mapping is None or file_position + length > len(mapping):
+                # the file grew past the mapping, readers still holding the old map keep it alive
+                mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                with self._io_lock:
+                    if self._file is file:  # not a handle dropped by a compaction meanwhile
+                        self._mmap = mapping
+            return mapping[file_position : file_position + length]
+        if hasattr(os, "pread"):
+            return os.pread(file.fileno(), length, file_position)
+        with self._io_lock:
+            file.seek(file_position)
+            return file.read(length)
+
+    def _write(self, file_position: int, data: bytes) -> None:
+        """Write `data` to the data document at `file_position`."""
+        file = self._data_file()
+        if hasattr(os, "pwrite"):
+            os.pwrite(file.fileno(), data, file_position)
+        else:
+            with self._io_lock:
+                file.seek(file_position)
+                file.write(data)
+        self._data_size = max(self._data_size, file_position + len(data))
+
     def _gen_index_data(self):
+        # the keys live in the packed index file of the checkpoint
+        self.config["index_format"] = "packed"
         return {
             "config": self.config,
             "free_index": self.free_index.get_dict(),
-            "index": self.index,
         }
 
+    def _keys_path(self, seq: int) -> str:
+        """Return the path of the packed key index of the checkpoint `seq`."""
+        return self._get_file_path(f"index.{seq}.oxdkeys.bin")
+
+    def _write_keys(self, fsync: bool) -> None:
+        """Write the packed key index of the current checkpoint, before the index file refers to it."""
+        seq = self.config["journal_seq"]
+        write_packed(self._keys_path(seq), self.index.items(), seq, fsync=fsync)
+
+    def _open_keys(self) -> None:
+        """Map the packed key index of the current checkpoint and remove the older ones."""
+        self.index = KeyIndex(self._keys_path(self.config["journal_seq"]))
+        current = os.path.basename(self._keys_path(self.config["journal_seq"]))
+        for name in os.listdir(self.doc_path):
+            if name.endswith((".oxdkeys.bin", ".oxdkeys.bin.tmp")) and name != current:
+                try:
+                    os.remove(self._get_file_path(name))
+                except OSError:
+                    pass  # still mapped by a reader on a platform that forbids it
+
     def load_index(self) -> tuple[dict, list]:
         """
-        Load the index from the index file or build a new one if it does not exist.
+        Load the index from the index file or build a new one if it does not exist,
+        then replay the journaled changes made after that checkpoint.
+
+        The keys of the checkpoint are memory mapped from its packed key index, the changes
+        replayed from the journal go to the overlay of the index.
 
         Returns:
             tuple: A tuple containing the index dictionary and the free list.
         """
-        self.index = self.index_data.get(
-            "index", {}
-        )  # Store index as {key: (file_position, document_length)}
+        legacy = self.index_data.pop("index", None)
         self.free_index.set_dict(
-            self.index_data.get("free_index", {})
+            {} if self.readonly else self.index_data.get("free_index", {})
         )  # List of reusable spaces as (file_position, length)
-        self.config = self.index_data.get("config", {"data_encoding": self.dbin.method})
+        self.config = dict(
+            self.index_data.get(
+                "config",
+                {"data_encoding": self.dbin.method, "record_format": RECORD_FORMAT},
+            )
+        )
+        if self.config.get("index_format") == "packed":
+            self.index = KeyIndex(self._keys_path(self.config.get("journal_seq", 0)))
+        else:
+            # an index file that still holds the keys, the next checkpoint packs them
+            self.index = KeyIndex(entries=legacy)  # {key: (file_position, document_length)}
+        self._deltas = []
+        repair = not self.readonly and (self._file_lock is None or self._writer_held)
+        for record in self.journal.replay(self.config.get("journal_seq", 0), repair=repair):
+            self._apply_delta(record)
 
     def save_index(self) -> tuple[dict, list]:
         """
-        Save the current index and free list to the index file.
+        Save the current index and free list to the index file (checkpoint)
+        and start a new empty journal.
 
         Returns:
             tuple: A tuple containing the updated index dictionary and free list.
         """
+        fsync = self.durability != "os"
+        self.config["journal_seq"] = self.config.get("journal_seq", 0) + 1
+        self._write_keys(fsync)
         self.index_data.update(self._gen_index_data())
-        self.index_data.flush()
+        self.index_data.flush(fsync=fsync)
+        self.journal.reset(self.config["journal_seq"], fsync=fsync)
+        self._deltas = []
+        self._open_keys()
+        self._publish()
+
+    def _acquire_writer(self) -> None:
+        """
+        Take the file lock before the first uncommitted write of this process and catch up
+        with the commits of the other processes, must be called with the lock held.
+        """
+        if self._file_lock is None or self._writer_held:
+            return
+        self._file_lock.acquire()
+        self._writer_held = True
+        self.refresh()
+
+    def _release_writer(self) -> None:
+        """Let the other processes write once nothing is left uncommitted, must be called with the lock held."""
+        if not self._writer_held:
+            return
+        if self._deltas or self._pending_free or self._group_depth:
+            return
+        if self._undo is not None or self._compaction is not None:
+            return
+        self._writer_held = False
+        self._file_lock.release()
+
+    def _publish(self) -> None:
+        """Move the generation of the document so the other processes reload the committed changes."""
+        if self._file_lock is None:
+            return
+        self._generation += 1
+        self._file_lock.write_state(self._generation, self.config.get("journal_seq", 0))
+
+    def refresh(self) -> bool:
+        """
+        Load the index changes committed by the other processes sharing the document, the new
+        journal entries are applied incrementally, a checkpoint or compaction reloads the index.
+
+        The files are read without the file lock, an attempt counts only if no commit was
+        published while it ran, after a few failed attempts the index is reloaded holding
+        the shared side of the file lock so writers cannot commit meanwhile.
+
+        Returns:
+            bool: True if the index was updated.
+        """
+        if self._file_lock is None:
+            return False
+        if self._file_lock.read_state()[0] == self._generation:
+            return False
+        with self._lock:
+            state = self._file_lock.read_state()
+            if state[0] == self._generation:
+                return False
+            if self._writer_held:
+                # no other process can commit while this one holds the lock
+                self._catch_up(state)
+                return True
+            reload = False
+            for _ in range(3):
+                try:
+                    self._catch_up(state, reload=reload)
+                except (ValueError, OSError):
+                    # files replaced while they were read
+                    reload = True
+                    state = self._file_lock.read_state()
+                    continue
+                current = self._file_lock.read_state()
+                if current == state:
+                    return True
+                # the index may hold part of a newer commit, the journal or the index file
+                # may have been replaced under it, reload it as of the current state
+                reload = current[1] != state[1]
+                state = current
+            with self._file_lock.shared():
+                self._catch_up(self._file_lock.read_state(), reload=True)
+            return True
+
+    def _catch_up(self, state: tuple, reload: bool = False) -> None:
+        """
+        Bring the index in line with the published `state`, must be called with the lock held.
+
+        Args:
+            state (tuple): The (generation, journal_seq) read from the file lock.
+            reload (bool, optional): Load the index file again even if the journal could be
+                tailed. Defaults to False.
+        """
+        generation, journal_seq = state
+        records = None
+        if not reload and journal_seq == self.config.get("journal_seq", 0):
+            records = self.journal.tail()
+        if records is not None:
+            for record in records:
+                self._apply_delta(record)
+                if record[0] in ("s", "d"):
+                    self.lrucache.delete(record[1])
+        else:
+            # the index file, the journal or the data document were replaced
+            for attempt in range(3):
+                try:
+                    self.index_data.clear()
+                    self.index_data.load()
+                    self.load_index()
+                    break
+                except FileNotFoundError:
+                    # its packed keys were removed by a newer checkpoint meanwhile
+                    if attempt == 2:
+                        raise
+            self.lrucache.clear()
+            with self._io_lock:
+                self._mmap = None
+                self._file = None
+        if self._file is not None:
+            self._data_size = os.fstat(self._file.fileno()).st_size
+        self._generation = generation
+
+    @contextmanager
+    def _stable(self):
+        """
+        Hold the lock and keep the other processes from committing for the block, the index
+        is reloaded first so reads made in the block see the last commit.
+        """
+        with self._lock:
+            if self._file_lock is None or self._writer_held:
+                yield
+                return
+            with self._file_lock.shared():
+                self._catch_up(self._file_lock.read_state(), reload=True)
+                yield
+
+    def _apply_delta(self, record: list) -> None:
+        """
+        Apply one journaled index change.
+
+        Args:
+            record (list): The delta record
+                - ["s", key, position, length] : set the index entry of key
+                - ["d", key] : remove key from the index
+                - ["fa", position, length] : add a free block
+                - ["ft", position, length] : allocate from the free block at position
+                - ["e", position] : end of the data document at the commit
+                - ["x", txn_id] : the commit belongs to the transaction txn_id
+        """
+        op = record[0]
+        if op == "s":
+            self.index[record[1]] = (record[2], record[3])
+        elif op == "d":
+            self.index.pop(record[1], None)
+        elif op in ("fa", "ft") and self.readonly:
+            pass  # a readonly handle does not load the free list it never allocates from
+        elif op == "fa":
+            self.free_index.add(record[1], record[2])
+        elif op == "ft":
+            self.free_index.take(record[1], record[2])
+        elif op == "e":
+            self.config["data_end"] = record[1]
+        elif op == "x":
+            self.config["txn"] = record[1]
+        else:
+            raise ValueError(f"oxd : unknown journal record '{op}'")
+
+    def _set_index(self, key: str, file_position: int, length: int) -> None:
+        if self._compaction is not None:
+            self._compaction.touch(key, self.index.get(key))
+        if self._undo is not None:
+            self._undo["index"].setdefault(key, self.index.get(key))
+        self.index[key] = (file_position, length)
+        self._deltas.append(["s", key, file_position, length])
+
+    def _del_index(self, key: str) -> None:
+        if self._compaction is not None:
+            self._compaction.touch(key, self.index.get(key))
+        if self._undo is not None:
+            self._undo["index"].setdefault(key, self.index.get(key))
+        del self.index[key]
+        self._deltas.append(["d", key])
+
+    def _add_free(self, file_position: int, length: int) -> None:
+        # the committed index may still point at the slot, it is only reused after the commit
+        self._pending_free.append((file_position, length))
+
+    def _alloc(self, size: int) -> tuple:
+        """
+        Find a slot for a record of `size` bytes, reusing free space before growing the file.
+
+        A remainder of the free block too small to hold a tombstone is kept as pad of the record.
+
+        Returns:
+            tuple: (file_position, slot_length) of the allocated slot.
+        """
+        block = self.free_index.find_block(size)
+        if block is None:
+            return self._data_size, size
+        file_position, length = block
+        if length - size < HEADER_SIZE:
+            size = length
+        self.free_index.take(file_position, size)
+        self._deltas.append(["ft", file_position, size])
+        if self._undo is not None:
+            self._undo["taken"].append((file_position, size))
+        if size < length:
+            self._write(file_position + size, encode_tombstone(length - size))
+        return file_position, size
+
+    def _next_seq(self) -> int:
+        # time based so records written after a reopen always win over older ones
+        self._seq = max(self._seq + 1, time.time_ns())
+        return self._seq
+
+    def _fetch(
+        self,
+        key: str,
+        entry: tuple,
+        admit: bool = True,
+        buffer: Union[bytes, None] = None,
+        offset: int = 0,
+    ) -> Any:
+        """
+        Read and cache the value of `key` from the index entry `entry`, without the lock.
+
+        Readers do not take the writer lock, the entry may be stale by the time the record is
+        read. Slots are only reused after the index stops referring to them, so a stale read
+        either still finds the intact record or fails the key / crc check, the read is then
+        retried under the lock while the other processes sharing the document cannot commit.
+
+        Args:
+            key (str): The key to read.
+            entry (tuple): The (position, length) index entry of the key.
+            admit (bool, optional): Add the value to the cache. Defaults to True.
+            buffer (bytes, optional): Bytes already read that hold the record at `offset`.
+
+        Returns:
+            Any: The value, _MISSING if the key was deleted meanwhile.
+        """
+        try:
+            if buffer is None:
+                buffer, offset = self._read(*entry), 0
+            val, size = self._decode_value(buffer, key, offset)
+        except (ValueError, OSError):
+            with self._stable():  # another process may have reused the slot
+                entry = self.index.get(key)
+                if entry is None:
+                    return _MISSING
+                val, size = self._decode_value(self._read(*entry), key)
+        if size is None:
+            return val
+        with self.lrucache.lock:
+            # writers update the index before the cache, a value read from an entry that
+            # is no longer current must not reach the cache
+            if self.index.get(key) == entry:
+                self.lrucache.put(key=key, value=val, size=size, admit=admit)
+        return val
+
+    def _fetch_fields(
+        self,
+        key: str,
+        entry: tuple,
+        fields: list,
+        buffer: Union[bytes, None] = None,
+        offset: int = 0,
+    ) -> Any:
+        """
+        Read `fields` of the value of `key` from the index entry `entry` without the lock,
+        a stale read is retried under the lock as in `_fetch`.
+
+        Returns:
+            dict or None: The fields, None if the value is not a dict, _MISSING if the key
+                was deleted meanwhile.
+        """
+        try:
+            if buffer is None:
+                buffer, offset = self._read(*entry), 0
+            return self._decode_fields(buffer, key, fields, offset)
+        except (ValueError, OSError):
+            with self._stable():  # another process may have reused the slot
+                entry = self.index.get(key)
+                if entry is None:
+                    return _MISSING
+                return self._decode_fields(self._read(*entry), key, fields)
+
+    def _decode_fields(self, data: bytes, key: str, fields: list, offset: int = 0) -> Any:
+        """Verify the record of `key` at `offset` of `data` and decode `fields` of its value."""
+        record_key, payload, _, flags = decode_record(data, offset)
+        if record_key != key:
+            raise ValueError(f"oxd : record of key '{key}' holds key '{record_key}'")
+        if flags & FLAG_BLOB:
+            return pick_fields(self._read_blob(self.dbin.decode(payload)), fields)
+        payload = self._decompress(flags, payload)
+        return self.dbin.decode_fields(payload, fields, path=("",), symbols=self.symbols)
+
+    def _decode_value(self, data: bytes, key: str, offset: int = 0) -> tuple:
+        """
+        Verify the record of `key` at `offset` of `data` and decode its value.
+
+        Returns:
+            tuple: (value, size) where size is the encoded size the cache accounts for,
+                None for a value read from a blob file, those are not cached.
+        """
+        record_key, payload, _, flags = decode_record(data, offset)
+        if record_key != key:
+            raise ValueError(f"oxd : record of key '{key}' holds key '{record_key}'")
+        if flags & FLAG_BLOB:
+            return self._read_blob(self.dbin.decode(payload)), None
+        payload = self._decompress(flags, payload)
+        return self.dbin.decode(payload, symbols=self.symbols).get(""), len(payload)
+
+    def _decompress(self, flags: int, payload: bytes) -> bytes:
+        if flags & CODEC_MASK:
+            return decompress(flags, payload, self._zdict)
+        return payload
+
+    def _zdict(self, zdict_id: int) -> bytes:
+        """Return the trained dictionary `zdict_id`, loading it from its file on first use."""
+        zdict = self._zdicts.get(zdict_id)
+        if zdict is None:
+            with open(self._get_file_path(f"zdict{zdict_id}.oxdzdict.bin"), "rb") as file:
+                zdict = self._zdicts[zdict_id] = file.read()
+        return zdict
+
+    def _compress(self, payload: bytes) -> tuple:
+        """
+        Compress a payload with the codec of the document when it is worth it.
+
+        Returns:
+            tuple: (stored payload, record flags).
+        """
+        codec = self.config.get("compression", "none")
+        if codec == "none" or len(payload) < self.compress_threshold:
+            return payload, 0
+        zdict_id = self.config.get("zdict", 0)
+        zdict = self._zdict(zdict_id) if zdict_id and codec == "zlib" else None
+        compressed, flags = compress(codec, payload, zdict, zdict_id)
+        if len(compressed) >= len(payload):
+            return payload, 0
+        return compressed, flags
+
+    def train_compression(self, sample_size: int = 1000, dict_size: int = 32 << 10) -> int:
+        """
+        Train a zlib dictionary on the current values, records written afterwards with the
+        "zlib" codec are compressed against it, so short records with a shared structure
+        compress well. Records already written keep the dictionary they were written with.
+
+        Args:
+            sample_size (int, optional): Number of values sampled. Defaults to 1000.
+            dict_size (int, optional): Maximum size of the dictionary in bytes. Defaults to 32 KiB.
+
+        Returns:
+            int: The size of the trained dictionary, 0 if the document is empty.
+        """
+        self._check_writable()
+        samples = []
+        for _, value in self.items():
+            if len(samples) >= sample_size:
+                break
+            samples.append(self._encode_stored(value))
+        zdict = train_zdict(samples, dict_size)
+        if not zdict:
+            return 0
+        with self._lock:
+            self._acquire_writer()
+            zdict_id = max([self.config.get("zdict", 0)] + list(self._zdicts)) + 1
+            with open(self._get_file_path(f"zdict{zdict_id}.oxdzdict.bin"), "wb") as file:
+                file.write(zdict)
+                if self.durability != "os":
+                    file.flush()
+                    os.fsync(file.fileno())
+            self._zdicts[zdict_id] = zdict
+            self.config["zdict"] = zdict_id
+            # the config only reaches the disk with a checkpoint
+            self.commit()
+            self.save_index()
+            self._release_writer()
+        return len(zdict)
+
+    def _blob_path(self, name: str) -> str:
+        return os.path.join(self.doc_path, "blobs", name + ".oxdblob.bin")
+
+    def _write_blob(self, value: Any, payload: bytes) -> dict:
+        """
+        Store a large value in a new blob file.
+
+        Strings are stored as their utf-8 bytes so they can be streamed as they are,
+        other values as their encoded payload, without symbols so the stream is self-contained.
+
+        Returns:
+            dict: The reference to the blob written as the payload of the record.
+        """
+        if isinstance(value, str):
+            kind, data = "s", value.encode("utf-8")
+        else:
+            kind, data = "o", payload if self.symbols is None else self.dbin.encode({"": value})
+        name = format(self._next_seq(), "x")
+        os.makedirs(os.path.join(self.doc_path, "blobs"), exist_ok=True)
+        with open(self._blob_path(name), "wb") as file:
+            file.write(data)
+            if self.durability != "os":
+                file.flush()
+                os.fsync(file.fileno())
+        if self._undo is not None:
+            self._undo["blobs"].append(name)
+        return {"blob": name, "kind": kind, "size": len(data)}
+
+    def _read_blob(self, ref: dict) -> Any:
+        """Read the value of the blob referenced by `ref`."""
+        with open(self._blob_path(ref["blob"]), "rb") as file:
+            data = file.read()
+        if len(data) != ref["size"]:
+            raise ValueError(f"oxd : blob '{ref['blob']}' is truncated")
+        if ref["kind"] == "s":
+            return data.decode("utf-8")
+        return self.dbin.decode(data).get("")
+
+    def _blob_of(self, entry: tuple) -> Union[str, None]:
+        """Return the name of the blob referenced by the record at `entry`, None for an inline value."""
+        if not decode_header(self._read(entry[0], HEADER_SIZE))[1] & FLAG_BLOB:
+            return None
+        _, payload, _, _ = decode_record(self._read(*entry))
+        return self.dbin.decode(payload)["blob"]
+
+    def _release(self, key: str) -> None:
+        """Release the slot and the blob of the current value of `key` at the next commit."""
+        entry = self.index[key]
+        blob = self._blob_of(entry)
+        if blob is not None:
+            self._pending_blobs.append(blob)
+        self._add_free(*entry)  # a tombstone header replaces the record at the commit
+
+    def _remove_blobs(self, names: list) -> None:
+        for name in names:
+            try:
+                os.remove(self._blob_path(name))
+            except FileNotFoundError:
+                pass
+
+    def get_stream(self, key: str) -> Union[BinaryIO, None]:
+        """
+        Open the value of a key as a binary file-like object, a value stored in a blob file
+        is read from the file as the caller consumes it instead of being loaded at once.
+
+        Strings are streamed as their utf-8 bytes, other values as their encoded payload.
+
+        Args:
+            key (str): The key to look up.
+
+        Returns:
+            BinaryIO or None: The stream to read and close, None if the key does not exist.
+        """
+        self.refresh()
+        try:
+            return self._open_stream(key)
+        except (ValueError, OSError):
+            # the value was replaced meanwhile, read it again while no process commits
+            with self._stable():
+                return self._open_stream(key)
+
+    def _open_stream(self, key: str) -> Union[BinaryIO, None]:
+        """Open the value of `key` from its current index entry as in `get_stream`."""
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        record_key, payload, _, flags = decode_record(self._read(*entry))
+        if record_key != key:
+            raise ValueError(f"oxd : record of key '{key}' holds key '{record_key}'")
+        if flags & FLAG_BLOB:
+            return open(self._blob_path(self.dbin.decode(payload)["blob"]), "rb")
+        payload = self._decompress(flags, payload)
+        value = self.dbin.decode(payload, symbols=self.symbols).get("")
+        if isinstance(value, str):
+            return io.BytesIO(value.encode("utf-8"))
+        if self.symbols is not None:
+            # the stream is read without the symbol table of the document
+            payload = self.dbin.encode({"": value})
+        return io.BytesIO(payload)
 
     def __len__(self):
         "len prop of db"
 
+        self.refresh()
         return len(self.index)
 
     def __setitem__(self, key: str, value: Any) -> None:
@@ -111,82 +896,442 @@ class Oxdld:
 
     def __contains__(self, key):
         if isinstance(key, str):
+            self.refresh()
             return key in self.index
 
     def keys(self):
         """
         return all the keys in the db
         """
+        self.refresh()
         return list(self.index)
 
-    def commit(self):
-        "save the in memory index to file"
-        self.save_index()
+    def __reversed__(self):
+        return iter(self.range_keys(reverse=True))
+
+    def _ordered_keys(self, ranges: list, reverse: bool, limit: Union[int, None]) -> list:
+        """Collect the keys of the `sort_key` ranges of the index in key order, at most `limit`."""
+        self.refresh()
+        if reverse:
+            ranges = ranges[::-1]
+        with self._lock:
+            keys = itertools.chain.from_iterable(
+                self.index.irange(lo, hi, reverse) for lo, hi in ranges
+            )
+            return list(itertools.islice(keys, limit))
+
+    def _ordered_items(self, keys: list, batch_size: int = 1000):
+        # deleted after the keys were collected, a key is skipped
+        for i in range(0, len(keys), batch_size):
+            yield from self.get_many(keys[i : i + batch_size], admit=False).items()
+
+    def range_keys(
+        self,
+        start: Union[str, int, None] = None,
+        end: Union[str, int, None] = None,
+        reverse: bool = False,
+        limit: Union[int, None] = None,
+    ) -> list:
+        """
+        Return the keys from `start` up to `end` (excluded) in key order, found by binary search
+        in the index. Decimal integer keys come first in numeric order, the other keys follow
+        in string order.
 
-    def _update_data(self, file, key: str, value: Any):
+        Args:
+            start (str or int, optional): The first key of the range, None for the first key. Defaults to None.
+            end (str or int, optional): The key after the range, None for no upper bound. Defaults to None.
+            reverse (bool, optional): Start from the last key of the range. Defaults to False.
+            limit (int, optional): Maximum number of keys returned. Defaults to None.
+
+        Returns:
+            list: The keys of the range.
         """
-        Update the data in the document with the given key-value pair.
+        lo = sort_key(str(start)) if start is not None else None
+        hi = sort_key(str(end)) if end is not None else None
+        return self._ordered_keys([(lo, hi)], reverse, limit)
+
+    def prefix_keys(
+        self, prefix: str, reverse: bool = False, limit: Union[int, None] = None
+    ) -> list:
+        """
+        Return the keys that start with `prefix` in key order, see `range_keys`.
 
         Args:
-            file (file object): The open file object to write to.
-            key (str): The key to be updated or added.
-            value (Any): The value associated with the key.
+            prefix (str): The prefix of the keys.
+            reverse (bool, optional): Start from the last key. Defaults to False.
+            limit (int, optional): Maximum number of keys returned. Defaults to None.
+
+        Returns:
+            list: The keys with the prefix.
+        """
+        self.refresh()
+        with self._lock:
+            ranges = self.index.prefix_ranges(prefix)
+        return self._ordered_keys(ranges, reverse, limit)
+
+    def range(
+        self,
+        start: Union[str, int, None] = None,
+        end: Union[str, int, None] = None,
+        reverse: bool = False,
+        limit: Union[int, None] = None,
+    ):
         """
-        data = {"": value}
-        encoded_data = self.dbin.encode(data)
-        encoded_data_len = len(encoded_data)  # Length of the encoded data
+        Iterate over the key-value pairs from `start` up to `end` (excluded) in key order,
+        only the records of the range are read, see `range_keys`.
 
-        set_status = False
-        # Check if the key exists for update
-        if key in self.index:
-            if value == self.get(key=key):
-                return True
-            file_position, existing_encoded_data_len = self.index[key]
+        Yields:
+            tuple: (key, value) pairs.
+        """
+        return self._ordered_items(self.range_keys(start, end, reverse, limit))
 
-            if encoded_data_len <= existing_encoded_data_len:
-                # If the new document is smaller or equal, overwrite in place
-                file.seek(file_position)
-                file.write(encoded_data)
-                self.index[key] = (file_position, encoded_data_len)
-                if encoded_data_len != existing_encoded_data_len:
-                    self.free_index.add(
-                        file_position + encoded_data_len,
-                        existing_encoded_data_len - encoded_data_len,
-                    )
+    def prefix(self, prefix: str, reverse: bool = False, limit: Union[int, None] = None):
+        """
+        Iterate over the key-value pairs whose key starts with `prefix` in key order, see `prefix_keys`.
+
+        Yields:
+            tuple: (key, value) pairs.
+        """
+        return self._ordered_items(self.prefix_keys(prefix, reverse, limit))
+
+    def first(self, n: int = 1) -> dict:
+        """
+        Return the first `n` key-value pairs in key order.
+
+        Args:
+            n (int, optional): Number of pairs. Defaults to 1.
+
+        Returns:
+            dict: {key: value} in key order.
+        """
+        return dict(self.range(limit=n))
+
+    def last(self, n: int = 1) -> dict:
+        """
+        Return the last `n` key-value pairs in key order.
+
+        Args:
+            n (int, optional): Number of pairs. Defaults to 1.
+
+        Returns:
+            dict: {key: value} in key order.
+        """
+        return dict(self._ordered_items(self.range_keys(reverse=True, limit=n)[::-1]))
+
+    def commit(self):
+        """
+        Persist the pending index changes by appending them to the journal,
+        the journal is folded into the index file once it grows past the checkpoint limit.
+        """
+        with self._lock:
+            prepared = self._prepare_commit()
+            if prepared is not None:
+                self._finish_commit(*prepared)
+            self._release_writer()
+
+    def _prepare_commit(self) -> Union[tuple, None]:
+        """
+        Move the released slots into the free index and collect the pending index changes.
 
-                    file.seek(file_position + encoded_data_len)
-                    del_data = self.dbin.encode( existing_encoded_data_len - encoded_data_len,ctype="n",method="oxdbin")
-                    file.write(del_data)
-                set_status = True
+        Returns:
+            tuple or None: (deltas, released slots) to pass to `_finish_commit`, None if
+                nothing is pending.
+        """
+        released = self._pending_free
+        if not self._deltas and not released:
+            return None
+        for file_position, length in released:
+            self.free_index.add(file_position, length)
+            self._deltas.append(["fa", file_position, length])
+        self._pending_free = []
+        if self._file is not None and self._data_size != self.config.get("data_end"):
+            self.config["data_end"] = self._data_size
+            self._deltas.append(["e", self._data_size])
+        deltas, self._deltas = self._deltas, []
+        return deltas, released
+
+    def _finish_commit(self, deltas: list, released: list) -> None:
+        """Persist prepared index changes to the journal or a checkpoint and mark the released slots free."""
+        if len(self.journal) + len(deltas) >= max(self.checkpoint_ops, len(self.index)):
+            self.save_index()
+        else:
+            self.journal.append(deltas)
+
+        # the released records are only marked free once no committed index refers to them
+        for file_position, length in released:
+            self._write(file_position, encode_tombstone(length))
+        blobs, self._pending_blobs = self._pending_blobs, []
+        self._remove_blobs(blobs)
+        self._publish()
+
+    def _begin_undo(self) -> None:
+        """Start recording what is needed to roll back the writes of a transaction batch."""
+        self._check_writable()
+        self._acquire_writer()
+        self._data_file()
+        self._undo = {
+            "index": {},  # key -> index entry before the batch
+            "taken": [],  # free space allocated during the batch
+            "deltas": len(self._deltas),
+            "released": len(self._pending_free),
+            "released_blobs": len(self._pending_blobs),
+            "blobs": [],  # blob files written during the batch
+            "data_size": self._data_size,
+        }
+
+    def _rollback(self) -> None:
+        """Undo the uncommitted writes made since `_begin_undo`."""
+        undo, self._undo = self._undo, None
+        for key, entry in undo["index"].items():
+            self.lrucache.delete(key)
+            if entry is None:
+                self.index.pop(key, None)
+            else:
+                self.index[key] = entry
+        del self._deltas[undo["deltas"] :]
+        del self._pending_free[undo["released"] :]
+        del self._pending_blobs[undo["released_blobs"] :]
+        self._remove_blobs(undo["blobs"])
+        for file_position, length in undo["taken"]:
+            self.free_index.add(file_position, length)
+            self._write(file_position, encode_tombstone(length))
+        if self._data_size > undo["data_size"]:
+            if self.mmap_reads:
+                # lock-free readers may map the appended records, truncating them away would
+                # fault their reads, the tail is kept as free space instead
+                length = self._data_size - undo["data_size"]
+                self.free_index.add(undo["data_size"], length)
+                self._write(undo["data_size"], encode_tombstone(length))
             else:
-                # If the new document is larger, delete the old entry and append the new one
-                self.delete(key)
-                file_position = self.free_index.find_space(encoded_data_len)
-                if file_position == "EOF":
-                    file.seek(0, 2)  # Move to the end of the file
-                    file_position = file.tell()  # end of the file position
+                self._file.truncate(undo["data_size"])
+                self._data_size = undo["data_size"]
+
+    def _replay_txn(self, txn_id: int, deltas: list) -> None:
+        """Apply the changes of a transaction whose commit did not reach this document's journal."""
+        with self._lock:
+            for record in deltas:
+                self._apply_delta(record)
+            self.config["txn"] = txn_id
+            released = [(record[1], record[2]) for record in deltas if record[0] == "fa"]
+            self._finish_commit(list(deltas) + [["x", txn_id]], released)
+
+    def sync(self):
+        """
+        Commit all pending writes and fsync the data document and the journal.
+        """
+        if self.readonly:
+            return
+        with self._lock:
+            self._cancel_sync_timer()
+            _batched_docs.discard(self)
+            self.commit()
+            self._pending_ops = 0
+            self._commit_seq += 1
+            seq = self._commit_seq
+        self._sync_to(seq)
+
+    def close(self):
+        "sync the pending writes and close the data document handle, the document can still be used after closing"
+        self.sync()
+        with self._lock:
+            self._close_files()
+            if self.symbols is not None:
+                self.symbols.close()
+
+    @contextmanager
+    def group_commit(self):
+        """
+        Group the writes made inside the block into a single commit, the data document
+        is flushed and the index changes are committed once when the outermost block exits.
 
-                file.seek(file_position)
-                file.write(encoded_data)
-                self.index[key] = (file_position, encoded_data_len)
-                set_status = True
+        eg :
+            with doc.group_commit():
+                doc.set("k1", "v1")
+                doc.delete("k2")
+        """
+        with self._lock:
+            self._group_depth += 1
+            try:
+                yield self
+            finally:
+                self._group_depth -= 1
+                seq = self._write_done(ops=0)
+        self._sync_to(seq)
+
+    def _write_done(self, ops: int = 1) -> Union[int, None]:
+        """
+        Finish a write according to the durability mode, must be called with the lock held.
+
+        Returns:
+            int or None: The commit sequence that still has to be fsynced by `_sync_to`.
+        """
+        self._pending_ops += ops
+        if self._group_depth or not self._pending_ops:
+            return None
+        if self.durability == "batched":
+            if self._pending_ops >= self.sync_ops:
+                self.sync()
+            else:
+                self._start_sync_timer()
+            return None
 
-        # key not present new data entry
+        self.commit()
+        self._pending_ops = 0
+        self._commit_seq += 1
+        self._maybe_compact()
+        if self.durability == "always":
+            return self._commit_seq
+        self._synced_seq = self._commit_seq
+        return None
+
+    def _sync_to(self, seq: Union[int, None]) -> None:
+        """
+        Make sure the commit `seq` is on disk. A writer that finds its commit already
+        covered by the fsync of another writer returns without an fsync of its own.
+        """
+        if seq is None:
+            return
+        with self._sync_lock:
+            if self._synced_seq >= seq:
+                return
+            target = self._commit_seq
+            if self.symbols is not None:
+                # the records committed below may use the symbols appended since the last sync
+                self.symbols.fsync()
+            for path in (self._get_file_path(self.data_doc_name), self.journal.doc_path):
+                if os.path.exists(path):
+                    fd = os.open(path, os.O_RDWR)
+                    try:
+                        os.fsync(fd)
+                    finally:
+                        os.close(fd)
+            self._synced_seq = target
+
+    def _start_sync_timer(self):
+        _batched_docs.add(self)
+        if self._sync_timer is None:
+            self._sync_timer = threading.Timer(self.sync_interval_ms / 1000, self.sync)
+            self._sync_timer.daemon = True
+            self._sync_timer.start()
+
+    def _cancel_sync_timer(self):
+        if self._sync_timer is not None:
+            if self._sync_timer is not threading.current_thread():
+                self._sync_timer.cancel()
+            self._sync_timer = None
+
+    def _update_data(self, key: str, value: Any):
+        """
+        Update the data in the document with the given key-value pair.
+
+        The record is always written to a new slot (free space or the end of the file),
+        the slot of the previous value is released at the next commit, so a crash never
+        leaves the committed index pointing at a half written record.
+
+        Args:
+            key (str): The key to be updated or added.
+            value (Any): The value associated with the key.
+        """
+        payload = self.dbin.encode({"": value}, symbols=self.symbols)
+        blob = self.blob_threshold is not None and len(payload) >= self.blob_threshold
+        # comparing a large value would read its whole blob, it is rewritten instead
+        if not blob and key in self.index and self._unchanged(value, self.get(key=key)):
+            return True
+
+        size = len(payload)
+        payload, flags = self._encode_payload(value, payload, blob)
+        record_len = HEADER_SIZE + len(key.encode("utf-8")) + len(payload)
+        file_position, slot_len = self._alloc(record_len)
+        record = encode_record(
+            key, payload, self._next_seq(), pad=slot_len - record_len, flags=flags
+        )
+        self._write(file_position, record)
+        if key in self.index:
+            self._release(key)
+        self._set_index(key, file_position, slot_len)
+        if blob:
+            self.lrucache.delete(key)
         else:
-            # New key, find space in the free list or append
-            file_position = self.free_index.find_space(encoded_data_len)
-            if file_position == "EOF":
-                file.seek(0, 2)  # Move to the end of the file
-                file_position = file.tell()  # end of the file position
+            self.lrucache.put(key=key, value=value, size=size)
 
-            file.seek(file_position)
-            file.write(encoded_data)
-            self.index[key] = (file_position, encoded_data_len)
-            set_status = True
+        return True
 
-        self.lrucache.put(key=key, value=value)
+    @staticmethod
+    def _unchanged(value: Any, current: Any) -> bool:
+        """Whether the new `value` of a key equals its `current` value, a changed one is rewritten."""
+        if type(value) is not type(current):
+            return False
+        if numpy is not None and isinstance(value, numpy.ndarray):
+            # `==` of numpy arrays is elementwise
+            return value.dtype == current.dtype and numpy.array_equal(value, current)
+        try:
+            return bool(value == current)
+        except ValueError:  # a container holding numpy arrays
+            return False
+
+    def _encode_stored(self, value: Any) -> bytes:
+        """Encode a value read from the document with the known symbols, without counting or adding any."""
+        symbols = self.symbols.frozen if self.symbols is not None else None
+        return self.dbin.encode({"": value}, symbols=symbols)
+
+    def _encode_payload(self, value: Any, payload: bytes, blob: bool) -> tuple:
+        """Return the (payload, flags) stored in the record of `value`, writing its blob file if `blob`."""
+        if blob:
+            return self.dbin.encode(self._write_blob(value, payload)), FLAG_BLOB
+        return self._compress(payload)
+
+    def _update_many(self, data_dict: dict) -> bool:
+        """
+        Write many key-value pairs with one allocation pass and coalesced appends.
 
-        return set_status
+        All records are encoded first, those that fit a free block are written into it and
+        the others are laid out back to back at the end of the file and written with a few
+        large sequential writes, then the index is updated in one pass. The values are not
+        admitted to the cache, a bulk load would evict the hot entries.
+
+        Args:
+            data_dict (dict): The key-value pairs to be updated or added.
+        """
+        existing = {key for key in data_dict if key in self.index}
+        current = self.get_many(list(existing), admit=False) if existing else {}
+
+        placed = []  # (key, file_position, slot_len)
+        appends = []
+        append_start = append_end = self._data_size
+        no_fit = None  # smallest record size no free block could hold
+        for key, value in data_dict.items():
+            payload = self.dbin.encode({"": value}, symbols=self.symbols)
+            blob = self.blob_threshold is not None and len(payload) >= self.blob_threshold
+            if not blob and key in current and self._unchanged(value, current[key]):
+                continue
+            payload, flags = self._encode_payload(value, payload, blob)
+            record_len = HEADER_SIZE + len(key.encode("utf-8")) + len(payload)
+            if no_fit is None or record_len < no_fit:
+                file_position, slot_len = self._alloc(record_len)
+                if file_position != self._data_size:
+                    record = encode_record(
+                        key, payload, self._next_seq(), pad=slot_len - record_len, flags=flags
+                    )
+                    self._write(file_position, record)
+                    placed.append((key, file_position, slot_len))
+                    continue
+                no_fit = record_len
+            appends.append(encode_record(key, payload, self._next_seq(), flags=flags))
+            placed.append((key, append_end, record_len))
+            append_end += record_len
+            if append_end - append_start >= APPEND_CHUNK:
+                self._write(append_start, b"".join(appends))
+                appends, append_start = [], append_end
+        if appends:
+            self._write(append_start, b"".join(appends))
+
+        # the records are written before the index refers to them
+        for key, file_position, slot_len in placed:
+            if key in existing:
+                self._release(key)
+                self.lrucache.delete(key)
+            self._set_index(key, file_position, slot_len)
+        return True
 
     def set(self, key: str, value: Any) -> bool:
         """
@@ -201,10 +1346,14 @@ class Oxdld:
         """
         set_status = False
 
-        with open(self._get_file_path(self.data_doc_name), "r+b") as file:
-            set_status = self._update_data(file, key, value)
+        self._check_writable()
+        with self._lock:
+            self._acquire_writer()
+            self._data_file()
+            set_status = self._update_data(key, value)
+            seq = self._write_done()
 
-        self.save_index()
+        self._sync_to(seq)
         return set_status
 
     def add(self, data_dict: dict) -> bool:
@@ -219,11 +1368,15 @@ class Oxdld:
         """
 
         set_status = False
-        with open(self._get_file_path(self.data_doc_name), "r+b") as file:
-            for key, value in data_dict.items():
-                set_status = self._update_data(file, key, value)
-
-        self.save_index()
+        self._check_writable()
+        with self._lock:
+            self._acquire_writer()
+            self._data_file()
+            if data_dict:
+                set_status = self._update_many(data_dict)
+            seq = self._write_done()
+
+        self._sync_to(seq)
         return set_status
 
     def exists(self, key: str) -> bool:
@@ -236,30 +1389,153 @@ class Oxdld:
         Returns:
             bool: True if the key exists, False otherwise.
         """
+        self.refresh()
         return key in self.index
 
-    def get(self, key: str, default: Any = None) -> Any:
+    def get(self, key: str, default: Any = None, admit: bool = True) -> Any:
         """
         Retrieve the value associated with a key in the document.
 
         Args:
             key (str): The key to look up.
+            admit (bool, optional): Add the value to the cache on a miss. Defaults to True.
 
         Returns:
             Any: The value associated with the key, or None if the key does not exist.
         """
-        if key not in self.index:
+        self.refresh()
+        entry = self.index.get(key)
+        if entry is None:
             return None
-        if key in self.lrucache:
-            return self.lrucache.get(key)
-        file_position, document_length = self.index[key]
-        with open(self._get_file_path(self.data_doc_name), "rb") as file:
-            file.seek(file_position)
-            encoded_data = file.read(document_length)  # Read only the data document
-            data = self.dbin.decode(encoded_data)
-            val = data.get("", default)
-            self.lrucache.put(key=key, value=val)
-        return val
+        val = self.lrucache.get(key, _MISSING)
+        if val is _MISSING:
+            val = self._fetch(key, entry, admit)  # Read only the record of the key
+        return None if val is _MISSING else val
+
+    def get_many(
+        self,
+        keys: list,
+        merge_gap: int = 4096,
+        max_read: int = 8 << 20,
+        admit: bool = True,
+    ) -> dict:
+        """
+        Retrieve the values of many keys with a few large sequential reads.
+
+        Cached keys are served from the LRU cache, the others are sorted by file offset
+        and records closer than `merge_gap` bytes are fetched with one read.
+
+        Args:
+            keys (list): The keys to look up.
+            merge_gap (int, optional): Largest gap in bytes between two records read together. Defaults to 4096.
+            max_read (int, optional): Largest number of bytes fetched by one merged read. Defaults to 8 MiB.
+            admit (bool, optional): Add the values read from the file to the cache, bulk reads over
+                most of the keys pass False to keep the hot entries cached. Defaults to True.
+
+        Returns:
+            dict: {key: value} for the keys that exist, in the order they were requested.
+        """
+        self.refresh()
+        found = {}
+        misses = []
+        for key in keys:
+            if key in found:
+                continue
+            entry = self.index.get(key)
+            if entry is None:
+                continue
+            val = self.lrucache.get(key, _MISSING)
+            if val is not _MISSING:
+                found[key] = val
+            else:
+                misses.append((entry[0], entry[1], key))
+        for key, entry, buffer, offset in self._merged_reads(misses, merge_gap, max_read):
+            val = self._fetch(key, entry, admit, buffer, offset)
+            if val is not _MISSING:
+                found[key] = val
+
+        return {key: found[key] for key in keys if key in found}
+
+    def get_fields(
+        self,
+        keys: list,
+        fields: list,
+        merge_gap: int = 4096,
+        max_read: int = 8 << 20,
+    ) -> dict:
+        """
+        Retrieve only some fields of the dict values of many keys. With the "oxdbin" encoding
+        the other values of a record are skipped without being decoded, so a filter over one
+        or two fields of rich metadata does not pay for the whole record.
+
+        The records are read like `get_many` and are not added to the cache.
+
+        Args:
+            keys (list): The keys to look up.
+            fields (list): The dict keys to return of each value.
+            merge_gap (int, optional): Largest gap in bytes between two records read together. Defaults to 4096.
+            max_read (int, optional): Largest number of bytes fetched by one merged read. Defaults to 8 MiB.
+
+        Returns:
+            dict: {key: {field: value}} for the keys that exist, in the order they were requested,
+                the fields a value does not hold are left out, None for a value that is not a dict.
+
+        eg :
+            doc.get_fields(["1", "2"], ["uid"])  # {"1": {"uid": "u1"}, "2": {"uid": "u2"}}
+        """
+        self.refresh()
+        fields = list(fields)
+        found = {}
+        misses = []
+        for key in keys:
+            if key in found:
+                continue
+            entry = self.index.get(key)
+            if entry is None:
+                continue
+            val = self.lrucache.get(key, _MISSING)
+            if val is not _MISSING:
+                found[key] = pick_fields(val, fields)
+            else:
+                misses.append((entry[0], entry[1], key))
+
+        for key, entry, buffer, offset in self._merged_reads(misses, merge_gap, max_read):
+            val = self._fetch_fields(key, entry, fields, buffer, offset)
+            if val is not _MISSING:
+                found[key] = val
+
+        return {key: found[key] for key in keys if key in found}
+
+    def _merged_reads(self, misses: list, merge_gap: int, max_read: int):
+        """
+        Read the (position, length, key) records of `misses` in file order, records closer than
+        `merge_gap` bytes are fetched with one read.
+
+        Yields:
+            tuple: (key, entry, buffer, offset) where the record of `key` is at `offset` of `buffer`,
+                buffer is None when the read failed and the record has to be read again.
+        """
+        misses.sort()
+        i = 0
+        while i < len(misses):
+            read_start = misses[i][0]
+            read_end = read_start + misses[i][1]
+            j = i + 1
+            while j < len(misses):
+                file_position, document_length, _ = misses[j]
+                end = max(read_end, file_position + document_length)
+                if file_position - read_end > merge_gap or end - read_start > max_read:
+                    break
+                read_end = end
+                j += 1
+
+            try:
+                buffer = self._read(read_start, read_end - read_start)
+            except (ValueError, OSError):
+                buffer = None  # the handle was closed meanwhile, each record is read again
+            for file_position, document_length, key in misses[i:j]:
+                yield key, (file_position, document_length), buffer, file_position - read_start
+            i = j
 
     def delete(self, key: Union[str, list[str]]) -> bool:
         """
@@ -277,43 +1553,86 @@ class Oxdld:
             keys_to_delete = key
 
         all_deleted = True
-        with open(self._get_file_path(self.data_doc_name), "r+b") as file:
+        self._check_writable()
+        with self._lock:
+            self._acquire_writer()
             for k in keys_to_delete:
-                if k in self.index:
-                    self.lrucache.delete(k)
-                    file_position, document_length = self.index[k]
-                    self.free_index.add(
-                        file_position, document_length
-                    )  # Add space to free index
-                    file.seek(file_position)
-                    del_data = del_data = self.dbin.encode(document_length ,ctype="n",method="oxdbin") 
-                    file.write(del_data)
-                    del self.index[k]
-                else:
+                if not self._delete_key(k):
                     all_deleted = False
+            seq = self._write_done()  # Save updated index and free list
 
-        self.save_index()  # Save updated index and free list
+        self._sync_to(seq)
         return all_deleted
 
+    def _delete_key(self, key: str) -> bool:
+        """
+        Remove a key from the index and release its space in the data document.
+
+        Args:
+            key (str): The key to be deleted.
+
+        Returns:
+            bool: True if the key was deleted, False if it was not found.
+        """
+        if key not in self.index:
+            return False
+        self._release(key)
+        self._del_index(key)
+        self.lrucache.delete(key)
+        return True
+
     def delete_all(self):
         """
         Delete all keys from the document, remove all associated files,
         and delete the document's folder.
         """
+        self._check_writable()
+        if self._compaction is not None:
+            self._compaction.cancel()
+            self.compactor.wait()
+
         # Clear the index and free list
-        self.index.clear()
-        self.free_index.set_dict({})
-        self.save_index()
+        with self._lock:
+            self._acquire_writer()
+            self._cancel_sync_timer()
+            _batched_docs.discard(self)
+            self._pending_ops = 0
+            self.index.clear()
+            self.free_index.set_dict({})
+            self._pending_free = []
+            self._pending_blobs = []
+            self.lrucache.clear()
+            self.save_index()
+            self._close_files()
 
         # Remove the data document file
         data_doc_path = self._get_file_path(self.data_doc_name)
         if os.path.exists(data_doc_path):
             os.remove(data_doc_path)
 
-        # Remove the index file
+        # Remove the index file and its journal
         index_file_path = self.index_data.doc_path
         if os.path.exists(index_file_path):
             os.remove(index_file_path)
+        self.journal.remove()
+        if self.symbols is not None:
+            self.symbols.close()
+            if os.path.exists(self.symbols.path):
+                os.remove(self.symbols.path)
+            self.symbols = SymbolTable(self.symbols.path)
+        for name in os.listdir(self.doc_path):
+            if name.endswith(".oxdkeys.bin"):
+                os.remove(self._get_file_path(name))
+        blob_dir = os.path.join(self.doc_path, "blobs")
+        if os.path.isdir(blob_dir):
+            for name in os.listdir(blob_dir):
+                os.remove(os.path.join(blob_dir, name))
+            os.rmdir(blob_dir)
+        if self._file_lock is not None:
+            os.remove(self._file_lock.path)
+            self._file_lock.close()
+            self._file_lock = None
+            self._writer_held = False
 
         # Remove the document folder
         if os.path.exists(self.doc_path):
@@ -321,53 +1640,341 @@ class Oxdld:
 
         return True
 
+    def fragmentation(self) -> float:
+        """
+        Return the share of the data document that is free space.
+
+        Returns:
+            float: free bytes / file size, 0.0 for an empty document.
+        """
+        file_size = os.path.getsize(self._get_file_path(self.data_doc_name))
+        if not file_size:
+            return 0.0
+        return self.free_index.free_bytes / file_size
+
+    def _maybe_compact(self) -> bool:
+        """Start a background compaction if the fragmentation crossed `compact_threshold`."""
+        if self.compact_threshold is None or self._compaction is not None:
+            return False
+        if os.path.getsize(self._get_file_path(self.data_doc_name)) < COMPACT_MIN_BYTES:
+            return False
+        if self.fragmentation() < self.compact_threshold:
+            return False
+        self.compact_online(rate_bytes=self.compact_rate)
+        return True
+
     def compact(self):
-        """Compact the file to remove all unused spaces."""
-        data_dict = {}
-        new_index = {}
-        new_file_path = self._get_file_path("compact.oxdldd")
-        with open(self._get_file_path(self.data_doc_name), "rb") as old_file, open(
-            new_file_path, "wb"
-        ) as new_file:
-
-            for key, (old_position, length) in self.index.items():
-                old_file.seek(old_position)
-                encoded_data = old_file.read(length)
-                document = self.dbin.decode(encoded_data)
-                data_dict[key] = document.get("")
-                new_position = new_file.tell()
-                new_file.write(encoded_data)
-                new_index[key] = (new_position, length)
-
-        # Replace old file with the compacted file
-        os.replace(new_file_path, self._get_file_path(self.data_doc_name))
+        """
+        Compact the file to remove all unused spaces, blocks reads and writes until
+        the compacted file is swapped in.
+        """
+        self._check_writable()
+        if self._compaction is not None and self.compactor is not None:
+            self.compactor.cancel()
+            self.compactor.wait()
+        with self._lock:
+            OxdCompactor(self, region_threshold=0).run()
+        return True
+
+    def compact_online(
+        self,
+        chunk_bytes: int = 1 << 20,
+        rate_bytes: Union[int, None] = None,
+        region_bytes: int = 1 << 20,
+        region_threshold: float = 0.1,
+    ) -> OxdCompactor:
+        """
+        Compact the file in a background thread while reads and writes continue.
+
+        Args:
+            chunk_bytes (int, optional): Maximum number of bytes copied per step. Defaults to 1 MiB.
+            rate_bytes (int, optional): Copy rate limit in bytes per second, None copies at full speed.
+            region_bytes (int, optional): Size of the regions used to pick what to squeeze. Defaults to 1 MiB.
+            region_threshold (float, optional): Free share above which a region is squeezed. Defaults to 0.1.
+
+        Returns:
+            OxdCompactor: The running compactor, use `wait()` to block until it is done.
+        """
+        self._check_writable()
+        with self._lock:
+            if self._compaction is not None and self.compactor is not None:
+                return self.compactor
+            self.compactor = OxdCompactor(
+                self,
+                chunk_bytes=chunk_bytes,
+                rate_bytes=rate_bytes,
+                region_bytes=region_bytes,
+                region_threshold=region_threshold,
+            )
+            # mark the compaction as running before the thread takes the lock
+            self._compaction = self.compactor
+            return self.compactor.start()
+
+    def _swap_compacted(self, new_file_path: str, new_index: dict, new_free: list) -> None:
+        """
+        Replace the data document with a compacted one, must be called with the lock held.
+
+        Args:
+            new_file_path (str): The path of the compacted data document.
+            new_index (dict): The index of the compacted data document.
+            new_free (list): The (position, length) free blocks of the compacted data document.
+        """
+        fsync = self.durability != "os"
         self.index = new_index
         self.free_index.set_dict({})
-        self.save_index()
+        for position, length in sorted(new_free):
+            self.free_index.add(position, length)
+        self.config["journal_seq"] = self.config.get("journal_seq", 0) + 1
+        self.config["data_end"] = os.path.getsize(new_file_path)
+        self._deltas = []
+        self._pending_free = []
+
+        # the new index is written next to the current one first, a crash before it
+        # replaces index.oxdmem.bin is finished by _recover_compaction on the next open
+        self._write_keys(fsync)
+        compact_index = OxdMem(
+            self._get_file_path("compact"), data_encoding=self.dbin.method
+        )
+        compact_index.update(self._gen_index_data())
+        compact_index.flush(fsync=fsync)
+        os.replace(new_file_path, self._get_file_path(self.data_doc_name))
+        # the old handle is dropped, not closed, lock-free readers holding it keep reading the old file
+        with self._io_lock:
+            self._mmap = None
+            self._file = None
+        os.replace(compact_index.doc_path, self.index_data.doc_path)
+        self.index_data.clear()
+        self.index_data.update(compact_index)
+        self.journal.reset(self.config["journal_seq"], fsync=fsync)
+        self._open_keys()
+        blobs, self._pending_blobs = self._pending_blobs, []
+        self._remove_blobs(blobs)
+        self._publish()
+
+    def _recover_compaction(self) -> None:
+        """Finish or roll back a compaction interrupted by a crash."""
+        compact_data_path = self._get_file_path("compact.oxdldd")
+        compact_index_path = self._get_file_path("compact.oxdmem.bin")
+        if os.path.exists(compact_index_path):
+            if os.path.exists(compact_data_path):
+                # the data document was not swapped yet, keep the old files
+                os.remove(compact_index_path)
+            else:
+                os.replace(compact_index_path, self._get_file_path("index.oxdmem.bin"))
+        if os.path.exists(compact_data_path):
+            os.remove(compact_data_path)
 
-        return data_dict
+    def _check_data_doc(self) -> None:
+        """
+        Bring the index in line with the data document on open, a document of the legacy
+        unframed format is migrated, records written after the last commit are recovered.
+        """
+        size = os.path.getsize(self._get_file_path(self.data_doc_name))
+        if self.config.get("record_format") is None:
+            if size and self.index:
+                self._migrate_legacy()
+                return
+            self.config["record_format"] = RECORD_FORMAT
+
+        data_end = self.config.get("data_end", 0)
+        if size > data_end and self.txn is not None:
+            # only the transaction log decides what was committed, an uncommitted
+            # tail may hold a partial batch
+            self._data_file().truncate(data_end)
+            self._data_size = data_end
+        elif size > data_end:
+            self.recover(start=data_end)
+        elif size < data_end:
+            self.recover()
+
+    def recover(self, start: int = 0) -> dict:
+        """
+        Rebuild the index and the free index by scanning the records of the data document.
+
+        With `start` = 0 the index is rebuilt from the data document alone, with a larger
+        `start` only the records after it are applied on top of the current index (the
+        records appended after the last commit). The record with the highest seq wins
+        when a key has several. A damaged range is skipped up to the next record boundary
+        known to the current index, a damaged tail is truncated.
+
+        Args:
+            start (int, optional): The position the scan starts from. Defaults to 0.
+
+        Returns:
+            dict: number of records and free blocks found, damaged bytes skipped and tail bytes truncated.
+        """
+        self._check_writable()
+        stats = {"records": 0, "free_blocks": 0, "damaged_bytes": 0, "truncated_bytes": 0}
+        with self._lock:
+            self._acquire_writer()
+            self._data_file()
+            size = self._data_size
+            boundaries = sorted(
+                {file_position for file_position, _ in self.index.values()}
+                | set(self.free_index.index)
+            )
+            if start == 0:
+                self.index = KeyIndex()
+                self.free_index.set_dict({})
+            self._pending_free = []
+            self._pending_blobs = []
+            self._deltas = []
+            self.lrucache.clear()
+            seqs = {}
+            released = []  # slots that still look like records and become tombstones
+
+            file_position = start
+            while file_position < size:
+                try:
+                    header = decode_header(self._read(file_position, HEADER_SIZE))
+                    length = record_length(header)
+                    if file_position + length > size:
+                        raise ValueError("oxd : record past the end of the data document")
+                    if header[0] == TOMBSTONE_MAGIC:
+                        self.free_index.add(file_position, length)
+                        stats["free_blocks"] += 1
+                        file_position += length
+                        continue
+                    key, _, seq, _ = decode_record(self._read(file_position, length))
+                except ValueError:
+                    i = bisect.bisect_right(boundaries, file_position)
+                    if i == len(boundaries) or boundaries[i] >= size:
+                        stats["truncated_bytes"] = size - file_position
+                        self._mmap = None
+                        self._file.truncate(file_position)
+                        self._data_size = size = file_position
+                        break
+                    stats["damaged_bytes"] += boundaries[i] - file_position
+                    released.append((file_position, boundaries[i] - file_position))
+                    file_position = boundaries[i]
+                    continue
+
+                stats["records"] += 1
+                self._seq = max(self._seq, seq)
+                current = self.index.get(key)
+                if current is None or seq >= seqs.get(key, 0):
+                    if current is not None:
+                        released.append(current)
+                    self.index[key] = (file_position, length)
+                    seqs[key] = seq
+                else:
+                    released.append((file_position, length))
+                file_position += length
+
+            blob_dir = os.path.join(self.doc_path, "blobs")
+            if start == 0 and os.path.isdir(blob_dir):
+                # blobs no recovered record references were left by a crash or a superseded value
+                referenced = {self._blob_of(entry) for entry in self.index.values()}
+                self._remove_blobs(
+                    [
+                        name[: -len(".oxdblob.bin")]
+                        for name in os.listdir(blob_dir)
+                        if name[: -len(".oxdblob.bin")] not in referenced
+                    ]
+                )
+
+            for file_position, length in released:
+                self.free_index.add(file_position, length)
+                if length >= HEADER_SIZE:
+                    self._write(file_position, encode_tombstone(length))
+            self.config["record_format"] = RECORD_FORMAT
+            self.config["data_end"] = size
+            self.save_index()
+            self._release_writer()
+        return stats
+
+    def _migrate_legacy(self) -> None:
+        """Rewrite a data document of unframed records in the checksummed record format."""
+        new_file_path = self._get_file_path("compact.oxdldd")
+        new_index = {}
+        with open(new_file_path, "wb") as new_file:
+            for key, (file_position, document_length) in self.index.items():
+                # the legacy records hold the same encoded payload without a header
+                payload = self._read(file_position, document_length)
+                record = encode_record(key, payload, self._next_seq())
+                new_index[key] = (new_file.tell(), len(record))
+                new_file.write(record)
+            new_file.flush()
+            if self.durability != "os":
+                os.fsync(new_file.fileno())
+        self.config["record_format"] = RECORD_FORMAT
+        self._swap_compacted(new_file_path, new_index, [])
 
     def load_data(self) -> dict:
         """Load all key-value pairs from the data file and return them as a Python dictionary."""
-        data = self.compact()
-        return data
-        # data_dict = {}
-        # with open(self._get_file_path(self.data_doc_name), "rb") as file:
-        #     while True:
-        #         try:
-        #             # Read the length of the next data document
-        #             length_bytes = file.read(4)
-        #             if not length_bytes:
-        #                 break  # End of file
-        #             length = int.from_bytes(length_bytes, byteorder="little")
-
-        #             # Read the data document based on the length
-        #             encoded_data = length_bytes + file.read(length - 4)
-        #             document = self.dbin.decode(encoded_data)
-        #             data_dict.update(document)
-        #         except Exception:
-        #             break  # End of file or error in reading, stop the loop
-        # return data_dict
+        return dict(self.items())
+
+    def items(self, buffer_size: int = 1 << 20):
+        """
+        Iterate over all key-value pairs, reading the data document sequentially in
+        file-offset order with large buffered reads. Values are decoded lazily, so memory
+        use does not grow with the size of the values, and nothing is written to disk.
+
+        Args:
+            buffer_size (int, optional): Number of bytes read from the data document at once. Defaults to 1 MiB.
+
+        Yields:
+            tuple: (key, value) pairs.
+        """
+        self.refresh()
+        with self._lock:
+            entries = sorted(
+                (file_position, document_length, key)
+                for key, (file_position, document_length) in self.index.items()
+            )
+
+        buffer = b""
+        buffer_start = 0
+        for file_position, document_length, key in entries:
+            buffer_offset = file_position - buffer_start
+            if buffer_offset < 0 or buffer_offset + document_length > len(buffer):
+                try:
+                    buffer = self._read(file_position, max(buffer_size, document_length))
+                except (ValueError, OSError):
+                    buffer = b""
+                buffer_start = file_position
+                buffer_offset = 0
+
+            # a key updated or deleted after the snapshot fails the record check and is read again
+            val = self._fetch(
+                key,
+                (file_position, document_length),
+                False,
+                buffer if buffer else None,
+                buffer_offset,
+            )
+            if val is not _MISSING:
+                yield key, val
+
+    def values(self, buffer_size: int = 1 << 20):
+        """
+        Iterate over all values in file-offset order, see `items`.
+
+        Yields:
+            Any: The stored values.
+        """
+        for _, value in self.items(buffer_size=buffer_size):
+            yield value
+
+    def scan(self, batch_size: int = 1000, buffer_size: int = 1 << 20):
+        """
+        Iterate over all key-value pairs in batches, see `items`.
+
+        Args:
+            batch_size (int, optional): Maximum number of pairs per batch. Defaults to 1000.
+            buffer_size (int, optional): Number of bytes read from the data document at once. Defaults to 1 MiB.
+
+        Yields:
+            list[tuple]: Lists of up to `batch_size` (key, value) pairs.
+        """
+        batch = []
+        for item in self.items(buffer_size=buffer_size):
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
     @staticmethod
     def zip(doc, output_path: str = None):
@@ -439,7 +2046,7 @@ class Oxdld:
             else os.path.join(".", self.doc + ".oxdld.json")
         )
 
-        data = self.compact()
+        data = self.load_data()
         with open(output_path, "wb") as json_file:
             json_file.write(self.dbin.encode(data, method="json"))
 
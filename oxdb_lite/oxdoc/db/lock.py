@@ -0,0 +1,224 @@
+"""
+RWLock lets many readers or a single writer hold a lock
+
+writers are preferred, a waiting writer blocks new readers so a steady
+stream of reads cannot starve it, both sides are reentrant per thread
+
+FileLock is the advisory lock the processes opening the same document
+take before writing, its file also holds the generation counter they
+compare to detect commits made by the others, readers take its shared
+side to read while no writer commits
+"""
+
+import functools
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Tuple
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks on this platform, access is not coordinated
+    fcntl = None
+
+
+class RWLock:
+    def __init__(self):
+        """Initialize a reader/writer lock."""
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0  # number of read holds over all threads
+        self._writer = None  # thread holding the write side
+        self._write_depth = 0
+        self._writers_waiting = 0
+        self._local = threading.local()  # read holds of the current thread
+
+    def _read_depth(self) -> int:
+        return getattr(self._local, "depth", 0)
+
+    def acquire_read(self) -> None:
+        """Acquire the read side, waits while a writer holds or waits for the lock."""
+        me = threading.current_thread()
+        with self._cond:
+            # a thread already holding the lock never waits, waiting would deadlock it
+            if not (self._read_depth() or self._writer is me):
+                while self._writer is not None or self._writers_waiting:
+                    self._cond.wait()
+            self._readers += 1
+            self._local.depth = self._read_depth() + 1
+
+    def release_read(self) -> None:
+        """Release one read hold."""
+        with self._cond:
+            self._readers -= 1
+            self._local.depth = self._read_depth() - 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        """
+        Acquire the write side, waits until no other thread holds the lock.
+
+        Raises:
+            RuntimeError: If the thread holds the read side, upgrading would deadlock.
+        """
+        me = threading.current_thread()
+        with self._cond:
+            if self._writer is me:
+                self._write_depth += 1
+                return
+            if self._read_depth():
+                raise RuntimeError("oxd : cannot take the write lock while holding the read lock")
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self) -> None:
+        """Release one write hold."""
+        with self._cond:
+            self._write_depth -= 1
+            if not self._write_depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        """Hold the read side for the block."""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        """Hold the write side for the block."""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+def read_locked(method):
+    """Run a method while holding the read side of the instance's `lock`."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock.read():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def write_locked(method):
+    """Run a method while holding the write side of the instance's `lock`."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock.write():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class FileLock:
+    # generation counter, journal seq of the last commit
+    STATE = struct.Struct(">QQ")
+
+    def __init__(self, path: str, readonly: bool = False):
+        """
+        Open (or create) the lock file shared by the processes opening a document.
+
+        Args:
+            path (str): The path of the lock file.
+            readonly (bool, optional): Open an existing lock file only to read the state of
+                the document, the lock cannot be taken. Defaults to False.
+        """
+        self.path = path
+        self.readonly = readonly
+        if readonly:
+            self._fd = os.open(path, os.O_RDONLY)
+        else:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._depth = 0
+        self._shared_depth = 0
+        self._io_lock = threading.Lock()  # seek + read/write where pread/pwrite are missing
+
+    def acquire(self) -> None:
+        """Take the exclusive lock, waits while another process holds it. Reentrant."""
+        if self.readonly:
+            raise ValueError(f"oxd : lock file {self.path} is opened readonly")
+        if not self._depth and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._depth += 1
+
+    def release(self) -> None:
+        """Release one hold of the exclusive lock."""
+        self._depth -= 1
+        if not self._depth and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_SH if self._shared_depth else fcntl.LOCK_UN)
+
+    def acquire_shared(self) -> None:
+        """
+        Take the shared lock, waits while another process holds the exclusive lock. Reentrant,
+        the exclusive lock already held by this handle is kept as it is.
+        """
+        if not (self._depth or self._shared_depth) and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_SH)
+        self._shared_depth += 1
+
+    def release_shared(self) -> None:
+        """Release one hold of the shared lock."""
+        self._shared_depth -= 1
+        if not (self._depth or self._shared_depth) and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def shared(self):
+        """Hold the shared lock for the block."""
+        self.acquire_shared()
+        try:
+            yield
+        finally:
+            self.release_shared()
+
+    def read_state(self) -> Tuple[int, int]:
+        """
+        Read the state published by the last writer.
+
+        Returns:
+            tuple: (generation, journal_seq), (0, 0) for a new lock file.
+        """
+        if hasattr(os, "pread"):
+            data = os.pread(self._fd, self.STATE.size, 0)
+        else:
+            with self._io_lock:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                data = os.read(self._fd, self.STATE.size)
+        if len(data) < self.STATE.size:
+            return 0, 0
+        return self.STATE.unpack(data)
+
+    def write_state(self, generation: int, journal_seq: int) -> None:
+        """Publish the state of a commit, must be called with the lock held."""
+        state = self.STATE.pack(generation, journal_seq)
+        if hasattr(os, "pwrite"):
+            os.pwrite(self._fd, state, 0)
+        else:
+            with self._io_lock:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, state)
+
+    def close(self) -> None:
+        """Close the lock file, releasing the lock."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._depth = 0
+            self._shared_depth = 0
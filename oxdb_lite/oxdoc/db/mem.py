@@ -37,10 +37,21 @@ class OxdMem(dict):
                     f"Failed to load data: incompatible encoding method '{self.dbin.method}' \n\nUse correct methods: '{DBIN_METHODS}'"
                 ) from e
 
-    def flush(self) -> None:
-        """Persist the current oxdmem data to the file."""
-        with open(self.doc_path, "wb") as docfile:
+    def flush(self, fsync: bool = False) -> None:
+        """
+        Persist the current oxdmem data to the file.
+
+        Args:
+            fsync (bool, optional): Wait until the data is on disk. Defaults to False.
+        """
+        # write a temp file and swap it in so a crash never leaves a half written file
+        tmp_path = self.doc_path + ".tmp"
+        with open(tmp_path, "wb") as docfile:
             docfile.write(self.dbin.encode(dict(self)))
+            if fsync:
+                docfile.flush()
+                os.fsync(docfile.fileno())
+        os.replace(tmp_path, self.doc_path)
 
     def __setitem__(self, key: str, value: Any) -> None:
         """Override set item to persist changes."""
@@ -0,0 +1,131 @@
+"""
+record framing of the Oxdld data document
+
+every record starts with a fixed header that carries the lengths of the
+key and the payload, a sequence number and a crc32 of the whole record,
+so the index can be rebuilt from the data document alone
+"""
+
+import struct
+import zlib
+from typing import Tuple
+
+RECORD_FORMAT = 1
+
+RECORD_MAGIC = b"R"
+TOMBSTONE_MAGIC = b"T"
+
+# record flags
+FLAG_BLOB = 0x01  # the payload references a blob file that holds the value
+FLAG_ZLIB = 0x02  # the payload is compressed, one codec flag at most
+FLAG_LZMA = 0x04
+FLAG_BZ2 = 0x08
+FLAG_ZDICT = 0x10  # zlib with a trained dictionary, the payload starts with its 4 byte id
+
+# magic, flags, pad, key length, payload length, seq, crc32
+HEADER = struct.Struct(">cBBHIQI")
+HEADER_SIZE = HEADER.size
+_CRC_OFFSET = HEADER_SIZE - 4
+
+
+def _crc(head: bytes, *parts: bytes) -> int:
+    crc = zlib.crc32(head[:_CRC_OFFSET])
+    for part in parts:
+        crc = zlib.crc32(part, crc)
+    return crc
+
+
+def encode_record(key: str, payload: bytes, seq: int, pad: int = 0, flags: int = 0) -> bytes:
+    """
+    Frame a key and its encoded value.
+
+    Args:
+        key (str): The key of the record.
+        payload (bytes): The encoded value.
+        seq (int): The sequence number, the record with the highest seq of a key wins on recovery.
+        pad (int, optional): Unused bytes left after the record in its slot. Defaults to 0.
+        flags (int, optional): Flags describing the payload. Defaults to 0.
+
+    Returns:
+        bytes: The header, key and payload of the record, the pad bytes are not included.
+    """
+    key_bytes = key.encode("utf-8")
+    head = HEADER.pack(RECORD_MAGIC, flags, pad, len(key_bytes), len(payload), seq, 0)
+    crc = _crc(head, key_bytes, payload)
+    return head[:_CRC_OFFSET] + crc.to_bytes(4, "big") + key_bytes + payload
+
+
+def encode_tombstone(length: int, seq: int = 0) -> bytes:
+    """
+    Build the header-only marker written at the start of a free block.
+
+    Args:
+        length (int): The length of the free block, at least HEADER_SIZE.
+        seq (int, optional): The sequence number. Defaults to 0.
+
+    Returns:
+        bytes: The tombstone header.
+    """
+    head = HEADER.pack(TOMBSTONE_MAGIC, 0, 0, 0, length, seq, 0)
+    return head[:_CRC_OFFSET] + _crc(head).to_bytes(4, "big")
+
+
+def decode_header(data: bytes, offset: int = 0) -> Tuple[bytes, int, int, int, int, int, int]:
+    """
+    Read the header at `offset`, checking the crc of tombstones.
+
+    Returns:
+        tuple: (magic, flags, pad, key_len, payload_len, seq, crc), for a tombstone
+            payload_len is the length of the free block.
+
+    Raises:
+        ValueError: If there is no valid header at `offset`.
+    """
+    if len(data) - offset < HEADER_SIZE:
+        raise ValueError("oxd : truncated record header")
+    header = HEADER.unpack_from(data, offset)
+    magic = header[0]
+    if magic == TOMBSTONE_MAGIC:
+        if _crc(data[offset : offset + HEADER_SIZE]) != header[6] or header[4] < HEADER_SIZE:
+            raise ValueError("oxd : corrupt tombstone")
+    elif magic != RECORD_MAGIC:
+        raise ValueError(f"oxd : invalid record magic {magic!r}")
+    return header
+
+
+def record_length(header: tuple) -> int:
+    """Return the slot length of a record or free block from its decoded header."""
+    magic, _, pad, key_len, payload_len, _, _ = header
+    if magic == TOMBSTONE_MAGIC:
+        return payload_len
+    return HEADER_SIZE + key_len + payload_len + pad
+
+
+def decode_record(data: bytes, offset: int = 0) -> Tuple[str, bytes, int, int]:
+    """
+    Decode and verify the record at `offset`.
+
+    Args:
+        data (bytes): A buffer holding the whole record.
+        offset (int, optional): The position of the record in the buffer. Defaults to 0.
+
+    Returns:
+        tuple: (key, payload, seq, flags).
+
+    Raises:
+        ValueError: If the record is truncated, is not a record or its crc does not match.
+    """
+    magic, flags, _, key_len, payload_len, seq, crc = decode_header(data, offset)
+    if magic != RECORD_MAGIC:
+        raise ValueError("oxd : expected a record, found a tombstone")
+    key_start = offset + HEADER_SIZE
+    payload_start = key_start + key_len
+    payload_end = payload_start + payload_len
+    if payload_end > len(data):
+        raise ValueError("oxd : truncated record")
+    data = memoryview(data)
+    key_bytes = data[key_start:payload_start]
+    payload = data[payload_start:payload_end]
+    if _crc(data[offset:key_start], key_bytes, payload) != crc:
+        raise ValueError("oxd : record checksum mismatch")
+    return bytes(key_bytes).decode("utf-8"), bytes(payload), seq, flags
@@ -0,0 +1,199 @@
+"""
+SymbolTable numbers the strings repeated across the records of an Oxdld document
+
+field names and short enum like values are appended once to the symbols
+file of the document, Oxdbin stores them in the records as ids and the
+decoded records share one string object per symbol
+
+ids are never reused or removed, compaction copies records unchanged and
+processes sharing the document read the symbols appended by the others
+when they meet an id they do not know yet
+"""
+
+import os
+import threading
+from typing import Union
+
+MAGIC = b"OXDY"
+
+
+class SymbolTable:
+    def __init__(
+        self,
+        path: str,
+        readonly: bool = False,
+        max_symbols: int = 1 << 16,
+        max_len: int = 32,
+        key_count: int = 2,
+        value_count: int = 8,
+    ):
+        """
+        Open (or create on the first symbol) the symbols file of a document.
+
+        Args:
+            path (str): The path of the symbols file.
+            readonly (bool, optional): Only resolve the ids already in the file. Defaults to False.
+            max_symbols (int, optional): Number of symbols after which no new string is added. Defaults to 65536.
+            max_len (int, optional): Longest string in characters that becomes a symbol. Defaults to 32.
+            key_count (int, optional): Times a dict key is written before it becomes a symbol. Defaults to 2.
+            value_count (int, optional): Times a string value is written before it becomes a symbol,
+                values are unique more often than keys. Defaults to 8.
+        """
+        self.path = path
+        self.readonly = readonly
+        self.max_symbols = max_symbols
+        self.max_len = max_len
+        self.key_count = key_count
+        self.value_count = value_count
+        self.strings = []  # id -> string
+        self.ids = {}  # string -> id
+        self._counts = {}  # string -> times written, for the strings not yet symbols
+        self._end = 0  # end of the last complete entry of the file
+        self._fd = None
+        self._dirty = False  # symbols appended since the last fsync
+        self._lock = threading.Lock()
+        self.frozen = FrozenSymbols(self)
+        self.reload()
+
+    def reload(self) -> None:
+        """Read the symbols appended to the file since it was last read, by this or another process."""
+        with self._lock:
+            try:
+                with open(self.path, "rb") as file:
+                    file.seek(self._end)
+                    data = file.read()
+            except FileNotFoundError:
+                return
+            pos = 0
+            if not self._end:
+                if data[:4] != MAGIC:
+                    if len(data) < 4:
+                        return  # created but not written yet
+                    raise ValueError(f"oxd : {self.path} is not a symbols file")
+                pos = 4
+            # entries are a varint length and the utf-8 bytes, a torn last entry is ignored
+            while pos < len(data):
+                length = shift = 0
+                start = pos
+                while pos < len(data):
+                    byte = data[pos]
+                    pos += 1
+                    length |= (byte & 0x7F) << shift
+                    if byte < 0x80:
+                        break
+                    shift += 7
+                else:
+                    pos = start
+                    break
+                if pos + length > len(data):
+                    pos = start
+                    break
+                string = data[pos : pos + length].decode("utf-8")
+                self.ids[string] = len(self.strings)
+                self.strings.append(string)
+                pos += length
+            self._end += pos
+
+    def __getitem__(self, symbol_id: int) -> str:
+        """
+        Return the string of `symbol_id`.
+
+        Raises:
+            ValueError: If the id is not in the symbols file.
+        """
+        if symbol_id < len(self.strings):
+            return self.strings[symbol_id]
+        self.reload()  # appended by another process
+        if symbol_id < len(self.strings):
+            return self.strings[symbol_id]
+        raise ValueError(f"oxd : unknown symbol {symbol_id} in {self.path}")
+
+    def __len__(self):
+        return len(self.strings)
+
+    def id_of(self, string: str, key: bool = False) -> Union[int, None]:
+        """
+        Return the id to store instead of `string`, adding it to the table once it was written
+        often enough. Called by the writer of the document only.
+
+        Args:
+            string (str): The string being encoded.
+            key (bool, optional): The string is a dict key. Defaults to False.
+
+        Returns:
+            int or None: The id, None to store the string itself.
+        """
+        symbol_id = self.ids.get(string)
+        if symbol_id is not None or self.readonly:
+            return symbol_id
+        if len(string) > self.max_len or len(self.strings) >= self.max_symbols:
+            return None
+        count = self._counts.get(string, 0) + 1
+        if count < (self.key_count if key else self.value_count):
+            if len(self._counts) >= self.max_symbols:
+                self._counts.clear()  # bounded, a string written rarely starts over
+            self._counts[string] = count
+            return None
+        self._counts.pop(string, None)
+        return self._add(string)
+
+    def _add(self, string: str) -> int:
+        # another process holding the writer lock before may have appended symbols
+        self.reload()
+        symbol_id = self.ids.get(string)
+        if symbol_id is not None:
+            return symbol_id
+        raw = string.encode("utf-8")
+        length = len(raw)
+        entry = bytearray()
+        while length >= 0x80:
+            entry.append((length & 0x7F) | 0x80)
+            length >>= 7
+        entry.append(length)
+        entry += raw
+        with self._lock:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if not self._end:
+                entry[:0] = MAGIC
+            # written at the end of the last complete entry, over a torn one
+            if hasattr(os, "pwrite"):
+                os.pwrite(self._fd, bytes(entry), self._end)
+            else:
+                os.lseek(self._fd, self._end, os.SEEK_SET)
+                os.write(self._fd, bytes(entry))
+            self._end += len(entry)
+            os.ftruncate(self._fd, self._end)
+            self.ids[string] = len(self.strings)
+            self.strings.append(string)
+            self._dirty = True
+            return self.ids[string]
+
+    def fsync(self) -> None:
+        """fsync the symbols appended since the last call, before the records using them are committed."""
+        with self._lock:
+            if self._dirty and self._fd is not None:
+                os.fsync(self._fd)
+                self._dirty = False
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+class FrozenSymbols:
+    def __init__(self, table: SymbolTable):
+        """
+        View of a symbol table that encodes with the symbols it already holds, without counting
+        or adding strings. Used to re-encode stored values, so only real writes drive the interning.
+
+        Args:
+            table (SymbolTable): The table to look the strings up in.
+        """
+        self.table = table
+
+    def id_of(self, string: str, key: bool = False) -> Union[int, None]:
+        """Return the id of `string`, None if it is not a symbol."""
+        return self.table.ids.get(string)
@@ -0,0 +1,182 @@
+"""
+OxdTxn commits the writes of several Oxdld documents as one unit
+
+the index changes of all documents touched by a batch are written as one
+entry of a shared transaction log before they reach the documents' own
+journals, a document that missed the entry replays it when it is opened
+"""
+
+import os
+from contextlib import contextmanager
+
+from oxdb_lite.oxdoc.db.journal import OxdJournal
+
+
+class OxdTxn:
+    def __init__(self, doc: str, data_encoding="oxdbin", log_limit: int = 1024):
+        """
+        Initialize the transaction log of a group of Oxdld documents.
+
+        Args:
+            doc (str): The name of the transaction log or its path (e.g., "txn" or "/home/user/doc/txn").
+            data_encoding (str, optional): The encoding method used for the log entries. Defaults to "oxdbin".
+            log_limit (int, optional): Number of transactions after which the documents are synced
+                and the log is emptied. Defaults to 1024.
+        """
+        self.log = OxdJournal(doc, data_encoding=data_encoding)
+        self.log_limit = log_limit
+        self.stores = {}
+        # ["t", txn_id, {store name: deltas}] entries that may not have reached every store
+        self.entries = self.log.replay(0)
+        self._log_bytes = self.log.offset  # size of the entries counted by len(self.log)
+        self.next_id = max((entry[1] for entry in self.entries), default=0) + 1
+
+    def attach(self, name: str, store) -> None:
+        """
+        Register a document and replay the committed transactions it missed.
+
+        Args:
+            name (str): The name of the document inside the transaction log.
+            store (Oxdld): The document, called while it is being opened.
+        """
+        self.stores[name] = store
+        applied = store.config.get("txn", 0)
+        for _, txn_id, changes in self.entries:
+            if txn_id > applied and name in changes:
+                store._replay_txn(txn_id, changes[name])
+        self.next_id = max(self.next_id, store.config.get("txn", 0) + 1)
+
+    @contextmanager
+    def batch(self):
+        """
+        Group the writes made to the attached documents inside the block into one atomic
+        commit, the writes of all documents are rolled back if the block raises.
+
+        eg :
+            with txn.batch():
+                index_doc.add(index_data)
+                data_doc.add(data)
+        """
+        stores = list(self.stores.values())
+        for store in stores:
+            store._lock.acquire()
+        try:
+            # an enclosing batch already records the undo state
+            started = [store for store in stores if store._undo is None]
+            for store in started:
+                store._begin_undo()
+            for store in stores:
+                store._group_depth += 1
+            try:
+                yield self
+            except BaseException:
+                for store in stores:
+                    if store._undo is not None:
+                        store._rollback()
+                raise
+            finally:
+                for store in stores:
+                    store._group_depth -= 1
+            for store in started:
+                store._undo = None
+            if not any(store._group_depth for store in stores):
+                self.commit()
+        finally:
+            for store in stores:
+                store._release_writer()
+                store._lock.release()
+
+    def commit(self) -> None:
+        """
+        Commit the pending changes of all attached documents as one transaction.
+
+        The data documents are fsynced first when a document asks for it, then a single log
+        entry makes the transaction durable, the documents' journals are appended afterwards
+        without an fsync of their own.
+        """
+        stores = self.stores
+        for store in stores.values():
+            store._lock.acquire()
+        try:
+            prepared = {}
+            for name, store in stores.items():
+                result = store._prepare_commit()
+                if result is not None:
+                    prepared[name] = result
+            if not prepared:
+                return
+
+            # documents shared with other processes carry the ids committed there
+            txn_id = max(
+                [self.next_id] + [store.config.get("txn", 0) + 1 for store in stores.values()]
+            )
+            self.next_id = txn_id + 1
+            durable = any(stores[name].durability == "always" for name in prepared)
+            if durable:
+                for name in prepared:
+                    if stores[name].symbols is not None:
+                        stores[name].symbols.fsync()
+                    os.fsync(stores[name]._data_file().fileno())
+            self._log_bytes += self.log.append(
+                [["t", txn_id, {name: deltas for name, (deltas, _) in prepared.items()}]],
+                fsync=durable,
+            )
+
+            for name, (deltas, released) in prepared.items():
+                store = stores[name]
+                store.config["txn"] = txn_id
+                store._finish_commit(deltas + [["x", txn_id]], released)
+                store._pending_ops = 0
+                store._commit_seq += 1
+                if store.durability == "batched":
+                    store._start_sync_timer()
+                else:
+                    # the log entry holds the commit, the store journal needs no fsync
+                    store._synced_seq = store._commit_seq
+                store._maybe_compact()
+
+            if self._log_full():
+                self.checkpoint()
+        finally:
+            for store in stores.values():
+                store._release_writer()
+                store._lock.release()
+
+    def _log_full(self) -> bool:
+        """
+        Whether the log holds `log_limit` transactions. Other processes sharing the documents
+        append to the same file, their entries are estimated from its size and the average
+        size of the entries appended here.
+        """
+        if not len(self.log):
+            return False
+        # the log offset is the end of the file after the last append
+        return self.log.offset * len(self.log) >= self.log_limit * self._log_bytes
+
+    def checkpoint(self) -> None:
+        """
+        Sync every attached document and empty the log, all its entries are then on disk.
+
+        The documents' file locks are held from the sync to the reset, a process sharing
+        them cannot append a transaction meanwhile that the reset would drop.
+        """
+        stores = list(self.stores.values())
+        for store in stores:
+            store._lock.acquire()
+        try:
+            for store in stores:
+                store._acquire_writer()
+                store._group_depth += 1  # the commit of the sync keeps the file lock
+            try:
+                for store in stores:
+                    store.sync()
+                self.log.reset(0, fsync=any(store.durability != "os" for store in stores))
+                self.entries = []
+                self._log_bytes = 0
+            finally:
+                for store in stores:
+                    store._group_depth -= 1
+        finally:
+            for store in stores:
+                store._release_writer()
+                store._lock.release()
@@ -6,6 +6,13 @@ from oxdb_lite.oxdoc.oxdbin import Oxdbin
 DBIN_METHODS = [ "json", "oxdbin"]
 
 
+def pick_fields(data: Any, fields) -> Union[Dict[str, Any], None]:
+    """Return the `fields` a decoded dict holds, None if `data` is not a dict."""
+    if not isinstance(data, dict):
+        return None
+    return {key: data[key] for key in fields if key in data}
+
+
 class DBin:
     def __init__(self, method: str = "oxdbin") -> None:
         """
@@ -25,7 +32,7 @@ class DBin:
         self.method: str = method  # Assign the method to the instance attribute
 
     def encode(
-        self, data: Union[Dict[str, Any], List[Any], Any], method: str = None,ctype:str=None
+        self, data: Union[Dict[str, Any], List[Any], Any], method: str = None,ctype:str=None,symbols=None
     ) -> bytes:
         """
         Encode the given data using either JSON or encoding.
@@ -34,6 +41,8 @@ class DBin:
         data (Union[Dict[str, Any], List[Any]]): The data to encode.
         method (str, optional): The encoding method to use. Can be either 'oxdbin' or 'json' .
                                 If not provided, the default method of the instance is used.
+        symbols (SymbolTable, optional): Symbol table of the document, oxdbin stores its
+                                strings as ids. Defaults to None.
 
         Returns:
         bytes: The encoded data in the specified format (oxdbin or or JSON).
@@ -42,13 +51,13 @@ class DBin:
         if method == "json":
             en_data = json.dumps(data).encode("utf-8")  # JSON encoding
         elif method == "oxdbin":
-            en_data = Oxdbin.encode(data,ctype)
+            en_data = Oxdbin.encode(data,ctype,symbols=symbols)
         # else:  # Default is
         #     en_data = bson.encode(data)
         return en_data
 
     def decode(
-        self, data: bytes, method: str = None
+        self, data: bytes, method: str = None, symbols=None
     ) -> Union[Dict[str, Any], List[Any], Any]:
         """
         Decode the given encoded data using either JSON,, or byte decoding.
@@ -57,6 +66,7 @@ class DBin:
             data (bytes): The encoded data to decode.
             method (str, optional): The decoding method to use. Can be either 'oxdbin' or 'json'.
                                     If not provided, the default method of the instance is used.
+            symbols (SymbolTable, optional): Symbol table resolving the ids of oxdbin data. Defaults to None.
 
         Returns:
             Union[Dict[str, Any], List[Any]]: The decoded data as a dictionary, list, or any valid format.
@@ -81,7 +91,7 @@ class DBin:
                 if decoding_method == "json":
                     return json.loads(data.decode("utf-8"))  # JSON decoding
                 elif decoding_method == "oxdbin":
-                    return Oxdbin.decode(data)  # Custom byte decoding
+                    return Oxdbin.decode(data, symbols=symbols)  # Custom byte decoding
                 # elif decoding_method == ":
                 #     return bson.decode(data)  # decoding
             except Exception as e:
@@ -95,5 +105,30 @@ class DBin:
                     f"Failed to load data: all methods incompatible"
                 ) 
 
+    def decode_fields(
+        self, data: bytes, fields, path: tuple = (), method: str = None, symbols=None
+    ) -> Union[Dict[str, Any], None]:
+        """
+        Decode only some fields of an encoded dict, oxdbin skips the other values without
+        decoding them, json data is decoded whole.
+
+        Args:
+            data (bytes): The encoded data.
+            fields (Iterable): The keys to decode.
+            path (tuple, optional): Keys of the nested dicts leading to the dict. Defaults to ().
+            method (str, optional): The decoding method to use. Defaults to the method of the instance.
+            symbols (SymbolTable, optional): Symbol table resolving the ids of oxdbin data. Defaults to None.
+
+        Returns:
+            dict or None: {key: value} for the fields the dict holds, None if it is not a dict.
+        """
+        method = method or self.method
+        if method == "oxdbin":
+            return Oxdbin.decode_fields(data, fields, path, symbols=symbols)
+        data = self.decode(data, method=method)
+        for key in path:
+            data = data.get(key) if isinstance(data, dict) else None
+        return pick_fields(data, fields)
+
 
 
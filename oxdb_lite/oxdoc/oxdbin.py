@@ -2,19 +2,439 @@
 
 
 import struct
+import sys
+from array import array
+from functools import lru_cache
 from typing import Any
 
+try:
+    import numpy
+except ImportError:  # typed arrays decode to array.array (or a list for float16)
+    numpy = None
+
+# format written by Oxdbin.encode, v2 data starts with this byte, v1 data with a type prefix
+VERSION = 2
+
+_U32 = struct.Struct(">I")
+_I64 = struct.Struct(">q")
+_F64 = struct.Struct(">d")
+
+# tag bytes as ints, the way indexing a memoryview returns them
+_N, _S, _I, _F, _L, _T, _D, _A = b"nsifltda"
+# v2 only: None, True, False, bytes, symbol id, the ints 0-127 are the single bytes 0x80-0xff
+_NONE, _TRUE, _FALSE, _B, _Y = b"NTFby"
+_SMALL_INT = 0x80
+
+_SMALL_INTS = [bytes((_SMALL_INT + i,)) for i in range(128)]
+_VARINTS = [bytes((i,)) for i in range(128)]
+
+# dtype of a typed array -> struct format char stored after its 'a' prefix, items are little endian
+ARRAY_DTYPES = {
+    "float64": "d",
+    "float32": "f",
+    "float16": "e",
+    "int8": "b",
+    "uint8": "B",
+    "int16": "h",
+    "int32": "i",
+    "int64": "q",
+}
+_ARRAY_CODES = set(ARRAY_DTYPES.values())
+
+
+def _encode_array(code: str, count: int, data: bytes, version: int = 1) -> bytes:
+    count = count.to_bytes(4, "big") if version == 1 else _varint(count)
+    return b"a" + code.encode() + count + data
+
+
+def _varint(n: int) -> bytes:
+    """Encode a non negative int as LEB128, 7 bits per byte with the high bit set on all but the last."""
+    if n < 0x80:
+        return _VARINTS[n]
+    out = bytearray()
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def _read_varint(view: memoryview, pos: int) -> tuple:
+    result = shift = 0
+    while True:
+        byte = view[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _read_u32(view: memoryview, pos: int) -> tuple:
+    return _U32.unpack_from(view, pos)[0], pos + 4
+
+
+def _array_parts(data: Any) -> Any:
+    """Return (code, count, little endian buffer) of a value stored as a typed array, None for the others."""
+    if numpy is not None and isinstance(data, numpy.ndarray):
+        code = ARRAY_DTYPES.get(data.dtype.name)
+        if data.ndim != 1 or code is None:
+            return None
+        return code, len(data), data.astype("<" + code, copy=False).tobytes()
+    if isinstance(data, array) and data.typecode in _ARRAY_CODES and data.itemsize == struct.calcsize(data.typecode):
+        if sys.byteorder != "little":
+            data = array(data.typecode, data)
+            data.byteswap()
+        return data.typecode, len(data), data.tobytes()
+    return None
+
+
+def _encode_v2(data: Any, out: list, symbols=None) -> None:
+    """
+    Append the v2 encoding of `data` to `out`, lengths and ints are varints. Strings that are
+    in the symbol table `symbols` (see oxdoc.db.symbols) are written as their id.
+    """
+    if isinstance(data, str):
+        if symbols is not None:
+            symbol_id = symbols.id_of(data)
+            if symbol_id is not None:
+                out.append(b"y" + _varint(symbol_id))
+                return
+        raw = data.encode("utf-8")
+        out.append(b"s" + _varint(len(raw)))
+        out.append(raw)
+    elif data is None:
+        out.append(b"N")
+    elif data is True or data is False:
+        out.append(b"T" if data else b"F")
+    elif isinstance(data, int):
+        if 0 <= data < 128:
+            out.append(_SMALL_INTS[data])
+        else:
+            # zigzag, small negative ints stay short
+            out.append(b"i" + _varint(data << 1 if data >= 0 else (-data << 1) - 1))
+    elif isinstance(data, float):
+        out.append(b"f" + _F64.pack(data))
+    elif isinstance(data, dict):
+        out.append(b"d" + _varint(len(data)))
+        for key, value in data.items():
+            symbol_id = symbols.id_of(key, key=True) if symbols is not None and isinstance(key, str) else None
+            if symbol_id is not None:
+                out.append(b"y" + _varint(symbol_id))
+            else:
+                _encode_v2(key, out)
+            _encode_v2(value, out, symbols)
+    elif isinstance(data, (list, tuple)):
+        out.append((b"l" if isinstance(data, list) else b"t") + _varint(len(data)))
+        for item in data:
+            _encode_v2(item, out, symbols)
+    elif isinstance(data, (bytes, bytearray, memoryview)):
+        raw = bytes(data)
+        out.append(b"b" + _varint(len(raw)))
+        out.append(raw)
+    else:
+        parts = _array_parts(data)
+        if parts is not None:
+            out.append(_encode_array(*parts, version=2))
+        elif numpy is not None and isinstance(data, numpy.ndarray):
+            _encode_v2(list(data) if data.ndim > 1 else data.tolist(), out, symbols)
+        else:
+            raise ValueError(f"Unsupported data type: {type(data)}")
+
+
+def _decode_array(data: memoryview, code: str) -> Any:
+    """Return the items of a typed array, a numpy array over `data` itself when numpy is installed."""
+    if numpy is not None:
+        return numpy.frombuffer(data, dtype="<" + code)
+    if code != "e" and array(code).itemsize == struct.calcsize(code):
+        values = array(code)
+        values.frombytes(data)
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values
+    return list(struct.unpack(f"<{len(data) // struct.calcsize(code)}{code}", data))
+
+
+@lru_cache(maxsize=64)
+def _homogeneous(code: str, count: int) -> struct.Struct:
+    # `count` tagged items of one fixed size type, the tag bytes are skipped as pad
+    return struct.Struct(">" + ("x" + code) * count)
+
+
+def _read_symbol(view: memoryview, pos: int, symbols) -> tuple:
+    """Read the symbol id at `pos`, returns (string, new_position)."""
+    if symbols is None:
+        raise ValueError("Oxdbin symbol reference without a symbol table")
+    symbol_id = view[pos]
+    if symbol_id >= 0x80:
+        symbol_id, pos = _read_varint(view, pos)
+        return symbols[symbol_id], pos
+    return symbols[symbol_id], pos + 1
+
+
+def _decode_view(
+    view: memoryview, pos: int, tag: int = None, length: int = None, version: int = 1, symbols=None
+) -> tuple:
+    """
+    Decode the value at `pos` of `view` with an explicit stack instead of recursion.
+
+    `tag` and `length` are given when the caller already read the prefix, `pos` then points
+    at the length or the content.
+
+    Returns:
+        tuple: (decoded_data, new_position)
+    """
+    v2 = version == 2
+    read_len = _read_varint if v2 else _read_u32
+    unpack_u32 = _U32.unpack_from
+    stack = []  # [container, tag, remaining items, pending dict key]
+    while True:
+        if tag is None:
+            tag = view[pos]
+            pos += 1
+        if tag == _S or tag == _N:
+            if length is None:
+                # lengths are read inline on the hot paths, most v2 lengths are one byte
+                if v2:
+                    length = view[pos]
+                    pos += 1
+                    if length >= 0x80:
+                        length, pos = _read_varint(view, pos - 1)
+                else:
+                    (length,) = unpack_u32(view, pos)
+                    pos += 4
+            end = pos + length
+            if end > len(view):
+                raise ValueError("Truncated oxdbin data")
+            value = str(view[pos:end], "utf-8") if tag == _S else 0
+            pos = end
+        elif v2 and tag >= _SMALL_INT:
+            value = tag - _SMALL_INT
+        elif tag == _I:
+            if v2:
+                value, pos = _read_varint(view, pos)
+                value = (value >> 1) ^ -(value & 1)
+            else:
+                (value,) = _I64.unpack_from(view, pos)
+                pos += 8
+        elif tag == _F:
+            (value,) = _F64.unpack_from(view, pos)
+            pos += 8
+        elif v2 and (tag == _NONE or tag == _TRUE or tag == _FALSE):
+            value = None if tag == _NONE else tag == _TRUE
+        elif v2 and tag == _Y:
+            value, pos = _read_symbol(view, pos, symbols)
+        elif v2 and tag == _B:
+            length, pos = read_len(view, pos)
+            end = pos + length
+            if end > len(view):
+                raise ValueError("Truncated oxdbin data")
+            value = bytes(view[pos:end])
+            pos = end
+        elif tag == _A:
+            code = chr(view[pos])
+            if code not in _ARRAY_CODES:
+                raise ValueError(f"Unsupported array type: {code}")
+            count, pos = read_len(view, pos + 1)
+            end = pos + count * struct.calcsize(code)
+            if end > len(view):
+                raise ValueError("Truncated oxdbin data")
+            value = _decode_array(view[pos:end], code)
+            pos = end
+        elif tag == _L or tag == _T or tag == _D:
+            if length is None:
+                length, pos = read_len(view, pos)
+            if tag == _D:
+                container = {}
+            else:
+                container = []
+                # fast path for lists of floats or ints such as embeddings, v2 ints vary in size
+                first = view[pos] if length > 1 and pos < len(view) else None
+                if first == _F or (first == _I and not v2):
+                    end = pos + 9 * length
+                    if end <= len(view) and view[pos:end:9] == (b"f" if first == _F else b"i") * length:
+                        container = list(_homogeneous("d" if first == _F else "q", length).unpack_from(view, pos))
+                        pos = end
+                        length = 0
+            if length:
+                frame = [container, tag, length, None]
+                stack.append(frame)
+                if tag == _D:
+                    if view[pos] == _S:
+                        # string keys are read in place instead of going through the stack
+                        if v2:
+                            key_len = view[pos + 1]
+                            start = pos + 2
+                            if key_len >= 0x80:
+                                key_len, start = _read_varint(view, pos + 1)
+                        else:
+                            (key_len,) = unpack_u32(view, pos + 1)
+                            start = pos + 5
+                        end = start + key_len
+                        if end > len(view):
+                            raise ValueError("Truncated oxdbin data")
+                        frame[3] = (str(view[start:end], "utf-8"),)
+                        pos = end
+                    elif v2 and view[pos] == _Y:
+                        # symbol keys are the strings of the table, shared by every record using them
+                        key, pos = _read_symbol(view, pos + 1, symbols)
+                        frame[3] = (key,)
+                tag = length = None
+                continue
+            value = tuple(container) if tag == _T else container
+        else:
+            raise ValueError(f"Unsupported data type prefix: {chr(tag)}")
+        tag = length = None
+
+        # hand the value to the containers it completes
+        while stack:
+            frame = stack[-1]
+            if frame[1] == _D:
+                if frame[3] is None:
+                    frame[3] = (value,)
+                    break
+                frame[0][frame[3][0]] = value
+                frame[3] = None
+                frame[2] -= 1
+                if frame[2]:
+                    if view[pos] == _S:
+                        # string keys are read in place instead of going through the stack
+                        if v2:
+                            key_len = view[pos + 1]
+                            start = pos + 2
+                            if key_len >= 0x80:
+                                key_len, start = _read_varint(view, pos + 1)
+                        else:
+                            (key_len,) = unpack_u32(view, pos + 1)
+                            start = pos + 5
+                        end = start + key_len
+                        if end > len(view):
+                            raise ValueError("Truncated oxdbin data")
+                        frame[3] = (str(view[start:end], "utf-8"),)
+                        pos = end
+                    elif v2 and view[pos] == _Y:
+                        # symbol keys are the strings of the table, shared by every record using them
+                        key, pos = _read_symbol(view, pos + 1, symbols)
+                        frame[3] = (key,)
+                    break
+            else:
+                frame[0].append(value)
+                frame[2] -= 1
+                if frame[2]:
+                    break
+            stack.pop()
+            value = tuple(frame[0]) if frame[1] == _T else frame[0]
+        else:
+            return value, pos
+
+
+def _skip_view(view: memoryview, pos: int, version: int = 1) -> int:
+    """Return the position after the value at `pos`, only its prefixes and lengths are read."""
+    v2 = version == 2
+    read_len = _read_varint if v2 else _read_u32
+    pending = 1  # values left to skip, containers add their items
+    while pending:
+        pending -= 1
+        tag = view[pos]
+        pos += 1
+        if tag == _S or tag == _N or (v2 and tag == _B):
+            length, pos = read_len(view, pos)
+            pos += length
+        elif v2 and (tag >= _SMALL_INT or tag == _NONE or tag == _TRUE or tag == _FALSE):
+            pass
+        elif tag == _I or (v2 and tag == _Y):
+            if v2:
+                while view[pos] >= 0x80:
+                    pos += 1
+                pos += 1
+            else:
+                pos += 8
+        elif tag == _F:
+            pos += 8
+        elif tag == _A:
+            code = chr(view[pos])
+            if code not in _ARRAY_CODES:
+                raise ValueError(f"Unsupported array type: {code}")
+            count, pos = read_len(view, pos + 1)
+            pos += count * struct.calcsize(code)
+        elif tag == _L or tag == _T:
+            length, pos = read_len(view, pos)
+            pending += length
+        elif tag == _D:
+            length, pos = read_len(view, pos)
+            pending += 2 * length
+        else:
+            raise ValueError(f"Unsupported data type prefix: {chr(tag)}")
+    if pos > len(view):
+        raise ValueError("Truncated oxdbin data")
+    return pos
+
+
+def _field_positions(view: memoryview, pos: int, version: int, fields, symbols=None) -> Any:
+    """
+    Find the entries of the dict at `pos` whose key is in `fields`, the other values are skipped.
+
+    Returns:
+        dict or None: {key: position of its value}, None if the value at `pos` is not a dict.
+    """
+    if view[pos] != _D:
+        return None
+    v2 = version == 2
+    read_len = _read_varint if v2 else _read_u32
+    strings = symbols.strings if symbols is not None else ()
+    length, pos = read_len(view, pos + 1)
+    positions = {}
+    for _ in range(length):
+        tag = view[pos]
+        if tag == _S:
+            key_len, start = read_len(view, pos + 1)
+            pos = start + key_len
+            if pos > len(view):
+                raise ValueError("Truncated oxdbin data")
+            key = str(view[start:pos], "utf-8")
+        elif v2 and tag == _Y:
+            symbol_id = view[pos + 1]
+            if symbol_id < 0x80 and symbol_id < len(strings):
+                key = strings[symbol_id]
+                pos += 2
+            else:
+                key, pos = _read_symbol(view, pos + 1, symbols)
+        else:
+            key, pos = _decode_view(view, pos, None, None, version, symbols)
+        if key in fields:
+            positions[key] = pos
+            if len(positions) == len(fields):
+                break
+        # single byte values and strings are stepped over in place
+        tag = view[pos]
+        if v2 and (tag >= _SMALL_INT or tag == _NONE or tag == _TRUE or tag == _FALSE):
+            pos += 1
+        elif v2 and tag == _S and view[pos + 1] < 0x80:
+            pos += 2 + view[pos + 1]
+        else:
+            pos = _skip_view(view, pos, version)
+    return positions
+
 
 class Oxdbin:
     def __init__(self) -> None:
         pass
 
-    def encode(data: Any,ctype:str=None,) -> bytes:
+    def encode(data: Any,ctype:str=None,version:int=VERSION,symbols=None) -> bytes:
         """
         Convert any type of data (string, list, dict, etc.) to bytes.
 
+        1-d numpy arrays and array.array of a dtype in ARRAY_DTYPES are stored as a packed
+        buffer with an 'a' prefix, they decode to a numpy array without per item work.
+
+        v2 writes lengths and ints as LEB128 varints, the ints 0-127, None and bools as a
+        single byte and adds a bytes type, v1 uses fixed 4 byte lengths and 8 byte ints.
+
         Args:
             data (Any): The data to convert to bytes.
+            version (int, optional): The format to write, 1 or 2. Defaults to VERSION.
+            symbols (SymbolTable, optional): Symbol table of the document, v2 writes the repeated
+                keys and short values it holds as ids. Defaults to None.
 
         Returns:
             bytes: The data serialized as bytes.
@@ -24,6 +444,10 @@ class Oxdbin:
             datalen= totbytelen-5
             deldata = b'\x00'*datalen
             return b"n" + datalen.to_bytes(4, "big") + deldata
+        if version == 2:
+            out = [bytes((VERSION,))]
+            _encode_v2(data, out, symbols)
+            return b"".join(out)
         if isinstance(data, str):
             # Encode strings with a 's' prefix and UTF-8 encoding
             return b"s" + len(data).to_bytes(4, "big") + data.encode("utf-8")
@@ -36,20 +460,28 @@ class Oxdbin:
             # Encode floats with an 'f' prefix
             return b"f" + Oxdbin.float_to_bytes(data)
 
+        elif _array_parts(data) is not None:
+            # Encode 1-d numeric arrays as one packed buffer with an 'a' prefix
+            return _encode_array(*_array_parts(data))
+
+        elif numpy is not None and isinstance(data, numpy.ndarray):
+            # the other arrays by rows or items
+            return Oxdbin.encode(list(data) if data.ndim > 1 else data.tolist(), version=1)
+
         elif isinstance(data, list):
             # Encode lists with an 'l' prefix and serialize each element recursively
-            byte_list = b"".join([Oxdbin.encode(d) for d in data])
+            byte_list = b"".join([Oxdbin.encode(d, version=1) for d in data])
             return b"l" + len(data).to_bytes(4, "big") + byte_list
 
         elif isinstance(data, tuple):
             # Encode tuples with a 't' prefix and serialize each element recursively
-            byte_tuple = b"".join([Oxdbin.encode(d) for d in data])
+            byte_tuple = b"".join([Oxdbin.encode(d, version=1) for d in data])
             return b"t" + len(data).to_bytes(4, "big") + byte_tuple
 
         elif isinstance(data, dict):
             # Encode dictionaries with a 'd' prefix, key-value pairs serialized recursively
             byte_datas = b"".join(
-                [Oxdbin.encode(key) + Oxdbin.encode(value) for key, value in data.items()]
+                [Oxdbin.encode(key, version=1) + Oxdbin.encode(value, version=1) for key, value in data.items()]
             )
             return b"d" + len(data).to_bytes(4, "big") + byte_datas
 
@@ -57,91 +489,105 @@ class Oxdbin:
             raise ValueError(f"Unsupported data type: {type(data)}")
 
 
-    def decode(data_bytes: bytes, data_type:str=None,length:int=None, pos: int = 0, posless: bool = True) -> Any:
+    def decode(data_bytes: bytes, data_type:str=None,length:int=None, pos: int = 0, posless: bool = True, symbols=None) -> Any:
         """
         Convert bytes back to the original data type (string, list, dict, etc.).
 
+        The data is read in place through a memoryview, nested values are decoded with an
+        explicit stack and lists of floats or ints are unpacked at once. v1 and v2 data are
+        both read, v2 is recognized by its leading version byte.
+
         Args:
             data_bytes (bytes): The bytes to convert back to the original data.
             pos Optional(int,optional): The current position in the stream.
+            symbols (SymbolTable, optional): Symbol table resolving the ids of the data. Defaults to None.
 
         Returns:
             Any: The original data structure.
             tuple: (decoded_data, new_position)
+
+        Raises:
+            ValueError: If the data is truncated or holds an unknown type prefix or symbol.
+        """
+        view = data_bytes if isinstance(data_bytes, memoryview) else memoryview(data_bytes)
+        tag = None
+        version = 1
+        if not data_type and pos < len(view) and view[pos] == VERSION:
+            version = VERSION
+            pos += 1
+        if data_type:
+            # the caller read the prefix, and the length when it is given
+            tag = ord(data_type)
+            pos += 0 if length and data_type in "nsltd" else 1
+        try:
+            value, pos = _decode_view(view, pos, tag, length or None, version, symbols)
+        except (struct.error, IndexError) as e:
+            raise ValueError(f"Truncated oxdbin data: {e}") from None
+        if posless:
+            return value
+        return value, pos
+
+    def skip(data_bytes: bytes, pos: int = 0, version: int = 1) -> int:
         """
+        Return the position after the value at `pos` without decoding it.
 
-        data_type =data_type or  chr(data_bytes[pos])
-        bdsize_len = 5 if not length else 0
-
-        if data_type == "n":
-            if not length:
-                length = int.from_bytes(data_bytes[pos + 1 : pos + 5], "big")
-            #value = int.from_bytes(data_bytes[pos + 5 : pos + 5 + length],"big")
-            value = 0
-            if posless:
-                return value
-            return value, pos + 5 + length
-
-        elif data_type == "s":
-            if not length:
-                length = int.from_bytes(data_bytes[pos + 1 : pos + 5], "big")
-            value = data_bytes[pos + bdsize_len : pos + bdsize_len + length].decode("utf-8")
-            if posless:
-                return value
-            return value, pos + bdsize_len + length
-
-        elif data_type == "i":
-            value = int.from_bytes(data_bytes[pos + 1 : pos + 9], "big", signed=True)
-            if posless:
-                return value
-            return value, pos + 9
-
-        elif data_type == "f":
-            value = Oxdbin.bytes_to_float(data_bytes[pos + 1 : pos + 9])
-            if posless:
-                return value
-            return value, pos + 9
-
-        elif data_type == "l":
-            if not length:
-                length = int.from_bytes(data_bytes[pos + 1 : pos + 5], "big")
-            datas = []
-            new_pos = pos + bdsize_len
-            for _ in range(length):
-                data, new_pos = Oxdbin.decode(data_bytes, pos=new_pos, posless=False)
-                datas.append(data)
-            if posless:
-                return datas
-            return datas, new_pos
-
-        elif data_type == "t":
-            if not length:
-                length = int.from_bytes(data_bytes[pos + 1 : pos + 5], "big")
-            datas = []
-            new_pos = pos + bdsize_len
-            for _ in range(length):
-                data, new_pos = Oxdbin.decode(data_bytes, pos=new_pos, posless=False)
-                datas.append(data)
-            if posless:
-                return tuple(datas)
-            return tuple(datas), new_pos
-
-        elif data_type == "d":
-            if not length:
-                length = int.from_bytes(data_bytes[pos + 1 : pos + 5], "big")
-            datas = {}
-            new_pos = pos + bdsize_len
-            for _ in range(length):
-                key, new_pos = Oxdbin.decode(data_bytes, pos=new_pos, posless=False)
-                value, new_pos = Oxdbin.decode(data_bytes, pos= new_pos, posless=False)
-                datas[key] = value
-            if posless:
-                return datas
-            return datas, new_pos
+        Args:
+            data_bytes (bytes): The encoded data.
+            pos (int, optional): The position of the value, or of the version byte. Defaults to 0.
+            version (int, optional): The format of a value inside v2 data, whose version byte
+                is not at `pos`. Defaults to 1.
 
-        else:
-            raise ValueError(f"Unsupported data type prefix: {data_type}")
+        Raises:
+            ValueError: If the data is truncated or holds an unknown type prefix.
+        """
+        view = data_bytes if isinstance(data_bytes, memoryview) else memoryview(data_bytes)
+        if pos < len(view) and view[pos] == VERSION:
+            version = VERSION
+            pos += 1
+        try:
+            return _skip_view(view, pos, version)
+        except (struct.error, IndexError) as e:
+            raise ValueError(f"Truncated oxdbin data: {e}") from None
+
+    def decode_fields(data_bytes: bytes, fields, path: tuple = (), symbols=None) -> Any:
+        """
+        Decode only some fields of an encoded dict, the values of the other keys are skipped
+        without being decoded, filters reading one or two fields of rich records stay cheap.
+
+        Args:
+            data_bytes (bytes): The encoded data.
+            fields (Iterable): The keys to decode.
+            path (tuple, optional): Keys of the nested dicts leading to the dict, e.g. ("",) for
+                the value of an Oxdld record. Defaults to ().
+            symbols (SymbolTable, optional): Symbol table resolving the ids of the data. Defaults to None.
 
+        Returns:
+            dict or None: {key: value} for the fields the dict holds, in stored order, None if
+                the data (or a dict on the path) is not a dict or a key of the path is missing.
+
+        Raises:
+            ValueError: If the data is truncated or holds an unknown type prefix or symbol.
+        """
+        view = data_bytes if isinstance(data_bytes, memoryview) else memoryview(data_bytes)
+        fields = frozenset(fields)
+        version, pos = 1, 0
+        if len(view) and view[0] == VERSION:
+            version, pos = VERSION, 1
+        try:
+            for key in path:
+                positions = _field_positions(view, pos, version, (key,), symbols)
+                if not positions:
+                    return None
+                pos = positions[key]
+            positions = _field_positions(view, pos, version, fields, symbols)
+            if positions is None:
+                return None
+            return {
+                key: _decode_view(view, field_pos, None, None, version, symbols)[0]
+                for key, field_pos in positions.items()
+            }
+        except (struct.error, IndexError) as e:
+            raise ValueError(f"Truncated oxdbin data: {e}") from None
 
     def decode_all(data_bytes:bytes):
         data = []
@@ -1,11 +1,13 @@
 import os
 import argparse
 import uvicorn
+import numpy as np
 
 # import re
 # import importlib.resources as pkg_resources
 
 
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
 from fastapi import FastAPI, HTTPException, Header, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
@@ -103,7 +105,8 @@ def pull(data: PullModel, verified: None = Depends(verify_api_key)):
         result = db.doc.pull(**data.model_dump())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    return result
+    # embeddings pulled from vec.oxd are numpy arrays
+    return jsonable_encoder(result, custom_encoder={np.ndarray: lambda array: array.tolist()})
 
 
 @app.post("/search")
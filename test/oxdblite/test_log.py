@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pydantic")
+pytest.importorskip("ox_onnx")
+
+from oxdb_lite.core.log import dbDoc
+from oxdb_lite.oxdoc.db import Oxdld
+
+
+def test_search_data(tmp_path):
+    data = Oxdld(str(tmp_path / "data"))
+    data.add({"1": "first log line", "2": "second entry", "3": "third log line"})
+    assert dbDoc.search_data("log", data) == ["first log line", "third log line"]
+    assert dbDoc.search_data("entry", data, output="idx") == ["2"]
+    assert dbDoc.search_data("missing", data) == []
+
+
+def test_pull_tail_and_range_apply_filters(tmp_path):
+    from oxdb_lite.core.log import Default_vec_model
+
+    doc = dbDoc("logs")
+    doc.connect_db(str(tmp_path), Default_vec_model)
+    doc.push(
+        [f"line {i}" for i in range(10)],
+        uid=["odd" if i % 2 else "even" for i in range(10)],
+        embeddings=False,
+    )
+    idxs = doc.data_oxd.keys()
+
+    assert list(doc.pull(tail=4)) == idxs[-4:]
+    assert list(doc.pull(tail=4, uid="odd")) == idxs[-4:][1::2]
+    assert list(doc.pull(idx_range=(idxs[2], idxs[6]), idx=[idxs[3], idxs[8]])) == [idxs[3]]
+    assert list(doc.pull(tail=4, where_data={"search_string": "line 9"})) == [idxs[9]]
+
+
+def test_filtered_search_with_embeddings(tmp_path):
+    import numpy as np
+    from oxdb_lite.core.log import Default_vec_model
+
+    doc = dbDoc("logs")
+    doc.connect_db(str(tmp_path), Default_vec_model)
+    doc.push(
+        [f"log line {i}" for i in range(6)],
+        uid=["u1" if i % 2 else "u2" for i in range(6)],
+        metadata=[{"level": "warn" if i < 3 else "info"} for i in range(6)],
+    )
+    idxs = doc.data_oxd.keys()
+
+    vecs = doc.pull(uid="u1", docfile="vec.oxd")
+    assert list(vecs) == idxs[1::2]
+    assert all(isinstance(vec, np.ndarray) for vec in vecs.values())
+
+    # the filters pull the packed embeddings of vec.oxd before the vector search
+    for filters, expected in (({"uid": "u1"}, idxs[1::2]), ({"where": {"level": "warn"}}, idxs[:3])):
+        res = doc.search("log", topn=6, includes=["embeddings"], **filters)
+        assert sorted(res["idx"]) == expected
+        assert all(isinstance(vec, list) and len(vec) == len(vecs[idxs[1]]) for vec in res["embeddings"])
@@ -0,0 +1,84 @@
+from oxdb_lite.oxdoc.db import Oxdld
+import pytest
+
+from oxdb_lite.oxdoc.db.cache import LRUCache, TinyLFUCache, TwoQCache, make_cache
+
+
+def test_byte_budget():
+    cache = LRUCache(capacity=None, max_bytes=100)
+    cache.put("a", "x", size=40)
+    cache.put("b", "y", size=40)
+    assert cache.get("a") == "x"  # b is now the least recently used
+    cache.put("c", "z", size=40)
+    assert "b" not in cache and cache.bytes == 80
+
+    cache.put("big", "w", size=101)  # larger than the whole budget, not cached
+    assert "big" not in cache and len(cache) == 2
+
+    cache.put("a", "x2", size=10)
+    assert cache.bytes == 50
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["evictions"]) == (1, 1)
+    assert cache.get("missing", 0) == 0
+    assert cache.stats()["misses"] == 1
+
+
+def test_resize_and_oxdld_accounting(tmp_path):
+    cache = LRUCache(capacity=5)
+    for i in range(5):
+        cache.put(i, i)
+    cache.resize(capacity=2)
+    assert cache.keys() == [3, 4] and cache.evictions == 3
+
+    doc = Oxdld(str(tmp_path / "cache"), cache_capacity=None, cache_bytes=200)
+    doc.add({str(i): "v" * 50 for i in range(10)})
+    assert doc.lrucache.bytes <= 200
+    assert len(doc.lrucache) < 10
+    doc.set("empty", "")
+    assert doc.get("empty") == "" and doc.lrucache.hits == 1
+
+
+@pytest.mark.parametrize("policy", ["lru", "2q", "tinylfu"])
+def test_policies_share_interface(policy):
+    cache = make_cache(policy, capacity=4, max_bytes=1000)
+    for i in range(10):
+        cache.put(i, str(i), size=10)
+        assert len(cache) <= 4 and cache.bytes == 10 * len(cache)
+    key = cache.keys()[0]
+    assert cache.get(key) == str(key)
+    assert cache.delete(key) and key not in cache
+    cache.put("new", "v", size=5, admit=False)
+    assert "new" not in cache
+
+
+@pytest.mark.parametrize("cache_type", [TwoQCache, TinyLFUCache])
+def test_scan_resistance(cache_type):
+    cache = cache_type(capacity=20)
+    hot = [f"hot{i}" for i in range(10)]
+    for _ in range(3):
+        for key in hot:
+            if cache.get(key) is None:
+                cache.put(key, key)
+
+    for i in range(200):  # a single pass over cold keys
+        key = f"cold{i}"
+        if cache.get(key) is None:
+            cache.put(key, key)
+
+    assert all(key in cache for key in hot)
+    lru = LRUCache(capacity=20)
+    for key in hot + [f"cold{i}" for i in range(200)]:
+        lru.put(key, key)
+    assert not any(key in lru for key in hot)
+
+
+def test_oxdld_cache_policy(tmp_path):
+    with pytest.raises(ValueError):
+        make_cache("fifo")
+    doc = Oxdld(str(tmp_path / "policy"), cache_capacity=8, cache_policy="2q")
+    doc.add({str(i): i for i in range(20)})
+    doc.lrucache.clear()
+    assert doc.get_many([str(i) for i in range(20)], admit=False)["7"] == 7
+    assert len(doc.lrucache) == 0
+    assert doc.get("7") == 7 and "7" in doc.lrucache
@@ -0,0 +1,60 @@
+import random
+
+from oxdb_lite.oxdoc.db.freeindex import FreeIndex
+
+
+def test_fit_policies():
+    blocks = {0: 50, 100: 8, 200: 20, 300: 12}
+    picks = {}
+    for policy in ["first", "best", "size-class"]:
+        fi = FreeIndex(fit_policy=policy)
+        for position, length in blocks.items():
+            fi.add(position, length)
+        picks[policy] = fi.find_space(10)
+        assert fi.find_space(100) == "EOF"
+        assert fi.free_bytes == 90 - 10
+
+    assert picks == {"first": 0, "best": 300, "size-class": 200}
+
+
+def test_merge_and_stats():
+    fi = FreeIndex()
+    fi.add(50, 10)
+    fi.add(70, 10)
+    fi.add(60, 10)  # fills the gap, merges with both neighbours
+    assert dict(fi.index) == {50: 30}
+
+    assert fi.find_space(30) == 50
+    assert fi.stats()["blocks"] == 0
+
+    fi.add(0, 4)
+    fi.add(10, 100)
+    stats = fi.stats()
+    assert stats["blocks"] == 2
+    assert stats["free_bytes"] == 104
+    assert stats["largest"] == 100
+    assert stats["size_classes"] == {8: 1, 128: 1}
+
+
+def test_structures_stay_consistent():
+    random.seed(7)
+    fi = FreeIndex(fit_policy="size-class")
+    end = 0
+    allocated = []
+    for _ in range(2000):
+        if allocated and random.random() < 0.5:
+            position, size = allocated.pop(random.randrange(len(allocated)))
+            fi.add(position, size)
+        else:
+            size = random.randint(1, 64)
+            position = fi.find_space(size)
+            if position == "EOF":
+                position, end = end, end + size
+            allocated.append((position, size))
+
+    assert sorted(fi.sizes) == sorted((l, p) for p, l in fi.index.items())
+    assert fi.free_bytes == sum(fi.index.values())
+    assert sum(l for _, l in allocated) + fi.free_bytes == end
+    positions = list(fi.index.items())
+    for (p1, l1), (p2, _) in zip(positions, positions[1:]):
+        assert p1 + l1 < p2
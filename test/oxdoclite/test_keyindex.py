@@ -0,0 +1,70 @@
+import os
+
+from oxdb_lite.oxdoc.db import Oxdld
+from oxdb_lite.oxdoc.db.keyindex import KeyIndex, write_packed
+
+
+def test_packed_index_and_overlay(tmp_path):
+    path = str(tmp_path / "index.oxdkeys.bin")
+    entries = {str(i): (i * 10, i + 1) for i in range(100)}
+    entries["name"] = (5, 6)
+    write_packed(path, entries.items(), seq=3)
+
+    index = KeyIndex(path)
+    assert len(index) == 101 and index.base.seq == 3
+    assert index["42"] == (420, 43) and index.get("missing") is None
+    assert "name" in index and 7 not in index
+    assert list(index)[:11] == [str(i) for i in range(10)] + ["10"]  # numeric order
+
+    index["42"] = (1, 2)
+    index["new"] = (3, 4)
+    del index["0"]
+    del index["new"]
+    assert index["42"] == (1, 2) and "0" not in index and "new" not in index
+    assert len(index) == 100
+    expected = dict(entries)
+    expected["42"] = (1, 2)
+    del expected["0"]
+    assert dict(index.items()) == expected
+
+    empty = str(tmp_path / "empty.oxdkeys.bin")
+    write_packed(empty, [])
+    assert len(KeyIndex(empty)) == 0 and KeyIndex(empty).get("a") is None
+
+
+def test_checkpoint_writes_packed_index(tmp_path):
+    doc = Oxdld(str(tmp_path / "packed"), checkpoint_ops=8, compact_threshold=None)
+    doc.add({str(i): f"value{i}" for i in range(20)})
+    doc.delete("3")
+    doc.save_index()
+    seq = doc.config["journal_seq"]
+    assert [name for name in os.listdir(doc.doc_path) if name.endswith(".oxdkeys.bin")] == [
+        f"index.{seq}.oxdkeys.bin"
+    ]
+    assert not doc.index.overlay
+    doc.set("20", "value20")
+
+    reopened = Oxdld(str(tmp_path / "packed"))
+    assert reopened.index.base is not None and set(reopened.index.overlay) == {"20"}
+    assert len(reopened) == 20 and reopened.get("19") == "value19" and "3" not in reopened
+    reopened.compact()
+    assert Oxdld(str(tmp_path / "packed")).get("20") == "value20"
+
+
+def test_ordered_scans(tmp_path):
+    doc = Oxdld(str(tmp_path / "ordered"), checkpoint_ops=8, compact_threshold=None)
+    doc.add({str(i): i for i in range(1, 120)})
+    doc.save_index()  # the keys below go to the overlay of the packed index
+    doc.add({"user:2": "b", "user:1": "a", "120": 120})
+    doc.delete(["7", "100"])
+
+    assert doc.keys()[:3] == ["1", "2", "3"] and doc.keys()[-2:] == ["user:1", "user:2"]
+    assert doc.range_keys(5, 10) == ["5", "6", "8", "9"]
+    assert list(doc.range(118, 121)) == [("118", 118), ("119", 119), ("120", 120)]
+    assert doc.range_keys(99, 102, reverse=True) == ["101", "99"]
+    assert doc.prefix_keys("10") == ["10"] + [str(i) for i in range(101, 110)]
+    assert dict(doc.prefix("user:")) == {"user:1": "a", "user:2": "b"}
+    assert doc.first(2) == {"1": 1, "2": 2}
+    assert list(doc.last(3)) == ["120", "user:1", "user:2"]
+    assert list(reversed(doc))[:2] == ["user:2", "user:1"]
+    assert doc.range_keys(limit=0) == []
@@ -0,0 +1,164 @@
+import multiprocessing
+import threading
+import time
+import traceback
+
+import pytest
+
+from oxdb_lite.oxdoc.db import Oxdld, RWLock
+
+
+def test_rwlock_readers_and_writer():
+    lock = RWLock()
+    active, seen = [], []
+
+    def reader():
+        with lock.read():
+            active.append(1)
+            time.sleep(0.05)
+            seen.append(len(active))
+            active.pop()
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    time.sleep(0.01)
+    with lock.write():
+        assert not active  # the writer waited for every reader
+    for thread in readers:
+        thread.join()
+    assert max(seen) > 1  # readers shared the lock
+
+    with lock.write(), lock.write(), lock.read():
+        pass  # both sides are reentrant for the writer
+    with lock.read():
+        with pytest.raises(RuntimeError):
+            lock.acquire_write()
+
+
+@pytest.mark.parametrize("mmap_reads", [False, True])
+def test_concurrent_reads_during_writes(tmp_path, mmap_reads):
+    doc = Oxdld(
+        str(tmp_path / "threads"),
+        cache_capacity=8,
+        compact_threshold=None,
+        mmap_reads=mmap_reads,
+    )
+    doc.add({str(i): f"value{i}-0" for i in range(200)})
+    errors = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            try:
+                for key, value in doc.get_many([str(i) for i in range(0, 200, 7)]).items():
+                    assert value.startswith(f"value{key}-")
+                assert doc.get("13").startswith("value13-")
+                for key, value in doc.items(buffer_size=256):
+                    assert value.startswith(f"value{key}-")
+            except Exception as e:  # surfaced on the main thread
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=reader) for _ in range(3)]
+    for thread in readers:
+        thread.start()
+    for round in range(1, 6):
+        doc.add({str(i): f"value{i}-{round}" * round for i in range(0, 200, 3)})
+        doc.compact_online(chunk_bytes=512).wait()
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    assert not errors
+    assert doc.get("3") == "value3-5" * 5
+    assert len(doc) == 200
+
+
+def test_shared_document(tmp_path):
+    path = str(tmp_path / "shared")
+    # two handles of one document stand in for two processes, their file locks conflict
+    first = Oxdld(path, shared=True, checkpoint_ops=16, compact_threshold=None)
+    second = Oxdld(path, shared=True, checkpoint_ops=16, compact_threshold=None)
+
+    first.set("k", "one")
+    assert second.get("k") == "one"
+    second.set("k", "two")
+    second.set("other", "value")
+    assert first.get("k") == "two"
+    first.delete("other")
+    assert "other" not in second
+
+    # a checkpoint and a compaction replace the index and the data document
+    first.add({str(i): f"value{i}" for i in range(40)})
+    second.delete([str(i) for i in range(0, 40, 2)])
+    first.compact()
+    assert second.get("39") == "value39" and second.get("38") is None
+    assert len(second) == 21
+
+    with first.group_commit():
+        first.set("k", "three")
+        writer = threading.Thread(target=second.set, args=("k", "four"))
+        writer.start()
+        writer.join(0.1)
+        assert writer.is_alive()  # waits for the other writer to commit
+    writer.join()
+    assert first.get("k") == "four"
+
+    # the file lock is held from the copy of the compaction until its file is swapped in
+    held = []
+    swap = first._swap_compacted
+    first._swap_compacted = lambda *args: (held.append(first._writer_held), swap(*args))
+    first.compact()
+    assert held == [True]
+
+    reopened = Oxdld(path)
+    assert reopened.get("k") == "four" and reopened.get("1") == "value1"
+    assert len(reopened) == 21
+
+
+def _shared_writer(path, rounds):
+    doc = Oxdld(path, shared=True, checkpoint_ops=30, compact_threshold=None)
+    for round in range(rounds):
+        doc.add({str(i): f"value{i}-" + "x" * (round * 7 % 300) for i in range(40)})
+        doc.delete([str(i) for i in range(round % 3, 40, 3)])
+        if round % 3 == 2:
+            doc.compact()
+    doc.close()
+
+
+def _shared_reader(path, stop, errors):
+    doc = Oxdld(path, shared=True, checkpoint_ops=30, compact_threshold=None)
+    while not stop.is_set():
+        try:
+            for i in range(40):
+                value = doc.get(str(i))
+                assert value is None or value.startswith(f"value{i}-")
+            for key, value in doc.get_many([str(i) for i in range(40)]).items():
+                assert value.startswith(f"value{key}-")
+        except Exception:  # surfaced on the main process
+            errors.put(traceback.format_exc())
+            return
+
+
+def test_shared_readers_during_writes(tmp_path):
+    path = str(tmp_path / "processes")
+    Oxdld(path, shared=True).set("0", "value0-")
+    stop, errors = multiprocessing.Event(), multiprocessing.Queue()
+    readers = [
+        multiprocessing.Process(target=_shared_reader, args=(path, stop, errors))
+        for _ in range(2)
+    ]
+    for reader in readers:
+        reader.start()
+    # journal appends, checkpoints and compactions of another process under the readers
+    writer = multiprocessing.Process(target=_shared_writer, args=(path, 24))
+    writer.start()
+    writer.join()
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert writer.exitcode == 0
+    assert errors.empty(), errors.get()
+    assert all(reader.exitcode == 0 for reader in readers)
@@ -0,0 +1,105 @@
+from array import array
+
+import pytest
+
+from oxdb_lite.oxdoc import Oxdbin
+
+
+def test_decode_round_trip():
+    value = {
+        "text": "log entry",
+        "n": -42,
+        "score": 0.25,
+        "embedding": [i / 7 for i in range(384)],
+        "ids": [1, 2, 3],
+        "mixed": [1, 2.5, "three", (4, [5.0, 6.0]), {}],
+        "nested": {"a": {"b": [[], (), ""]}, 7: "int key"},
+        "pair": (1, 2),
+    }
+    data = Oxdbin.encode(value)
+    assert Oxdbin.decode(data) == value
+    assert Oxdbin.decode(memoryview(data)) == value
+    assert Oxdbin.decode(data + data, posless=False) == (value, len(data))
+    assert Oxdbin.decode_all(data + Oxdbin.encode("tail")) == [value, "tail"]
+    assert Oxdbin.decode(Oxdbin.encode("abc", version=1), data_type="s") == "abc"
+    assert Oxdbin.decode(b"abc", data_type="s", length=3) == "abc"
+
+    # nested deeper than the recursion limit
+    decoded = Oxdbin.decode(b"l\x00\x00\x00\x01" * 5000 + b"l\x00\x00\x00\x00")
+    for _ in range(5000):
+        (decoded,) = decoded
+    assert decoded == []
+
+
+def test_decode_damaged_data():
+    data = Oxdbin.encode({"embedding": [0.5] * 16, "text": "value"})
+    for end in (1, 8, len(data) // 2, len(data) - 1):
+        with pytest.raises(ValueError):
+            Oxdbin.decode(data[:end])
+    with pytest.raises(ValueError):
+        Oxdbin.decode(b"z")
+
+
+def test_typed_arrays():
+    vector = array("f", [i / 7 for i in range(384)])
+    data = Oxdbin.encode({"vec": vector, "ids": array("q", [1, -2, 3])})
+    assert len(Oxdbin.encode(vector)) * 2.2 < len(Oxdbin.encode(list(vector)))
+    decoded = Oxdbin.decode(data)
+    assert list(decoded["vec"]) == list(vector)
+    assert list(decoded["ids"]) == [1, -2, 3]
+    with pytest.raises(ValueError):
+        Oxdbin.decode(data[:-1])
+
+
+def test_numpy_arrays():
+    np = pytest.importorskip("numpy")
+    for dtype in ("float32", "float16", "float64", "int8"):
+        vector = np.arange(-64, 64).astype(dtype)
+        decoded = Oxdbin.decode(Oxdbin.encode({"vec": vector}))["vec"]
+        assert decoded.dtype == np.dtype(dtype) and (decoded == vector).all()
+    matrix = np.ones((3, 4), dtype="float32")
+    assert np.array(Oxdbin.decode(Oxdbin.encode(matrix))).tolist() == matrix.tolist()
+
+
+def test_skip_and_decode_fields():
+    value = {
+        "meta": {"uid": "user1", "n": -3, "raw": b"xy", "vec": array("f", [1.0, 2.0])},
+        "scores": [0.5] * 8,
+        "nested": [{"a": (1, None)}, True],
+        "date": "01-02-2024",
+        7: "int key",
+    }
+    for version in (1, 2):
+        if version == 1:
+            value = {key: val for key, val in value.items() if key != "nested"}
+            value["meta"] = {"uid": "user1", "n": -3}
+        data = Oxdbin.encode(value, version=version)
+        assert Oxdbin.skip(data + b"tail") == len(data)
+        assert Oxdbin.decode_fields(data, ["date", 7, "missing"]) == {"date": "01-02-2024", 7: "int key"}
+        assert Oxdbin.decode_fields(data, ["uid"], path=("meta",)) == {"uid": "user1"}
+        assert Oxdbin.decode_fields(data, ["uid"], path=("date",)) is None
+        with pytest.raises(ValueError):
+            Oxdbin.skip(data[:-1])
+
+
+def test_v2_format():
+    value = {
+        "none": None,
+        "flags": [True, False],
+        "ints": [0, 127, 128, -1, -64, 2**63 - 1, -(2**63), 2**80],
+        "raw": b"\x00\xff" * 100,
+        "text": "héllo",
+        "meta": {"doc": "logs", "uid": "user1", "n": 3},
+    }
+    data = Oxdbin.encode(value)
+    assert data[0] == 2
+    assert Oxdbin.decode(data) == value
+    decoded = Oxdbin.decode(data)
+    assert decoded["flags"][0] is True and decoded["none"] is None
+
+    # v1 data is still read, v2 frames the same values with fewer bytes
+    meta = {"doc": "logs", "hid": "ab" * 32, "time": "12:00:01", "uid": "user1", "n": 3}
+    v1 = Oxdbin.encode(meta, version=1)
+    assert Oxdbin.decode(v1) == meta
+    assert len(Oxdbin.encode(meta)) < len(v1) * 0.8
+    assert Oxdbin.decode_all(v1 + Oxdbin.encode(meta)) == [meta, meta]
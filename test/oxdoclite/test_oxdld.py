@@ -0,0 +1,384 @@
+import os
+
+import pytest
+
+from oxdb_lite.oxdoc.db import OxdMem, Oxdld, ld
+from oxdb_lite.oxdoc.db.record import HEADER_SIZE
+from oxdb_lite.oxdoc.dp import DBin
+
+
+def test_journal_replay(tmp_path):
+    doc = Oxdld(str(tmp_path / "journal"))
+    doc.save_index()
+    index_path = doc.index_data.doc_path
+    index_size = os.path.getsize(index_path)
+
+    for i in range(50):
+        doc.set(str(i), {"field": f"value{i}"})
+    doc.delete("7")
+
+    # single key writes only append to the journal
+    assert os.path.getsize(index_path) == index_size
+    assert len(doc.journal) > 0
+
+    reopened = Oxdld(str(tmp_path / "journal"))
+    assert len(reopened) == 49
+    assert reopened.get("7") is None
+    assert reopened.get("42") == {"field": "value42"}
+
+
+def test_journal_checkpoint(tmp_path):
+    doc = Oxdld(str(tmp_path / "checkpoint"), checkpoint_ops=8)
+    for i in range(20):
+        doc.set(str(i), i)
+
+    assert len(doc.journal) < 20
+    reopened = Oxdld(str(tmp_path / "checkpoint"), checkpoint_ops=8)
+    assert [reopened.get(str(i)) for i in range(20)] == list(range(20))
+
+
+def test_durability_modes(tmp_path):
+    for durability in ["always", "batched", "os"]:
+        path = str(tmp_path / durability)
+        doc = Oxdld(path, durability=durability, sync_ops=4)
+        with doc.group_commit():
+            for i in range(10):
+                doc.set(str(i), f"value{i}")
+            assert len(doc.journal) == 0
+        doc.set("10", "value10")
+        doc.close()
+
+        reopened = Oxdld(path)
+        assert reopened.get("10") == "value10"
+        assert [reopened.get(str(i)) for i in range(10)] == [
+            f"value{i}" for i in range(10)
+        ]
+
+
+def test_open_without_compaction(tmp_path):
+    doc = Oxdld(str(tmp_path / "open"))
+    doc.add({"k1": "a" * 100, "k2": "b" * 100})
+    doc.delete("k1")
+    data_path = doc._get_file_path(doc.data_doc_name)
+    with open(data_path, "rb") as file:
+        data = file.read()
+
+    reopened = Oxdld(str(tmp_path / "open"))
+    with open(data_path, "rb") as file:
+        assert file.read() == data
+    assert reopened.get("k2") == "b" * 100
+    assert reopened.fragmentation() > 0
+
+
+def test_compact_threshold(tmp_path, monkeypatch):
+    monkeypatch.setattr(ld, "COMPACT_MIN_BYTES", 0)
+    doc = Oxdld(str(tmp_path / "threshold"), compact_threshold=0.6)
+    doc.add({"k1": "a" * 100, "k2": "b" * 100, "k3": "c" * 100})
+    doc.delete("k1")
+    assert doc.fragmentation() > 0
+
+    doc.delete("k2")
+    doc.compactor.wait()
+    assert doc.fragmentation() == 0
+    assert doc.get("k3") == "c" * 100
+
+
+def test_compact_online(tmp_path):
+    doc = Oxdld(str(tmp_path / "online"), compact_threshold=None)
+    doc.add({str(i): f"value{i}" * 20 for i in range(200)})
+    doc.delete([str(i) for i in range(0, 200, 2)])
+
+    compactor = doc.compact_online(chunk_bytes=256, rate_bytes=200_000, region_bytes=1024)
+    doc.set("1", "updated")
+    doc.delete("3")
+    doc.set("new", "value")
+    assert compactor.wait()
+    assert doc.fragmentation() < 0.1
+
+    reopened = Oxdld(str(tmp_path / "online"), compact_threshold=None)
+    for oxd in (doc, reopened):
+        oxd.lrucache = type(oxd.lrucache)(capacity=1)
+        assert oxd.get("1") == "updated"
+        assert oxd.get("3") is None
+        assert oxd.get("new") == "value"
+        assert oxd.get("199") == "value199" * 20
+        assert len(oxd) == 100
+
+
+def test_scan_iterators(tmp_path):
+    doc = Oxdld(str(tmp_path / "scan"))
+    data = {str(i): {"field": f"value{i}"} for i in range(25)}
+    doc.add(data)
+    doc.delete("3")
+    del data["3"]
+    data_path = doc._get_file_path(doc.data_doc_name)
+    mtime = os.stat(data_path).st_mtime_ns
+
+    assert dict(doc.items(buffer_size=64)) == data
+    assert sorted(doc.values(), key=lambda v: v["field"]) == sorted(
+        data.values(), key=lambda v: v["field"]
+    )
+    batches = list(doc.scan(batch_size=10))
+    assert [len(batch) for batch in batches] == [10, 10, 4]
+    assert doc.load_data() == data
+    assert os.stat(data_path).st_mtime_ns == mtime
+
+
+def test_get_many(tmp_path):
+    doc = Oxdld(str(tmp_path / "many"), cache_capacity=5)
+    doc.add({str(i): {"field": f"value{i}"} for i in range(100)})
+    doc.delete("50")
+
+    keys = [str(i) for i in range(99, -1, -3)] + ["missing", "99"]
+    result = doc.get_many(keys, merge_gap=0, max_read=256)
+    assert list(result) == [str(i) for i in range(99, -1, -3) if i != 50]
+    assert all(value == {"field": f"value{key}"} for key, value in result.items())
+
+
+def test_get_fields(tmp_path):
+    doc = Oxdld(str(tmp_path / "fields"), cache_capacity=5, blob_threshold=4096)
+    meta = lambda i: {"uid": f"user{i % 3}", "text": "x" * i, "tags": [i, {"a": None}], "date": "01-02"}
+    doc.add({str(i): meta(i) for i in range(50)})
+    doc.set("big", {"uid": "user9", "blob": "y" * 5000})
+    doc.set("plain", "not a dict")
+    doc.get("3")  # served from the cache
+
+    result = doc.get_fields(["3", "10", "big", "plain", "missing"], ["uid", "date"])
+    assert result == {
+        "3": {"uid": "user0", "date": "01-02"},
+        "10": {"uid": "user1", "date": "01-02"},
+        "big": {"uid": "user9"},
+        "plain": None,
+    }
+    assert doc.get_fields([str(i) for i in range(50)], ["tags"])["7"] == {"tags": [7, {"a": None}]}
+
+
+def test_mmap_reads(tmp_path):
+    doc = Oxdld(str(tmp_path / "mmap"), cache_capacity=1, mmap_reads=True)
+    doc.set("first", "a" * 50)
+    assert doc.get("first") == "a" * 50
+
+    # values appended after the file was mapped are read through a new map
+    doc.add({str(i): f"value{i}" * 10 for i in range(100)})
+    assert doc.get_many(["first", "42"]) == {"first": "a" * 50, "42": "value42" * 10}
+    assert doc.get("99") == "value99" * 10
+    assert len(dict(doc.items(buffer_size=128))) == 101
+    doc.close()
+
+    reopened = Oxdld(str(tmp_path / "mmap"), mmap_reads=True)
+    assert reopened.get("7") == "value7" * 10
+
+
+def test_recover_uncommitted_tail(tmp_path):
+    path = str(tmp_path / "tail")
+    doc = Oxdld(path, durability="batched", sync_interval_ms=60_000, sync_ops=10_000)
+    doc.add({"k1": "a", "k2": "b"})
+    doc.sync()
+    doc.set("k1", "updated")  # written but never committed, as after a crash
+    doc.set("k3", "c")
+
+    reopened = Oxdld(path)
+    assert {key: reopened.get(key) for key in ["k1", "k2", "k3"]} == {
+        "k1": "updated",
+        "k2": "b",
+        "k3": "c",
+    }
+    doc._cancel_sync_timer()
+
+
+def test_recover_from_data_only(tmp_path):
+    path = str(tmp_path / "rebuild")
+    doc = Oxdld(path)
+    doc.add({str(i): {"field": i} for i in range(20)})
+    doc.set("3", {"field": "longer value than before"})
+    position, length = doc.index["5"]
+    record = doc._read(position, length)
+    doc.delete(["5", "6"])
+    doc.close()
+
+    # a deleted record keeps its bytes, only a tombstone header replaces its header
+    with open(doc._get_file_path(doc.data_doc_name), "rb") as file:
+        data = file.read()
+    assert data[position : position + 1] == b"T"
+    assert data[position + HEADER_SIZE : position + length] == record[HEADER_SIZE:]
+
+    for index_path in [doc.index_data.doc_path, doc.journal.doc_path]:
+        if os.path.exists(index_path):
+            os.remove(index_path)
+    rebuilt = Oxdld(path)
+    assert len(rebuilt) == 18
+    assert rebuilt.get("3") == {"field": "longer value than before"}
+    assert rebuilt.get("5") is None
+    assert rebuilt.free_index.free_bytes == doc.free_index.free_bytes
+
+
+def test_checksum_and_damage(tmp_path):
+    path = str(tmp_path / "damage")
+    doc = Oxdld(path, cache_capacity=1)
+    doc.add({str(i): "value" * 10 for i in range(5)})
+    doc.close()
+    position, length = doc.index["2"]
+    data_path = doc._get_file_path(doc.data_doc_name)
+    with open(data_path, "r+b") as file:
+        file.seek(position + length - 3)
+        file.write(b"!!!")
+
+    with pytest.raises(ValueError):
+        Oxdld(path).get("2")
+    reopened = Oxdld(path)
+    stats = reopened.recover()
+    assert stats["records"] == 4 and stats["damaged_bytes"] == length
+    assert reopened.get("2") is None and reopened.get("3") == "value" * 10
+
+
+def test_migrate_legacy_format(tmp_path):
+    path = tmp_path / "legacy.oxdld"
+    path.mkdir()
+    dbin = DBin()
+    index, data = {}, b""
+    for key, value in {"k1": "a", "k2": {"x": [1, 2]}}.items():
+        encoded = dbin.encode({"": value})
+        index[key] = (len(data), len(encoded))
+        data += encoded
+    (path / "legacy.oxdldd.bin").write_bytes(data)
+    mem = OxdMem(str(path / "index"))
+    mem.update({"config": {"data_encoding": "oxdbin"}, "free_index": {}, "index": index})
+    mem.flush()
+
+    doc = Oxdld(str(path))
+    assert doc.get("k2") == {"x": [1, 2]}
+    assert doc.config["record_format"] == 1
+    assert Oxdld(str(path)).get("k1") == "a"
+
+
+def test_blob_values(tmp_path):
+    path = tmp_path / "blob"
+    doc = Oxdld(str(path), blob_threshold=256, compact_threshold=None)
+    doc.add({"big": "x" * 1000, "obj": {"n": list(range(1000, 1100))}, "small": "s"})
+    blob_dir = path.with_suffix(".oxdld") / "blobs"
+    assert len(os.listdir(blob_dir)) == 2
+    assert doc.index["big"][1] < 256  # the data document only holds the reference
+
+    with doc.get_stream("big") as stream:
+        assert stream.read(10) == b"x" * 10
+    with doc.get_stream("small") as stream:
+        assert stream.read() == b"s"
+    assert doc.get_stream("missing") is None
+
+    # the blob of a replaced or deleted value is removed at the commit
+    doc.set("big", "y" * 1000)
+    doc.delete("obj")
+    assert len(os.listdir(blob_dir)) == 1
+    doc.compact()
+    assert doc.get("big") == "y" * 1000 and doc.get("obj") is None
+
+    (blob_dir / "orphan.oxdblob.bin").write_bytes(b"left by a crash")
+    reopened = Oxdld(str(path), blob_threshold=256)
+    assert reopened.recover()["records"] == 2
+    assert len(os.listdir(blob_dir)) == 1
+    assert reopened.get("big") == "y" * 1000
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma", "bz2"])
+def test_compression(tmp_path, codec):
+    data = {str(i): f"log line {i} " + "the quick brown fox " * 40 for i in range(30)}
+    plain = Oxdld(str(tmp_path / "plain"))
+    plain.add(data)
+    doc = Oxdld(str(tmp_path / codec), compression=codec, compress_threshold=64)
+    doc.add(data)
+    doc.set("short", "under the threshold")
+    size = lambda oxd: os.path.getsize(oxd._get_file_path(oxd.data_doc_name))
+    assert size(doc) < size(plain) / 2
+
+    # the codec is kept in the config, records of another codec stay readable
+    reopened = Oxdld(str(tmp_path / codec))
+    assert reopened.config["compression"] == codec
+    other = Oxdld(str(tmp_path / codec), compression="none")
+    other.set("new", "v" * 500)
+    assert other.get_many(list(data)) == data
+    assert other.get("short") == "under the threshold"
+    with other.get_stream("3") as stream:
+        assert stream.read() == data["3"].encode("utf-8")
+
+
+def test_trained_dictionary(tmp_path):
+    lines = {str(i): {"level": "info", "msg": f"request {i} served", "path": "/api/items"} for i in range(200)}
+    doc = Oxdld(str(tmp_path / "zdict"), compression="zlib", compress_threshold=0)
+    doc.add(lines)
+    before = os.path.getsize(doc._get_file_path(doc.data_doc_name))
+    assert doc.train_compression() > 0
+
+    doc.add({key + "b": value for key, value in lines.items()})
+    after = os.path.getsize(doc._get_file_path(doc.data_doc_name)) - before
+    assert after < before
+    reopened = Oxdld(str(tmp_path / "zdict"))
+    assert reopened.get("7b") == lines["7"] and reopened.get("7") == lines["7"]
+
+
+def test_readonly(tmp_path):
+    path = str(tmp_path / "readonly")
+    with pytest.raises(ValueError):
+        Oxdld(path, readonly=True)
+    doc = Oxdld(path, shared=True)
+    doc.add({str(i): {"field": i} for i in range(50)})
+    doc.delete("7")
+    files = {name: os.stat(os.path.join(doc.doc_path, name)).st_mtime_ns for name in os.listdir(doc.doc_path)}
+
+    reader = Oxdld(path, readonly=True, shared=True)
+    assert reader.mmap_reads and len(reader) == 49
+    assert reader.get("42") == {"field": 42} and reader.get("7") is None
+    assert len(dict(reader.items())) == 49
+    for write in (lambda: reader.set("k", 1), lambda: reader.delete("1"), reader.compact):
+        with pytest.raises(ValueError):
+            write()
+    reader.close()
+    assert files == {name: os.stat(os.path.join(doc.doc_path, name)).st_mtime_ns for name in os.listdir(doc.doc_path)}
+
+    # a readonly handle of a shared document follows the commits of the writer
+    doc.set("7", "back")
+    assert reader.get("7") == "back"
+    doc.delete("20")
+    doc.save_index()  # the freed block goes to the checkpoint, the reader does not load it
+    doc.set("21", {"field": 99})  # allocated from that block
+    assert reader.get("21") == {"field": 99}
+    assert Oxdld(path, readonly=True, shared=True).get("21") == {"field": 99}
+
+
+def test_add_coalesces_appends(tmp_path, monkeypatch):
+    path = str(tmp_path / "bulk")
+    doc = Oxdld(path, compact_threshold=None, compression="none")
+    doc.add({str(i): "x" * 40 for i in range(10)})
+    doc.delete(["2", "5"])  # two holes the next add fills
+    doc.commit()
+
+    writes = []
+    write = doc._write
+    monkeypatch.setattr(doc, "_write", lambda pos, data: writes.append(pos) or write(pos, data))
+    data_size = doc._data_size
+    doc.add({"1": "x" * 40, "3": "y", **{f"new{i}": "z" * 30 for i in range(100)}})
+    appended = [pos for pos in writes if pos >= data_size]
+    assert len(appended) == 1  # one write for every record appended, the others fill the holes
+
+    monkeypatch.undo()
+    expected = {str(i): "x" * 40 for i in range(10) if i not in (2, 5)}
+    expected.update({"3": "y", **{f"new{i}": "z" * 30 for i in range(100)}})
+    assert dict(doc.items()) == expected
+    assert dict(Oxdld(path).items()) == expected
+
+
+def test_unchanged_writes_skipped(tmp_path):
+    np = pytest.importorskip("numpy")
+    doc = Oxdld(str(tmp_path / "unchanged"), compact_threshold=None)
+    vec = np.arange(8, dtype="float32")
+    doc.set("v", vec)
+    doc.add({"d": {"n": 1}})
+    entries = (doc.index.get("v"), doc.index.get("d"))
+
+    doc.set("v", vec.copy())
+    doc.add({"v": vec.copy(), "d": {"n": 1}})
+    assert (doc.index.get("v"), doc.index.get("d")) == entries
+
+    doc.set("v", vec.astype("float64"))  # equal items of another dtype are stored again
+    doc.add({"d": {"n": 1.5}})
+    assert doc.index.get("v") != entries[0] and doc.index.get("d") != entries[1]
+    assert doc.get("v").dtype == np.float64 and doc.get("d") == {"n": 1.5}
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from oxdb_lite.oxdoc import Oxdbin
+from oxdb_lite.oxdoc.db import Oxdld
+from oxdb_lite.oxdoc.db.symbols import SymbolTable
+
+
+def _meta(i):
+    return {"doc": "logs", "uid": f"user{i % 3}", "time": f"12:00:{i % 60:02d}", "level": "info", "n": i}
+
+
+def test_symbol_table(tmp_path):
+    path = str(tmp_path / "table.oxdsym.bin")
+    table = SymbolTable(path, key_count=2, value_count=3)
+    assert table.id_of("doc", key=True) is None  # stored as is until it repeats
+    assert table.id_of("doc", key=True) == 0
+    assert [table.id_of("info") for _ in range(3)] == [None, None, 1]
+    assert table.id_of("x" * 100, key=True) is None and table.id_of("x" * 100, key=True) is None
+
+    data = Oxdbin.encode({"doc": "info"}, symbols=table)
+    assert len(data) < len(Oxdbin.encode({"doc": "info"}))
+    with pytest.raises(ValueError):
+        Oxdbin.decode(data)  # the ids need the table
+
+    # another handle reads the symbols appended after it was opened
+    reader = SymbolTable(path, readonly=True)
+    table.id_of("level", key=True)
+    table.id_of("level", key=True)
+    assert reader[2] == "level" and len(reader) == 3
+    assert reader.id_of("new") is None and reader.id_of("new") is None
+    with pytest.raises(ValueError):
+        reader[3]
+
+    # a torn last entry is ignored and written over
+    with open(path, "ab") as file:
+        file.write(b"\x09ab")
+    assert len(SymbolTable(path)) == 3
+    table.id_of("time", key=True)
+    assert table.id_of("time", key=True) == 3
+    assert SymbolTable(path)[3] == "time"
+
+
+def test_records_use_symbols(tmp_path):
+    doc = Oxdld(str(tmp_path / "meta"), symbols=True, shared=True, compact_threshold=None)
+    plain = Oxdld(str(tmp_path / "plain"), compact_threshold=None)
+    for store in (doc, plain):
+        store.add({str(i): _meta(i) for i in range(200)})
+        store.close()
+    data_size = lambda store: os.path.getsize(store._get_file_path(store.data_doc_name))
+    assert data_size(doc) < data_size(plain) * 0.8
+    assert "doc" in doc.symbols.ids and "info" in doc.symbols.ids
+
+    # values re-encoded to compare or sample them do not count as writes
+    doc.set("rare", {"note": "seldom"})
+    doc.set("rare", {"note": "seldom"})
+    assert doc.symbols._counts["seldom"] == 2
+    symbols = len(doc.symbols)
+    doc.train_compression()
+    assert len(doc.symbols) == symbols and doc.symbols._counts["seldom"] == 2
+
+    reader = Oxdld(str(tmp_path / "meta"), shared=True, readonly=True)
+    assert reader.get("7") == _meta(7)
+    doc.set("200", {"doc": "logs", "status": "ok", "status2": "ok"})
+    doc.set("201", {"status": "ok"})
+    reader.refresh()
+    assert reader.get("201") == {"status": "ok"} and reader.get("5") == _meta(5)
+    assert Oxdbin.decode(reader.get_stream("3").read()) == {"": _meta(3)}
+
+    # the table of a document is used without asking for symbols, its records refer to it
+    reopened = Oxdld(str(tmp_path / "meta"), shared=True, compact_threshold=None)
+    assert reopened.symbols is not None and reopened.get("200") == doc.get("200")
+    assert Oxdld(str(tmp_path / "plain"), compact_threshold=None).symbols is None
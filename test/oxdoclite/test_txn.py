@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from oxdb_lite.oxdoc.db import Oxdld, OxdTxn
+from oxdb_lite.oxdoc.db.journal import OxdJournal
+
+
+def open_docs(tmp_path):
+    txn = OxdTxn(str(tmp_path / "txn"))
+    docs = [Oxdld(str(tmp_path / name), txn=txn) for name in ["index", "data", "vec"]]
+    return txn, docs
+
+
+def test_batch_commits_once(tmp_path):
+    txn, (index, data, vec) = open_docs(tmp_path)
+    with txn.batch():
+        index.add({"1": {"hid": "a"}, "2": {"hid": "b"}})
+        data.add({"1": "one", "2": "two"})
+        vec.add({"1": [1.0], "2": [2.0]})
+        assert len(index.journal) == 0
+    assert len(txn.log) == 1
+    assert index.config["txn"] == data.config["txn"] == vec.config["txn"] == 1
+
+    txn, (index, data, vec) = open_docs(tmp_path)
+    assert (index.get("2"), data.get("2"), vec.get("2")) == ({"hid": "b"}, "two", [2.0])
+    assert txn.next_id == 2
+
+
+def test_replay_missed_commit(tmp_path):
+    txn, (index, data, vec) = open_docs(tmp_path)
+
+    def crash(*args):
+        raise RuntimeError("crash")
+
+    # the log entry is written, the journal append of the last store never happens
+    vec._finish_commit = crash
+    with pytest.raises(RuntimeError):
+        with txn.batch():
+            data.add({"1": "one"})
+            vec.add({"1": [1.0]})
+
+    txn, (index, data, vec) = open_docs(tmp_path)
+    assert data.get("1") == "one" and vec.get("1") == [1.0]
+    assert vec.config["txn"] == 1
+
+
+def test_batch_rollback(tmp_path):
+    txn, (index, data, vec) = open_docs(tmp_path)
+    with txn.batch():
+        data.add({"1": "one"})
+        vec.add({"1": [1.0]})
+    data_size = os.path.getsize(data._get_file_path(data.data_doc_name))
+
+    with pytest.raises(ValueError):
+        with txn.batch():
+            data.set("1", "changed")
+            data.add({"2": "two"})
+            vec.delete("1")
+            raise ValueError("embedding failed")
+
+    assert data.get("1") == "one" and data.get("2") is None
+    assert vec.get("1") == [1.0]
+    assert os.path.getsize(data._get_file_path(data.data_doc_name)) == data_size
+    assert len(txn.log) == 1
+
+    data.set("2", "two")
+    txn, (index, data, vec) = open_docs(tmp_path)
+    assert data.get("1") == "one" and data.get("2") == "two"
+
+
+def test_checkpoint_shared_log(tmp_path):
+    def open_shared():
+        txn = OxdTxn(str(tmp_path / "txn"), log_limit=5)
+        docs = [Oxdld(str(tmp_path / name), txn=txn, shared=True) for name in ["data", "vec"]]
+        return txn, docs
+
+    # two handles of the documents stand in for two processes
+    first, (data, vec) = open_shared()
+    second, (data2, _) = open_shared()
+    with first.batch():
+        data.add({"0": "0"})
+    for i in range(1, 4):
+        with second.batch():
+            data2.add({str(i): str(i)})
+    assert len(first.log) == 1 and len(second.log) == 3
+
+    # the entries of the other process count towards the limit
+    held = []
+    reset = first.log.reset
+    first.log.reset = lambda *args, **kwargs: (
+        held.append(data._writer_held and vec._writer_held),
+        reset(*args, **kwargs),
+    )
+    with first.batch():
+        data.add({"4": "4"})
+    assert held == [True]  # no process can commit between the sync and the reset
+    assert len(first.log) == 0 and not OxdJournal(str(tmp_path / "txn")).replay(0)
+
+    with second.batch():
+        data2.add({"5": "5"})
+    _, (_, data, _) = open_docs(tmp_path)
+    assert [data.get(str(i)) for i in range(6)] == [str(i) for i in range(6)]